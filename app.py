@@ -1,25 +1,980 @@
-from flask import Flask, render_template, request, jsonify, session, send_from_directory
+from flask import Flask, render_template, request, jsonify, session, g, Response, stream_with_context, make_response, has_request_context
+from flask.json.provider import DefaultJSONProvider
 import sqlite3
+import click
 import os
+import sys
+import threading
+import queue
+import functools
+import heapq
+import json
+import base64
+import csv
+import io
+import itertools
+import time
+import bisect
+import re
+import gzip
+import hashlib
+import mimetypes
+import zlib
+from collections import deque
+from urllib.parse import quote
 from datetime import datetime, timedelta
 
+import numpy as np
+
+try:
+    import brotli
+except ImportError:  # assets are then only precompressed with gzip
+    brotli = None
+
+try:
+    import orjson
+except ImportError:  # responses are then encoded by the standard library
+    orjson = None
+
 # Create Flask app
-app = Flask(__name__)
+app = Flask(__name__, static_folder=None)  # static files are served by StaticAssets
 app.secret_key = 'cura_hospital_secret_key'
 
-# Serve static files
+# Database settings
+app.config['DATABASE'] = os.environ.get('DATABASE', 'hospital.db')
+app.config['SHARD_DIR'] = os.environ.get('SHARD_DIR')  # when set, each hospital's beds and patients get their own file here
+app.config['PATIENT_ID_BLOCK'] = 1000    # patient IDs a shard reserves from the catalog at a time
+app.config['DB_BUSY_TIMEOUT'] = 5.0      # seconds to wait for a write lock
+app.config['DB_POOL_SIZE'] = 8           # idle connections kept per database
+app.config['DB_CACHE_SIZE_KB'] = 16384   # page cache per connection
+app.config['DB_MMAP_SIZE'] = 128 * 1024 * 1024
+app.config['DB_WRITE_RETRIES'] = 5      # attempts when a write transaction finds the database locked
+app.config['WRITE_GROUP_COMMIT'] = True  # funnel request writes through one writer thread per database
+app.config['WRITE_GROUP_SIZE'] = 64      # most writes committed in one transaction
+app.config['WRITE_GROUP_WAIT'] = 0.001   # seconds the writer waits for more writes before committing
+app.config['WRITE_SUBMIT_TIMEOUT'] = 30.0  # seconds a request waits for the writer to start on its write
+app.config['BED_INDEX_VERIFY_INTERVAL'] = 300  # seconds between bed index consistency checks
+app.config['EVENT_HISTORY'] = 1000       # change events kept per hospital for resuming streams
+app.config['EVENT_KEEPALIVE'] = 15       # seconds between keep-alive comments on idle streams
+app.config['PAGE_SIZE_MAX'] = 1000       # largest ?limit accepted by the listing APIs
+app.config['STREAM_CHUNK_ROWS'] = 500    # rows fetched per chunk of a streamed listing
+app.config['BED_IMPORT_CHUNK'] = 5000    # beds per executemany when provisioning or importing
+app.config['IMPORT_SKIPPED_IDS_MAX'] = 100  # skipped bed IDs listed in an import response
+app.config['FORECAST_MAX_DAYS'] = 90
+app.config['FORECAST_EXTENSION_PROBABILITY'] = 0.5  # chance a flexible care stay is extended again
+app.config['ALLOCATION_POLICY'] = os.environ.get('ALLOCATION_POLICY', 'best-fit')  # key of ALLOCATION_POLICIES
+app.config['ROUNDS_MAX_ACTIONS'] = 500     # largest action list /api/rounds applies in one transaction
+app.config['ALLOCATE_BATCH_MAX'] = 500     # largest patient list /api/allocate-beds admits in one transaction
+app.config['ANALYTICS_MAX_BUCKETS'] = 24 * 31  # longest range /api/analytics reports in one response
+app.config['ARCHIVE_AFTER_DAYS'] = 90     # discharged patients older than this move to patients_archive
+app.config['ARCHIVE_BATCH'] = 1000        # patients moved per archival transaction
+app.config['METRICS'] = os.environ.get('METRICS') == '1'  # collect request, SQL and allocation metrics for /metrics
+app.config['STATIC_MAX_AGE'] = 365 * 24 * 3600  # seconds browsers keep fingerprinted assets
+app.config['JSON_GZIP_MIN_BYTES'] = 8192  # smaller JSON bodies are sent uncompressed
+app.config['JSON_GZIP_LEVEL'] = 1         # within a few percent of level 6 on listings, at half the CPU
+
+# Static assets
+class StaticAssets:
+    """Static files fingerprinted by content hash and compressed once, plus pages rendered once"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._urls = {}    # file name -> fingerprinted name
+        self._assets = {}  # served name -> asset
+        self._pages = {}   # template name -> asset of the rendered page
+        self._lock = threading.Lock()
+        self.build()
+
+    def build(self):
+        """Read, fingerprint and compress every file under the static directory"""
+        urls, assets = {}, {}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                with open(path, 'rb') as f:
+                    body = f.read()
+                filename = os.path.relpath(path, self.directory).replace(os.sep, '/')
+                asset = make_asset(body, mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+                stem, extension = os.path.splitext(filename)
+                fingerprinted = f"{stem}.{asset['etag'][:12]}{extension}"
+                urls[filename] = fingerprinted
+                assets[filename] = asset
+                assets[fingerprinted] = dict(asset, immutable=True)
+        with self._lock:
+            self._urls, self._assets = urls, assets
+
+    def url(self, filename):
+        """URL of the fingerprinted copy of a static file, for templates"""
+        return '/static/' + self._urls.get(filename, filename)
+
+    def get(self, name):
+        return self._assets.get(name)
+
+    def page(self, template):
+        """A template rendered on first use; pages without per-request data only"""
+        with self._lock:
+            asset = self._pages.get(template)
+        if asset is None:
+            asset = make_asset(render_template(template).encode(), 'text/html')
+            with self._lock:
+                self._pages[template] = asset
+        return asset
+
+def make_asset(body, mimetype):
+    """Body of an asset in every encoding that makes it smaller, with its content hash"""
+    variants = {'identity': body}
+    if mimetype.startswith('text/') or mimetype in ('application/javascript', 'application/json', 'image/svg+xml'):
+        if brotli:
+            variants['br'] = brotli.compress(body, quality=11)
+        variants['gzip'] = gzip.compress(body, compresslevel=9, mtime=0)
+    return {
+        'mimetype': mimetype,
+        'etag': hashlib.sha256(body).hexdigest(),
+        'variants': {encoding: data for encoding, data in variants.items() if len(data) < len(body) or encoding == 'identity'},
+        'immutable': False
+    }
+
+def asset_response(asset):
+    """Serve an asset in the smallest encoding the client accepts"""
+    encoding = 'identity'
+    for candidate in ('br', 'gzip'):
+        if candidate in asset['variants'] and request.accept_encodings[candidate]:
+            encoding = candidate
+            break
+    etag = f"{asset['etag'][:16]}-{encoding}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(asset['variants'][encoding], mimetype=asset['mimetype'])
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    if asset['immutable']:
+        response.headers['Cache-Control'] = f"public, max-age={app.config['STATIC_MAX_AGE']}, immutable"
+    else:
+        response.headers['Cache-Control'] = 'public, no-cache'
+    return response
+
+static_assets = StaticAssets(os.path.join(app.root_path, 'static'))
+app.jinja_env.globals['asset_url'] = static_assets.url
+
 @app.route('/static/<path:filename>')
 def static_files(filename):
-    return send_from_directory('static', filename)
+    asset = static_assets.get(filename)
+    if asset is None:
+        return jsonify({'error': 'Not found'}), 404
+    return asset_response(asset)
 
-# Database setup
-def init_db():
-    """Create database and tables if they don't exist"""
-    conn = sqlite3.connect('hospital.db')
-    cursor = conn.cursor()
+# JSON responses
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, encoding with orjson when it is installed"""
+
+    # Dates keep Flask's HTTP date format; numpy values from the forecast are encoded natively
+    options = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+               | orjson.OPT_SERIALIZE_NUMPY) if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self.options).decode()
+
+    def response(self, *args, **kwargs):
+        if orjson is None or self._app.debug:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self.options | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+app.json = FastJSONProvider(app)
+
+@app.after_request
+def compress_json(response):
+    """Gzip large JSON bodies for clients that accept it"""
+    if (response.mimetype != 'application/json' or response.is_streamed or response.direct_passthrough
+            or response.status_code != 200 or 'Content-Encoding' in response.headers):
+        return response
+    body = response.get_data()
+    if len(body) < app.config['JSON_GZIP_MIN_BYTES']:
+        return response
+    response.vary.add('Accept-Encoding')
+    if request.accept_encodings['gzip']:
+        response.set_data(gzip.compress(body, compresslevel=app.config['JSON_GZIP_LEVEL'], mtime=0))
+        response.headers['Content-Encoding'] = 'gzip'
+        # A strong tag names one exact body, so the gzipped one gets its own
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f'{etag}-gzip', weak)
+    return response
+
+def gzip_chunks(chunks):
+    """Gzip a streamed body as it is produced"""
+    compressor = zlib.compressobj(app.config['JSON_GZIP_LEVEL'], zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+# Metrics
+METRIC_TYPES = {
+    'cura_http_request_duration_seconds': ('histogram', 'Time to build a response, by route, method and status'),
+    'cura_sql_duration_seconds': ('histogram', 'Time spent executing SQL statements, by statement'),
+    'cura_db_connections_opened_total': ('counter', 'SQLite connections opened'),
+    'cura_db_pool_checkouts_total': ('counter', 'Connections taken from a pool, by whether an idle one was reused'),
+    'cura_db_pool_idle_connections': ('gauge', 'Idle connections kept in each pool'),
+    'cura_db_lock_wait_seconds': ('histogram', 'Time to take the write lock with BEGIN IMMEDIATE'),
+    'cura_db_lock_retries_total': ('counter', 'Write transactions retried because another writer held the lock'),
+    'cura_write_groups_total': ('counter', 'Transactions committed by the group commit writers'),
+    'cura_write_commands_total': ('counter', 'Writes applied by the group commit writers'),
+    'cura_write_queue_depth': ('gauge', 'Writes waiting for each group commit writer'),
+    'cura_allocations_total': ('counter', 'Patients admitted, by outcome: allocated, waitlisted or promoted'),
+    'cura_bed_type_fallbacks_total': ('counter', 'Patients given a general bed because none of the requested type was free'),
+}
+
+class Metrics:
+    """Counters and histograms kept in memory and rendered in the Prometheus text format"""
+
+    BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self._counters = {}    # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [count per bucket..., count above, sum]
+        self._lock = threading.Lock()
+
+    def inc(self, name, labels=(), amount=1):
+        """Add to a counter; labels is a tuple of (name, value) pairs"""
+        if not self.enabled:
+            return
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, labels=()):
+        """Record a duration in seconds in a histogram"""
+        if not self.enabled:
+            return
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(self.BUCKETS) + 2)
+            histogram[bisect.bisect_left(self.BUCKETS, value)] += 1
+            histogram[-1] += value
+
+    def render(self, gauges=()):
+        """Every metric in the Prometheus text exposition format, with (name, labels, value) gauges"""
+        # name -> [(labels, samples)]; a histogram series keeps its buckets in ascending le
+        # order followed by _sum and _count, so series are sorted but samples never are
+        series = {}
+        with self._lock:
+            for (name, labels), value in self._counters.items():
+                series.setdefault(name, []).append((labels, [(name, labels, value)]))
+            for (name, labels), histogram in self._histograms.items():
+                samples, cumulative = [], 0
+                for bound, count in zip(self.BUCKETS + ('+Inf',), histogram):
+                    cumulative += count
+                    samples.append((name + '_bucket', labels + (('le', str(bound)),), cumulative))
+                samples.append((name + '_sum', labels, histogram[-1]))
+                samples.append((name + '_count', labels, cumulative))
+                series.setdefault(name, []).append((labels, samples))
+        for name, labels, value in gauges:
+            series.setdefault(name, []).append((labels, [(name, labels, value)]))
+        
+        lines = []
+        for name, (kind, description) in METRIC_TYPES.items():
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            for _, samples in sorted(series.get(name, ()), key=lambda entry: entry[0]):
+                for sample, labels, value in samples:
+                    label_text = ','.join(f'{key}="{metric_label(str(label))}"' for key, label in labels)
+                    lines.append(f"{sample}{{{label_text}}} {value}" if labels else f"{sample} {value}")
+        return '\n'.join(lines) + '\n'
+
+def metric_label(value):
+    """Escape a label value for the Prometheus text format"""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+metrics = Metrics(app.config['METRICS'])
+
+_statement_labels = {}
+
+def statement_label(sql):
+    """Short label for a SQL statement: its verb and the first table it names"""
+    label = _statement_labels.get(sql)
+    if label is None:
+        verb = sql.split(None, 1)[0].upper() if sql.strip() else ''
+        table = re.search(r'\b(?:FROM|INTO|UPDATE|TABLE)\s+(\w+)', sql, re.IGNORECASE)
+        label = _statement_labels[sql] = f'{verb} {table.group(1)}' if table else verb
+    return label
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor recording how long each statement takes to execute"""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            metrics.observe('cura_sql_duration_seconds', time.perf_counter() - start,
+                            (('statement', statement_label(sql)),))
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            metrics.observe('cura_sql_duration_seconds', time.perf_counter() - start,
+                            (('statement', statement_label(sql)),))
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose cursors, including those behind execute(), are TimedCursors"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+@app.before_request
+def start_request_timer():
+    if metrics.enabled:
+        g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_duration(response):
+    if metrics.enabled and 'request_start' in g:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe('cura_http_request_duration_seconds', time.perf_counter() - g.request_start,
+                        (('route', route), ('method', request.method), ('status', str(response.status_code))))
+    return response
+
+# Database connections
+def connect_db(path=None):
+    """Open a SQLite connection in WAL mode with tuned pragmas"""
+    conn = sqlite3.connect(
+        path or app.config['DATABASE'],
+        timeout=app.config['DB_BUSY_TIMEOUT'],
+        check_same_thread=False,
+        factory=TimedConnection if metrics.enabled else sqlite3.Connection
+    )
+    metrics.inc('cura_db_connections_opened_total')
+    # WAL lets readers run alongside an in-flight allocation
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f"PRAGMA busy_timeout = {int(app.config['DB_BUSY_TIMEOUT'] * 1000)}")
+    conn.execute(f"PRAGMA cache_size = -{int(app.config['DB_CACHE_SIZE_KB'])}")
+    conn.execute(f"PRAGMA mmap_size = {int(app.config['DB_MMAP_SIZE'])}")
+    conn.execute('PRAGMA temp_store = MEMORY')
+    return conn
+
+class ConnectionPool:
+    """Keeps opened connections to one database file for reuse across requests"""
+
+    def __init__(self, path, max_idle):
+        self.path = path
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take an idle connection or open a new one"""
+        with self._lock:
+            if self._idle:
+                metrics.inc('cura_db_pool_checkouts_total', (('reused', 'true'),))
+                return self._idle.pop()
+        metrics.inc('cura_db_pool_checkouts_total', (('reused', 'false'),))
+        return connect_db(self.path)
+
+    def release(self, conn):
+        """Return a connection to the pool, discarding any unfinished transaction"""
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(path=None):
+    """Get the connection pool for a database file"""
+    path = path or app.config['DATABASE']
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = ConnectionPool(path, app.config['DB_POOL_SIZE'])
+    return pool
+
+# Hospital sharding. With SHARD_DIR unset everything lives in DATABASE; with it set,
+# DATABASE is the catalog of hospitals (logins and the patient ID sequence) and each
+# hospital's beds and patients live in SHARD_DIR/hospital_<id>.db, so admissions at
+# different hospitals never wait on each other's write lock.
+CATALOG_FILE = 'catalog.db'
+SHARD_PASSWORD = ''  # logins are checked against the catalog, so shards keep no password
+
+def shard_file(hospital_id):
+    """File name of a hospital's shard"""
+    return f"hospital_{quote(hospital_id, safe='')}.db"
+
+def shard_path(hospital_id):
+    """Database file holding a hospital's beds and patients"""
+    if not app.config['SHARD_DIR'] or hospital_id is None:
+        return app.config['DATABASE']
+    return os.path.join(app.config['SHARD_DIR'], shard_file(hospital_id))
+
+def hospital_databases(catalog=None):
+    """Paths of every database holding beds and patients, listed from the given catalog connection"""
+    if not app.config['SHARD_DIR']:
+        return [app.config['DATABASE']]
+    conn = catalog or connect_db()
+    hospital_ids = [row[0] for row in conn.execute('SELECT id FROM hospitals ORDER BY id')]
+    if catalog is None:
+        conn.close()
+    return [shard_path(hospital_id) for hospital_id in hospital_ids]
+
+def request_connection(path):
+    """Get the pooled connection to a database file bound to the current request"""
+    if 'dbs' not in g:
+        g.dbs = {}
+    if path not in g.dbs:
+        g.dbs[path] = get_pool(path).acquire()
+    return g.dbs[path]
+
+def get_db(hospital_id=None):
+    """Get the request's connection to a hospital's database, the logged-in hospital's by default"""
+    if hospital_id is None and has_request_context():
+        hospital_id = session.get('hospital_id')
+    return request_connection(shard_path(hospital_id))
+
+def get_catalog():
+    """Get the request's connection to the catalog of hospitals"""
+    return request_connection(app.config['DATABASE'])
+
+@app.teardown_appcontext
+def release_db(exception):
+    """Hand the request's connections back to their pools"""
+    for path, conn in g.pop('dbs', {}).items():
+        get_pool(path).release(conn)
+
+class WriteTransaction:
+    """Cursor of an open write transaction plus callbacks for its outcome"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.bed_events = []  # (hospital_id, bed_id, patient_id, event_type, occurred_at) rows
+        self.beds_changed = set()  # hospitals whose bed counters this transaction changed
+        self._commit_hooks = []
+        self._rollback_hooks = []
+
+    def log_bed_event(self, hospital_id, bed_id, patient_id, event_type):
+        """Queue a bed event, written with the transaction's other events just before it commits"""
+        self.bed_events.append((hospital_id, bed_id, patient_id, event_type,
+                                datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+        if event_type != 'extended':
+            self.beds_changed.add(hospital_id)
+
+    def on_commit(self, callback, *args):
+        """Run callback(*args) once the transaction has committed"""
+        self._commit_hooks.append((callback, args))
+
+    def on_rollback(self, callback, *args):
+        """Run callback(*args) if the transaction is rolled back"""
+        self._rollback_hooks.append((callback, args))
+
+    def committed(self):
+        for callback, args in self._commit_hooks:
+            callback(*args)
+
+    def rolled_back(self):
+        for callback, args in reversed(self._rollback_hooks):
+            callback(*args)
+
+def write_bed_events(cursor, rows):
+    """Append queued bed events to the event log in one statement"""
+    if rows:
+        cursor.executemany('''
+            INSERT INTO bed_events (hospital_id, bed_id, patient_id, event_type, occurred_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', rows)
+        update_rollups(cursor, rows)
+
+# Utilization rollups, one row per hospital, bucket and bed type
+def bed_stats_snapshot(cursor, hospital_ids):
+    """Per-type bed counters of hospitals in a shard, stamped with their data version, for the catalog"""
+    if not hospital_ids:
+        return []
+    hospital_ids = list(hospital_ids)
+    cursor.execute(f'''
+        SELECT s.hospital_id, s.type, s.total_beds, s.available_beds, COALESCE(v.version, 0)
+        FROM bed_type_stats s LEFT JOIN hospital_versions v ON v.hospital_id = s.hospital_id
+        WHERE s.hospital_id IN ({', '.join('?' * len(hospital_ids))})
+    ''', hospital_ids)
+    return cursor.fetchall()
+
+def store_bed_stats(tx, rows):
+    """Upsert shard bed counters into network_bed_stats, keeping whichever snapshot is newer"""
+    tx.cursor.executemany('''
+        INSERT INTO network_bed_stats (hospital_id, type, total_beds, available_beds, version)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (hospital_id, type) DO UPDATE SET
+            total_beds = excluded.total_beds,
+            available_beds = excluded.available_beds,
+            version = excluded.version
+        WHERE excluded.version >= network_bed_stats.version
+    ''', rows)
+
+def publish_bed_stats(rows):
+    """Hand committed shard bed counters to the catalog's writer without waiting for it"""
+    if rows:
+        get_writer(app.config['DATABASE']).post(store_bed_stats, (rows,))
+
+def refresh_network_stats(catalog, paths):
+    """Rebuild network_bed_stats from the bed_type_stats of every shard"""
+    rows = []
+    for path in paths:
+        conn = connect_db(path)
+        cursor = conn.cursor()
+        cursor.execute('SELECT id FROM hospitals')
+        rows.extend(bed_stats_snapshot(cursor, [row[0] for row in cursor.fetchall()]))
+        conn.close()
     
-    # Create hospitals table
-    cursor.execute('''
+    def replace(tx):
+        tx.cursor.execute('DELETE FROM network_bed_stats')
+        store_bed_stats(tx, rows)
+    run_write(replace, conn=catalog)
+    return len(rows)
+
+ROLLUP_TABLES = {'hour': 'utilization_hourly', 'day': 'utilization_daily'}
+ROLLUP_COLUMNS = ('admissions', 'discharges', 'stays', 'stay_seconds',
+                  'occupied_seconds', 'occupied_end', 'last_event_at')
+
+def latest_rollup_query(table, before=False):
+    """SQL of the newest rollup row of a hospital and bed type, optionally before a bucket"""
+    return f'''
+        SELECT bucket, {', '.join(ROLLUP_COLUMNS)} FROM {table}
+        WHERE hospital_id = ? AND bed_type = ?{' AND bucket < ?' if before else ''}
+        ORDER BY bucket DESC
+        LIMIT 1
+    '''
+
+def rollup_range_query(table):
+    """SQL of the rollup rows of a hospital between two buckets, inclusive"""
+    return f'''
+        SELECT bucket, bed_type, {', '.join(ROLLUP_COLUMNS)} FROM {table}
+        WHERE hospital_id = ? AND bucket >= ? AND bucket <= ?
+    '''
+
+def rollup_table(name):
+    """DDL of a utilization rollup table"""
+    # occupied_seconds covers the bucket up to last_event_at; from there on
+    # occupied_end beds stay occupied until the next row, so idle buckets need no row
+    return f'''
+        CREATE TABLE IF NOT EXISTS {name} (
+            hospital_id TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            bed_type TEXT NOT NULL,
+            admissions INTEGER NOT NULL DEFAULT 0,
+            discharges INTEGER NOT NULL DEFAULT 0,
+            stays INTEGER NOT NULL DEFAULT 0,
+            stay_seconds REAL NOT NULL DEFAULT 0,
+            occupied_seconds REAL NOT NULL DEFAULT 0,
+            occupied_end INTEGER NOT NULL DEFAULT 0,
+            last_event_at TEXT NOT NULL,
+            PRIMARY KEY (hospital_id, bucket, bed_type)
+        )
+    '''
+
+def rollup_bucket(granularity, moment):
+    """Return (bucket key, bucket start) of the hour or day containing moment"""
+    if granularity == 'hour':
+        start = moment.replace(minute=0, second=0, microsecond=0)
+        return start.strftime('%Y-%m-%d %H:00'), start
+    start = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return start.strftime('%Y-%m-%d'), start
+
+def parse_timestamp(value):
+    return datetime.fromisoformat(value)
+
+# Latest admission of a patient to a bed, from idx_bed_events_bed
+ADMISSION_TIME_QUERY = '''
+    SELECT occurred_at FROM bed_events
+    WHERE hospital_id = ? AND bed_id = ? AND occurred_at <= ?
+          AND patient_id = ? AND event_type IN ('admitted', 'promoted')
+    ORDER BY occurred_at DESC
+    LIMIT 1
+'''
+
+def admission_time(cursor, hospital_id, bed_id, patient_id, before):
+    """When the patient was last put in the bed, from the event log"""
+    cursor.execute(ADMISSION_TIME_QUERY, (hospital_id, bed_id, before, patient_id))
+    row = cursor.fetchone()
+    return parse_timestamp(row[0]) if row else None
+
+def update_rollups(cursor, rows, admitted_at=None):
+    """Fold bed events, oldest first, into the hourly and daily utilization rollups"""
+    admitted_at = {} if admitted_at is None else admitted_at
+    bed_types = {}
+    for chunk in chunked(list({row[1] for row in rows}), 500):
+        cursor.execute(f"SELECT id, type FROM beds WHERE id IN ({', '.join('?' * len(chunk))})", chunk)
+        bed_types.update(cursor.fetchall())
+
+    latest = {}   # (granularity, hospital_id, bed_type) -> newest rollup row
+    changed = {}  # (granularity, hospital_id, bed_type, bucket) -> row to write back
+    for hospital_id, bed_id, patient_id, event_type, occurred_at in rows:
+        if event_type == 'extended':
+            continue
+        bed_type = bed_types.get(bed_id, 'general')
+        moment = parse_timestamp(occurred_at)
+        admitting = event_type in ('admitted', 'promoted')
+        stay = None
+        if admitting:
+            admitted_at[patient_id] = moment
+        else:
+            start = (admitted_at.pop(patient_id, None)
+                     or admission_time(cursor, hospital_id, bed_id, patient_id, occurred_at))
+            if start is not None:
+                stay = max((moment - start).total_seconds(), 0)
+
+        for granularity, table in ROLLUP_TABLES.items():
+            key = (granularity, hospital_id, bed_type)
+            if key not in latest:
+                cursor.execute(latest_rollup_query(table), (hospital_id, bed_type))
+                found = cursor.fetchone()
+                latest[key] = dict(zip(('bucket',) + ROLLUP_COLUMNS, found)) if found else None
+            row = latest[key]
+            bucket, bucket_start = rollup_bucket(granularity, moment)
+            if row is None or row['bucket'] < bucket:
+                occupied = row['occupied_end'] if row else 0
+                row = latest[key] = {
+                    'bucket': bucket, 'admissions': 0, 'discharges': 0, 'stays': 0, 'stay_seconds': 0.0,
+                    'occupied_seconds': occupied * (moment - bucket_start).total_seconds(),
+                    'occupied_end': occupied, 'last_event_at': occurred_at,
+                }
+            else:
+                # A late event (clock skew between writers) is folded into the newest bucket
+                elapsed = (moment - parse_timestamp(row['last_event_at'])).total_seconds()
+                row['occupied_seconds'] += row['occupied_end'] * max(elapsed, 0)
+                row['last_event_at'] = max(row['last_event_at'], occurred_at)
+            if admitting:
+                row['admissions'] += 1
+                row['occupied_end'] += 1
+            else:
+                row['discharges'] += 1
+                row['occupied_end'] = max(row['occupied_end'] - 1, 0)
+                if stay is not None:
+                    row['stays'] += 1
+                    row['stay_seconds'] += stay
+            changed[key + (bucket,)] = row
+
+    for granularity, table in ROLLUP_TABLES.items():
+        cursor.executemany(f'''
+            INSERT OR REPLACE INTO {table} (hospital_id, bucket, bed_type, {', '.join(ROLLUP_COLUMNS)})
+            VALUES (?, ?, ?, {', '.join('?' * len(ROLLUP_COLUMNS))})
+        ''', [(hospital_id, row['bucket'], bed_type) + tuple(row[column] for column in ROLLUP_COLUMNS)
+              for (row_granularity, hospital_id, bed_type, _), row in changed.items()
+              if row_granularity == granularity])
+
+def rebuild_rollups(cursor):
+    """Recompute the utilization rollups by replaying the whole bed event log, returning the event count"""
+    for table in ROLLUP_TABLES.values():
+        cursor.execute(f'DELETE FROM {table}')
+    events = cursor.connection.cursor()
+    events.execute('''
+        SELECT hospital_id, bed_id, patient_id, event_type, occurred_at
+        FROM bed_events
+        ORDER BY occurred_at, id
+    ''')
+    admitted_at = {}
+    replayed = 0
+    while True:
+        rows = events.fetchmany(5000)
+        if not rows:
+            break
+        update_rollups(cursor, rows, admitted_at)
+        replayed += len(rows)
+    events.close()
+    return replayed
+
+def begin_immediate(conn):
+    """Open a write transaction, waiting up to the busy timeout for the write lock"""
+    start = time.perf_counter()
+    conn.execute('BEGIN IMMEDIATE')
+    metrics.observe('cura_db_lock_wait_seconds', time.perf_counter() - start)
+
+def is_locked_error(error):
+    """Whether an OperationalError means another writer holds the lock"""
+    message = str(error)
+    return 'database is locked' in message or 'database is busy' in message
+
+def run_write(work, *args, conn=None, database=None):
+    """Run work(tx, *args) in one BEGIN IMMEDIATE transaction, retrying on lock contention"""
+    if conn is None:
+        # Request writes default to the logged-in hospital's database
+        path = database or shard_path(session.get('hospital_id'))
+        if app.config['WRITE_GROUP_COMMIT']:
+            return get_writer(path).submit(work, args)
+        conn = request_connection(path)
+    retries = app.config['DB_WRITE_RETRIES']
+    
+    for attempt in range(retries + 1):
+        tx = WriteTransaction(conn)
+        try:
+            begin_immediate(conn)
+            result = work(tx, *args)
+            write_bed_events(tx.cursor, tx.bed_events)
+            bed_stats = bed_stats_snapshot(tx.cursor, tx.beds_changed) if app.config['SHARD_DIR'] else []
+            conn.commit()
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            tx.rolled_back()
+            if isinstance(e, sqlite3.OperationalError) and is_locked_error(e) and attempt < retries:
+                metrics.inc('cura_db_lock_retries_total')
+                time.sleep(0.01 * (attempt + 1))
+                continue
+            raise
+        tx.committed()
+        publish_bed_stats(bed_stats)
+        return result
+
+class WriteCommand:
+    """A queued work(tx, *args) call and, once done is set, its result or error"""
+
+    def __init__(self, work, args, posted=False):
+        self.work = work
+        self.args = args
+        self.posted = posted  # nobody waits for the outcome, so errors are logged instead
+        self.done = threading.Event()
+        self.started = False
+        self.cancelled = False
+        self.tx = None
+        self.result = None
+        self.error = None
+
+class GroupCommitWriter:
+    """Applies the writes to one database file in order on its own thread, committing them in groups"""
+
+    def __init__(self, path, group_size, group_wait, timeout):
+        self.path = path
+        self.group_size = group_size
+        self.group_wait = group_wait
+        self.timeout = timeout
+        self.error = None  # set once the writer thread has stopped
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=f'writer {path}', daemon=True)
+        self._thread.start()
+
+    def submit(self, work, args):
+        """Queue work(tx, *args) and wait for it to commit, returning its result"""
+        if self.error is not None:
+            raise self.error
+        command = WriteCommand(work, args)
+        self._queue.put(command)
+        if not command.done.wait(self.timeout):
+            # Give up only if the writer has not started on it; once started it finishes
+            # within the busy timeout, and the caller must learn whether it committed
+            with self._lock:
+                command.cancelled = not command.started
+            if command.cancelled:
+                raise self.error or TimeoutError(f'Write to {self.path} not started within {self.timeout}s')
+            command.done.wait()
+        if command.error is not None:
+            raise command.error
+        return command.result
+
+    def post(self, work, args):
+        """Queue work(tx, *args) without waiting for it; its result is dropped and any error logged"""
+        if self.error is not None:
+            app.logger.warning('Dropped %s for %s: %s', work.__name__, self.path, self.error)
+            return
+        self._queue.put(WriteCommand(work, args, posted=True))
+
+    def _next_group(self):
+        """Block for the next command, then gather more until the group is full or the wait is over"""
+        group = [self._queue.get()]
+        deadline = time.monotonic() + self.group_wait
+        while len(group) < self.group_size:
+            try:
+                group.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        return group
+
+    def _run(self):
+        conn, group = None, []
+        try:
+            conn = connect_db(self.path)
+            while True:
+                group = self._next_group()
+                try:
+                    self._commit_group(conn, group)
+                except Exception as e:
+                    for command in group:
+                        command.error = e
+                for command in group:
+                    # Cursors share cached statements with this thread, so they must not be
+                    # finalized by the request thread once it wakes up
+                    if command.tx is not None:
+                        command.tx.cursor.close()
+                        command.tx = None
+                    if command.posted and command.error is not None:
+                        app.logger.warning('Dropped %s for %s: %s', command.work.__name__, self.path, command.error)
+                    command.done.set()
+                group = []
+        except BaseException as e:
+            # Closing rolls back any open transaction, releasing the write lock for the next writer
+            if conn is not None:
+                conn.close()
+            self._stop(sqlite3.OperationalError(f'Writer for {self.path} stopped: {e!r}'), group)
+
+    def _stop(self, error, group):
+        """Retire a writer whose thread failed, failing its queued commands so no request waits forever"""
+        self.error = error
+        with _writers_lock:
+            if _writers.get(self.path) is self:
+                del _writers[self.path]
+        while True:
+            try:
+                group.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for command in group:
+            if not command.done.is_set():
+                command.error = error
+                if command.posted:
+                    app.logger.warning('Dropped %s for %s: %s', command.work.__name__, self.path, error)
+                command.done.set()
+
+    def _commit_group(self, conn, group):
+        """Apply a group in one transaction, retrying it whole if another process holds the lock"""
+        retries = app.config['DB_WRITE_RETRIES']
+        
+        for attempt in range(retries + 1):
+            applied = []
+            try:
+                begin_immediate(conn)
+                for command in group:
+                    if self._apply(conn, command):
+                        applied.append(command)
+                write_bed_events(conn.cursor(), [row for command in applied for row in command.tx.bed_events])
+                changed = set().union(*(command.tx.beds_changed for command in applied))
+                bed_stats = bed_stats_snapshot(conn.cursor(), changed) if app.config['SHARD_DIR'] else []
+                conn.commit()
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.rollback()
+                for command in reversed(applied):
+                    command.tx.rolled_back()
+                if isinstance(e, sqlite3.OperationalError) and is_locked_error(e) and attempt < retries:
+                    metrics.inc('cura_db_lock_retries_total')
+                    time.sleep(0.01 * (attempt + 1))
+                    continue
+                raise
+            metrics.inc('cura_write_groups_total')
+            metrics.inc('cura_write_commands_total', amount=len(group))
+            for command in applied:
+                command.tx.committed()
+            publish_bed_stats(bed_stats)
+            return
+
+    def _apply(self, conn, command):
+        """Run one command in a savepoint, returning whether it succeeded"""
+        # A failing command is undone on its own; the rest of its group still commits
+        with self._lock:
+            if command.cancelled:
+                command.error = TimeoutError(f'Write to {self.path} not started within {self.timeout}s')
+                return False
+            command.started = True
+        command.tx = WriteTransaction(conn)
+        command.result = command.error = None
+        conn.execute('SAVEPOINT command')
+        try:
+            command.result = command.work(command.tx, *command.args)
+        except Exception as e:
+            conn.execute('ROLLBACK TO command')
+            conn.execute('RELEASE command')
+            command.tx.rolled_back()
+            command.error = e
+            return False
+        conn.execute('RELEASE command')
+        return True
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+def forget_writers():
+    """Drop writers inherited from a parent process, whose threads did not survive the fork"""
+    global _writers_lock
+    _writers.clear()
+    _writers_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=forget_writers)
+
+def get_writer(path):
+    """Get the group commit writer of a database file, starting it on first use"""
+    with _writers_lock:
+        writer = _writers.get(path)
+        if writer is None:
+            writer = _writers[path] = GroupCommitWriter(
+                path, app.config['WRITE_GROUP_SIZE'], app.config['WRITE_GROUP_WAIT'],
+                app.config['WRITE_SUBMIT_TIMEOUT'])
+    return writer
+
+def flush_writers():
+    """Wait until every write queued so far is committed, shards first since they post to the catalog"""
+    with _writers_lock:
+        writers = list(_writers.values())
+    for writer in sorted(writers, key=lambda writer: writer.path == app.config['DATABASE']):
+        try:
+            writer.submit(lambda tx: None, ())
+        except Exception as e:
+            app.logger.warning('Could not flush writes to %s: %s', writer.path, e)
+
+# Bed counters recomputed from the beds table, used to seed and reconcile bed_stats
+BED_STATS_QUERY = '''
+    SELECT 
+        hospital_id,
+        COUNT(*) as total_beds,
+        SUM(CASE WHEN status = 'available' THEN 1 ELSE 0 END) as available_beds,
+        SUM(CASE WHEN type = 'icu' THEN 1 ELSE 0 END) as icu_beds,
+        SUM(CASE WHEN type = 'flexible' THEN 1 ELSE 0 END) as flexible_beds,
+        SUM(CASE WHEN status = 'occupied' THEN 1 ELSE 0 END) as occupied_beds
+    FROM beds 
+    GROUP BY hospital_id
+'''
+
+# Free and total beds per hospital and bed type, used to seed and reconcile bed_type_stats
+BED_TYPE_STATS_QUERY = '''
+    SELECT hospital_id, type, COUNT(*), SUM(CASE WHEN status = 'available' THEN 1 ELSE 0 END)
+    FROM beds
+    GROUP BY hospital_id, type
+'''
+
+def version_trigger(table, event, row):
+    """Trigger bumping the owning hospital's data version on every change to a table"""
+    return f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_version_after_{event.lower()}
+        AFTER {event} ON {table} WHEN {row}.hospital_id IS NOT NULL
+        BEGIN
+            INSERT INTO hospital_versions (hospital_id, version) VALUES ({row}.hospital_id, 1)
+            ON CONFLICT (hospital_id) DO UPDATE SET version = version + 1;
+        END
+    '''
+
+# Schema migrations, applied in order and recorded in schema_version.
+# Each step is a list of SQL statements or callables taking a cursor.
+MIGRATIONS = [
+    (1, 'Create hospitals, patients and beds tables', [
+        '''
         CREATE TABLE IF NOT EXISTS hospitals (
             id TEXT PRIMARY KEY,
             name TEXT NOT NULL,
@@ -29,10 +984,8 @@ def init_db():
             icu_beds INTEGER NOT NULL,
             password TEXT NOT NULL
         )
-    ''')
-    
-    # Create patients table
-    cursor.execute('''
+        ''',
+        '''
         CREATE TABLE IF NOT EXISTS patients (
             id TEXT PRIMARY KEY,
             name TEXT NOT NULL,
@@ -51,10 +1004,8 @@ def init_db():
             hospital_id TEXT,
             extended_stay INTEGER DEFAULT 0
         )
-    ''')
-    
-    # Create beds table
-    cursor.execute('''
+        ''',
+        '''
         CREATE TABLE IF NOT EXISTS beds (
             id TEXT PRIMARY KEY,
             hospital_id TEXT NOT NULL,
@@ -64,15 +1015,524 @@ def init_db():
             patient_id TEXT,
             last_occupied_date TEXT
         )
+        ''',
+    ]),
+    (2, 'Index bed lookups, bed listings and patient listings', [
+        # find_available_bed and the dashboard bed statistics
+        '''
+        CREATE INDEX IF NOT EXISTS idx_beds_availability
+        ON beds (hospital_id, type, status)
+        ''',
+        # available_beds, covering so the listing never touches the table
+        '''
+        CREATE INDEX IF NOT EXISTS idx_beds_listing
+        ON beds (hospital_id, type, id, ward, status, last_occupied_date)
+        ''',
+        # allocated_patients and the dashboard recent patients
+        '''
+        CREATE INDEX IF NOT EXISTS idx_patients_hospital_status
+        ON patients (hospital_id, status, admission_date)
+        ''',
+    ]),
+    (3, 'Add id_sequences for patient IDs', [
+        '''
+        CREATE TABLE IF NOT EXISTS id_sequences (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+        ''',
+        # Continue after the highest PATnnn already issued
+        '''
+        INSERT OR IGNORE INTO id_sequences (name, value)
+        SELECT 'patient', COALESCE(MAX(CAST(SUBSTR(id, 4) AS INTEGER)), 0)
+        FROM patients WHERE id LIKE 'PAT%'
+        ''',
+    ]),
+    (4, 'Record when patients joined the waiting list', [
+        'ALTER TABLE patients ADD COLUMN waiting_since TEXT',
+        '''
+        UPDATE patients SET waiting_since = admission_date || ' 00:00:00'
+        WHERE status = 'waiting' AND admission_date IS NOT NULL
+        ''',
+    ]),
+    (5, 'Add trigger-maintained bed_stats counters per hospital', [
+        '''
+        CREATE TABLE IF NOT EXISTS bed_stats (
+            hospital_id TEXT PRIMARY KEY,
+            total_beds INTEGER NOT NULL DEFAULT 0,
+            available_beds INTEGER NOT NULL DEFAULT 0,
+            icu_beds INTEGER NOT NULL DEFAULT 0,
+            flexible_beds INTEGER NOT NULL DEFAULT 0,
+            occupied_beds INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS bed_stats_after_insert AFTER INSERT ON beds
+        BEGIN
+            INSERT OR IGNORE INTO bed_stats (hospital_id) VALUES (NEW.hospital_id);
+            UPDATE bed_stats SET
+                total_beds = total_beds + 1,
+                available_beds = available_beds + (NEW.status = 'available'),
+                icu_beds = icu_beds + (NEW.type = 'icu'),
+                flexible_beds = flexible_beds + (NEW.type = 'flexible'),
+                occupied_beds = occupied_beds + (NEW.status = 'occupied')
+            WHERE hospital_id = NEW.hospital_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS bed_stats_after_delete AFTER DELETE ON beds
+        BEGIN
+            UPDATE bed_stats SET
+                total_beds = total_beds - 1,
+                available_beds = available_beds - (OLD.status = 'available'),
+                icu_beds = icu_beds - (OLD.type = 'icu'),
+                flexible_beds = flexible_beds - (OLD.type = 'flexible'),
+                occupied_beds = occupied_beds - (OLD.status = 'occupied')
+            WHERE hospital_id = OLD.hospital_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS bed_stats_after_update
+        AFTER UPDATE OF hospital_id, type, status ON beds
+        BEGIN
+            UPDATE bed_stats SET
+                total_beds = total_beds - 1,
+                available_beds = available_beds - (OLD.status = 'available'),
+                icu_beds = icu_beds - (OLD.type = 'icu'),
+                flexible_beds = flexible_beds - (OLD.type = 'flexible'),
+                occupied_beds = occupied_beds - (OLD.status = 'occupied')
+            WHERE hospital_id = OLD.hospital_id;
+            INSERT OR IGNORE INTO bed_stats (hospital_id) VALUES (NEW.hospital_id);
+            UPDATE bed_stats SET
+                total_beds = total_beds + 1,
+                available_beds = available_beds + (NEW.status = 'available'),
+                icu_beds = icu_beds + (NEW.type = 'icu'),
+                flexible_beds = flexible_beds + (NEW.type = 'flexible'),
+                occupied_beds = occupied_beds + (NEW.status = 'occupied')
+            WHERE hospital_id = NEW.hospital_id;
+        END
+        ''',
+        '''
+        INSERT OR REPLACE INTO bed_stats
+            (hospital_id, total_beds, available_beds, icu_beds, flexible_beds, occupied_beds)
+        ''' + BED_STATS_QUERY,
+    ]),
+    (6, 'Add patient id to the patient listing index for keyset pagination', [
+        'DROP INDEX IF EXISTS idx_patients_hospital_status',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_patients_listing
+        ON patients (hospital_id, status, admission_date, id)
+        ''',
+    ]),
+    (7, 'Add per-hospital data versions for conditional requests', [
+        '''
+        CREATE TABLE IF NOT EXISTS hospital_versions (
+            hospital_id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+        ''',
+        version_trigger('beds', 'INSERT', 'NEW'),
+        version_trigger('beds', 'UPDATE', 'NEW'),
+        version_trigger('beds', 'DELETE', 'OLD'),
+        version_trigger('patients', 'INSERT', 'NEW'),
+        version_trigger('patients', 'UPDATE', 'NEW'),
+        version_trigger('patients', 'DELETE', 'OLD'),
+        '''
+        CREATE TRIGGER IF NOT EXISTS hospitals_version_after_insert
+        AFTER INSERT ON hospitals
+        BEGIN
+            INSERT OR IGNORE INTO hospital_versions (hospital_id, version) VALUES (NEW.id, 1);
+        END
+        ''',
+        'INSERT OR IGNORE INTO hospital_versions (hospital_id, version) SELECT id, 1 FROM hospitals',
+    ]),
+    (8, 'Store expected discharge dates and index upcoming discharges', [
+        'ALTER TABLE patients ADD COLUMN expected_discharge_date TEXT',
+        '''
+        UPDATE patients
+        SET expected_discharge_date = date(admission_date, '+' || expected_stay_days || ' days')
+        WHERE status = 'allocated' AND admission_date IS NOT NULL AND expected_stay_days
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_patients_discharge
+        ON patients (hospital_id, status, expected_discharge_date)
+        ''',
+    ]),
+    (9, 'Add trigger-maintained bed_type_stats counters for network-wide bed search', [
+        '''
+        CREATE TABLE IF NOT EXISTS bed_type_stats (
+            hospital_id TEXT NOT NULL,
+            type TEXT NOT NULL,
+            total_beds INTEGER NOT NULL DEFAULT 0,
+            available_beds INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (hospital_id, type)
+        )
+        ''',
+        # Top-k hospitals by free beds of one type
+        '''
+        CREATE INDEX IF NOT EXISTS idx_bed_type_stats_availability
+        ON bed_type_stats (type, available_beds)
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS bed_type_stats_after_insert AFTER INSERT ON beds
+        BEGIN
+            INSERT INTO bed_type_stats (hospital_id, type, total_beds, available_beds)
+            VALUES (NEW.hospital_id, NEW.type, 1, NEW.status = 'available')
+            ON CONFLICT (hospital_id, type) DO UPDATE SET
+                total_beds = total_beds + 1,
+                available_beds = available_beds + excluded.available_beds;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS bed_type_stats_after_delete AFTER DELETE ON beds
+        BEGIN
+            UPDATE bed_type_stats SET
+                total_beds = total_beds - 1,
+                available_beds = available_beds - (OLD.status = 'available')
+            WHERE hospital_id = OLD.hospital_id AND type = OLD.type;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS bed_type_stats_after_update
+        AFTER UPDATE OF hospital_id, type, status ON beds
+        BEGIN
+            UPDATE bed_type_stats SET
+                total_beds = total_beds - 1,
+                available_beds = available_beds - (OLD.status = 'available')
+            WHERE hospital_id = OLD.hospital_id AND type = OLD.type;
+            INSERT INTO bed_type_stats (hospital_id, type, total_beds, available_beds)
+            VALUES (NEW.hospital_id, NEW.type, 1, NEW.status = 'available')
+            ON CONFLICT (hospital_id, type) DO UPDATE SET
+                total_beds = total_beds + 1,
+                available_beds = available_beds + excluded.available_beds;
+        END
+        ''',
+        '''
+        INSERT OR REPLACE INTO bed_type_stats (hospital_id, type, total_beds, available_beds)
+        ''' + BED_TYPE_STATS_QUERY,
+    ]),
+    (10, 'Add the append-only bed_events log, seeded from admission and discharge dates', [
+        '''
+        CREATE TABLE IF NOT EXISTS bed_events (
+            id INTEGER PRIMARY KEY,
+            hospital_id TEXT NOT NULL,
+            bed_id TEXT NOT NULL,
+            patient_id TEXT,
+            event_type TEXT NOT NULL,
+            occurred_at TEXT NOT NULL
+        )
+        ''',
+        # Time-range queries per hospital, and the history of one bed
+        '''
+        CREATE INDEX IF NOT EXISTS idx_bed_events_time
+        ON bed_events (hospital_id, occurred_at)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_bed_events_bed
+        ON bed_events (hospital_id, bed_id, occurred_at)
+        ''',
+        # Earlier stays only have dates, so their events are placed at midnight
+        '''
+        INSERT INTO bed_events (hospital_id, bed_id, patient_id, event_type, occurred_at)
+        SELECT hospital_id, bed_id, id, event_type, occurred_at FROM (
+            SELECT hospital_id, bed_id, id, 'admitted' AS event_type, admission_date || ' 00:00:00' AS occurred_at
+            FROM patients
+            WHERE bed_id IS NOT NULL AND admission_date IS NOT NULL AND status IN ('allocated', 'discharged')
+            UNION ALL
+            SELECT hospital_id, bed_id, id, 'discharged', discharge_date || ' 00:00:00'
+            FROM patients
+            WHERE bed_id IS NOT NULL AND discharge_date IS NOT NULL AND status = 'discharged'
+        )
+        WHERE hospital_id IS NOT NULL
+        ORDER BY occurred_at, event_type
+        ''',
+    ]),
+    (11, 'Add hourly and daily utilization rollups, backfilled from bed_events', [
+        rollup_table('utilization_hourly'),
+        rollup_table('utilization_daily'),
+        lambda cursor: rebuild_rollups(cursor),
+    ]),
+    (12, 'Add patients_archive for long-discharged patients', [
+        '''
+        CREATE TABLE IF NOT EXISTS patients_archive (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            age INTEGER NOT NULL,
+            blood_group TEXT NOT NULL,
+            condition TEXT NOT NULL,
+            severity TEXT NOT NULL,
+            health_risk TEXT NOT NULL,
+            doctor_recommendation TEXT NOT NULL,
+            priority_score INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            bed_id TEXT,
+            admission_date TEXT,
+            discharge_date TEXT,
+            expected_stay_days INTEGER,
+            hospital_id TEXT,
+            extended_stay INTEGER DEFAULT 0,
+            waiting_since TEXT,
+            expected_discharge_date TEXT,
+            archived_at TEXT NOT NULL
+        )
+        ''',
+        # Same shape as idx_patients_listing, so archived history pages merge with live rows
+        '''
+        CREATE INDEX IF NOT EXISTS idx_patients_archive_listing
+        ON patients_archive (hospital_id, status, admission_date, id)
+        ''',
+        # Only discharged rows are indexed, oldest first, to pick each archival batch
+        '''
+        CREATE INDEX IF NOT EXISTS idx_patients_archivable
+        ON patients (discharge_date) WHERE status = 'discharged'
+        ''',
+    ]),
+    (13, 'Add network_bed_stats, the catalog copy of every shard\'s bed_type_stats', [
+        '''
+        CREATE TABLE IF NOT EXISTS network_bed_stats (
+            hospital_id TEXT NOT NULL,
+            type TEXT NOT NULL,
+            total_beds INTEGER NOT NULL DEFAULT 0,
+            available_beds INTEGER NOT NULL DEFAULT 0,
+            version INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (hospital_id, type)
+        )
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_network_bed_stats_availability
+        ON network_bed_stats (type, available_beds)
+        ''',
+    ]),
+]
+
+def migrate_db(conn):
+    """Upgrade the schema in place to the latest migration"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('SELECT MAX(version) FROM schema_version')
+    current = cursor.fetchone()[0] or 0
+    
+    for version, description, steps in MIGRATIONS:
+        if version <= current:
+            continue
+        
+        # Each migration is applied atomically
+        cursor.execute('BEGIN')
+        try:
+            for step in steps:
+                if callable(step):
+                    step(cursor)
+                else:
+                    cursor.execute(step)
+            cursor.execute('''
+                INSERT INTO schema_version (version, description, applied_at)
+                VALUES (?, ?, ?)
+            ''', (version, description, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        current = version
+    
+    return current
+
+# Hot queries that must be answered from an index, checked by `flask check-indexes`.
+# Built from the same constants and builders the routes run, with sample
+# parameters, so every filter combination a route can produce is covered.
+def indexed_queries():
+    """Map a name to (sql, params) for every hot query shape"""
+    queries = {
+        'bed_index load': (BED_INDEX_LOAD_QUERY, ('HOSP001',)),
+        'free beds': (FREE_BEDS_QUERY, ('HOSP001',)),
+        'free bed of type': (FREE_BED_OF_TYPE_QUERY, ('HOSP001', 'icu')),
+        'waiting patients': (WAITING_PATIENTS_QUERY, ('HOSP001',)),
+        'upcoming_discharges': (UPCOMING_DISCHARGES_QUERY, ('HOSP001', '2024-01-02')),
+        'allocation_plan discharging beds': (DISCHARGING_BEDS_QUERY, ('HOSP001', '2024-01-02')),
+        'rollup admission lookup': (ADMISSION_TIME_QUERY,
+                                    ('HOSP001', 'HOSP001_ICU001', '2024-01-01 00:00:00', 'PAT100')),
+        'dashboard_data stats': (DASHBOARD_STATS_QUERY, ('HOSP001',)),
+        'dashboard_data recent_patients': (RECENT_PATIENTS_QUERY, ('HOSP001',)),
+        'archive batch': (ARCHIVE_BATCH_QUERY, ('2024-01-01', 1000)),
+    }
+    for table in ('bed_type_stats', 'network_bed_stats'):
+        queries[f'network top {table}'] = (network_top_query(table), ('icu', 1, 10))
+    for table in ROLLUP_TABLES.values():
+        queries[f'rollup latest {table}'] = (latest_rollup_query(table), ('HOSP001', 'icu'))
+        queries[f'rollup latest before {table}'] = (latest_rollup_query(table, before=True),
+                                                    ('HOSP001', 'icu', '2024-01-01 00:00'))
+        queries[f'analytics range {table}'] = (rollup_range_query(table), ('HOSP001', '2024-01-01', '2024-01-07'))
+    
+    # Listings, with every subset of their filters, whole and as a keyset page
+    bed_filters = {'type': 'icu', 'ward': 'ICU', 'status': 'available'}
+    for size in range(len(BED_LISTING_FILTERS) + 1):
+        for columns in itertools.combinations(BED_LISTING_FILTERS, size):
+            filters = {column: bed_filters[column] for column in columns}
+            pages = {'': (None, None), ' page': ([filters.get('type', 'general'), 'HOSP001_BED050'], 50)}
+            for suffix, (after, limit) in pages.items():
+                queries[f"available_beds {'+'.join(columns) or 'all'}{suffix}"] = bed_listing_query(
+                    'HOSP001', filters, after, limit)
+    
+    pages = {'': (None, None), ' page': (['2024-01-01', 'PAT100'], 50)}
+    for bed_type in (None, 'icu'):
+        for include_archived in (False, True):
+            for suffix, (after, limit) in pages.items():
+                name = ('allocated_patients' + (' type' if bed_type else '')
+                        + (' archived' if include_archived else '') + suffix)
+                queries[name] = patient_listing_query('HOSP001', 'allocated', bed_type, after, limit,
+                                                      include_archived)
+    
+    pages = {'': (None, None), ' page': (['2024-01-01 00:00:00', 100], 50)}
+    event_filters = {'bed_id': 'HOSP001_ICU001', 'from': '2024-01-01', 'to': '2024-02-01', 'type': 'admitted'}
+    names = [name for name, _ in BED_EVENT_FILTERS]
+    for size in range(len(names) + 1):
+        for columns in itertools.combinations(names, size):
+            for suffix, (after, limit) in pages.items():
+                filters = {name: event_filters[name] for name in columns}
+                queries[f"bed_events {'+'.join(columns) or 'all'}{suffix}"] = bed_event_query(
+                    'HOSP001', filters, after, limit)
+    return queries
+
+def check_query_plans(conn):
+    """Return (name, plan) for every hot query that is not served by an index"""
+    cursor = conn.cursor()
+    problems = []
+    for name, (query, params) in indexed_queries().items():
+        cursor.execute('EXPLAIN QUERY PLAN ' + query, params)
+        plan = [row[3] for row in cursor.fetchall()]
+        for detail in plan:
+            full_scan = detail.startswith('SCAN') and 'INDEX' not in detail
+            if full_scan or 'TEMP B-TREE' in detail:
+                problems.append((name, plan))
+                break
+    return problems
+
+def reconcile_bed_stats(conn, repair=True):
+    """Recompute bed counters from the beds table, returning hospitals whose counters were wrong"""
+    cursor = conn.cursor()
+    cursor.execute(BED_STATS_QUERY)
+    expected = {row[0]: row[1:] for row in cursor.fetchall()}
+    cursor.execute('''
+        SELECT hospital_id, total_beds, available_beds, icu_beds, flexible_beds, occupied_beds
+        FROM bed_stats
     ''')
+    actual = {row[0]: row[1:] for row in cursor.fetchall()}
+    
+    empty = (0, 0, 0, 0, 0)
+    mismatched = {
+        hospital_id for hospital_id in expected.keys() | actual.keys()
+        if tuple(expected.get(hospital_id, empty)) != tuple(actual.get(hospital_id, empty))
+    }
+    
+    # Per-type counters; rows for types a hospital no longer has may remain at zero
+    cursor.execute(BED_TYPE_STATS_QUERY)
+    expected = {row[:2]: row[2:] for row in cursor.fetchall()}
+    cursor.execute('SELECT hospital_id, type, total_beds, available_beds FROM bed_type_stats')
+    actual = {row[:2]: row[2:] for row in cursor.fetchall()}
+    mismatched.update(
+        key[0] for key in expected.keys() | actual.keys()
+        if tuple(expected.get(key, (0, 0))) != tuple(actual.get(key, (0, 0)))
+    )
+    mismatched = sorted(mismatched)
+    
+    if repair and mismatched:
+        run_write(rebuild_bed_stats, mismatched, conn=conn)
+    return mismatched
+
+def rebuild_bed_stats(tx, hospital_ids):
+    """Replace the counters of the given hospitals with freshly computed ones"""
+    cursor = tx.cursor
+    tx.beds_changed.update(hospital_ids)
+    cursor.executemany('DELETE FROM bed_stats WHERE hospital_id = ?', [(hid,) for hid in hospital_ids])
+    cursor.executemany('''
+        INSERT INTO bed_stats
+            (hospital_id, total_beds, available_beds, icu_beds, flexible_beds, occupied_beds)
+        SELECT 
+            hospital_id,
+            COUNT(*),
+            SUM(CASE WHEN status = 'available' THEN 1 ELSE 0 END),
+            SUM(CASE WHEN type = 'icu' THEN 1 ELSE 0 END),
+            SUM(CASE WHEN type = 'flexible' THEN 1 ELSE 0 END),
+            SUM(CASE WHEN status = 'occupied' THEN 1 ELSE 0 END)
+        FROM beds 
+        WHERE hospital_id = ?
+        GROUP BY hospital_id
+    ''', [(hid,) for hid in hospital_ids])
+    cursor.executemany('DELETE FROM bed_type_stats WHERE hospital_id = ?', [(hid,) for hid in hospital_ids])
+    cursor.executemany('''
+        INSERT INTO bed_type_stats (hospital_id, type, total_beds, available_beds)
+        SELECT hospital_id, type, COUNT(*), SUM(CASE WHEN status = 'available' THEN 1 ELSE 0 END)
+        FROM beds
+        WHERE hospital_id = ?
+        GROUP BY hospital_id, type
+    ''', [(hid,) for hid in hospital_ids])
+
+# Columns moved from patients into patients_archive
+ARCHIVED_COLUMNS = ('id', 'name', 'age', 'blood_group', 'condition', 'severity', 'health_risk',
+                    'doctor_recommendation', 'priority_score', 'status', 'bed_id', 'admission_date',
+                    'discharge_date', 'expected_stay_days', 'hospital_id', 'extended_stay',
+                    'waiting_since', 'expected_discharge_date')
+
+def archive_cutoff(days):
+    """Discharge date before which patients are archived"""
+    return (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+
+# Oldest discharged patients first, from the partial idx_patients_archivable
+ARCHIVE_BATCH_QUERY = '''
+    SELECT id FROM patients
+    WHERE status = 'discharged' AND discharge_date < ?
+    ORDER BY discharge_date
+    LIMIT ?
+'''
+
+def archive_patients(tx, cutoff, batch):
+    """Move up to batch patients discharged before cutoff into patients_archive, returning how many moved"""
+    cursor = tx.cursor
+    cursor.execute(ARCHIVE_BATCH_QUERY, (cutoff, batch))
+    patient_ids = [row[0] for row in cursor.fetchall()]
+    
+    columns = ', '.join(ARCHIVED_COLUMNS)
+    archived_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    for chunk in chunked(patient_ids, 500):
+        placeholders = ', '.join('?' * len(chunk))
+        cursor.execute(f'''
+            INSERT OR REPLACE INTO patients_archive ({columns}, archived_at)
+            SELECT {columns}, ? FROM patients WHERE id IN ({placeholders})
+        ''', [archived_at] + chunk)
+        cursor.execute(f'DELETE FROM patients WHERE id IN ({placeholders})', chunk)
+    return len(patient_ids)
+
+def archive_discharged(conn, days, batch):
+    """Archive every patient discharged more than days ago, one batch per transaction"""
+    cutoff = archive_cutoff(days)
+    archived = 0
+    while True:
+        moved = run_write(archive_patients, cutoff, batch, conn=conn)
+        archived += moved
+        if moved < batch:
+            return archived
+
+def is_archived(cursor, patient_id, hospital_id):
+    """Whether a hospital's patient has been moved to patients_archive"""
+    cursor.execute('SELECT 1 FROM patients_archive WHERE id = ? AND hospital_id = ?', (patient_id, hospital_id))
+    return cursor.fetchone() is not None
+
+# Database setup
+def init_db():
+    """Create database and tables if they don't exist"""
+    conn = connect_db()
+    migrate_db(conn)
+    cursor = conn.cursor()
     
     # Add sample hospital if none exists
     cursor.execute("SELECT COUNT(*) FROM hospitals")
     if cursor.fetchone()[0] == 0:
-        cursor.execute('''
-            INSERT INTO hospitals (id, name, address, contact, total_beds, icu_beds, password)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
+        hospital = (
             'HOSP001',
             'Apollo Hospital, Chennai',
             '21, Greams Lane, Chennai',
@@ -80,45 +1540,216 @@ def init_db():
             150,
             20,
             'password123'
-        ))
+        )
+        insert_hospital(cursor, hospital)
+        
+        if app.config['SHARD_DIR']:
+            conn.commit()
+            shard = create_shard(hospital)
+        else:
+            shard = conn
         
         # Create sample beds
-        create_sample_beds(conn, 'HOSP001', 150, 20)
+        create_sample_beds(shard, 'HOSP001', 150, 20)
         
         # Add some sample patients
-        create_sample_patients(conn, 'HOSP001')
+        create_sample_patients(shard, 'HOSP001')
+        
+        shard.commit()
+        if shard is not conn:
+            conn.commit()
+            run_write(store_bed_stats, bed_stats_snapshot(shard.cursor(), ['HOSP001']), conn=conn)
+            shard.close()
     
     conn.commit()
     conn.close()
 
+def insert_hospital(cursor, hospital):
+    """Insert an (id, name, address, contact, total_beds, icu_beds, password) hospital row"""
+    cursor.execute('''
+        INSERT INTO hospitals (id, name, address, contact, total_beds, icu_beds, password)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', hospital)
+
+def create_shard(hospital):
+    """Open the shard of a hospital, creating its schema and recording the hospital in it"""
+    os.makedirs(app.config['SHARD_DIR'], exist_ok=True)
+    conn = connect_db(shard_path(hospital[0]))
+    migrate_db(conn)
+    # The catalog owns the id and the password; a copy left by an earlier failed registration is replaced
+    conn.execute('''
+        INSERT OR REPLACE INTO hospitals (id, name, address, contact, total_beds, icu_beds, password)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', hospital[:6] + (SHARD_PASSWORD,))
+    return conn
+
+def split_database(source, target_dir):
+    """Copy a single-file database into a catalog and one shard per hospital under target_dir"""
+    os.makedirs(target_dir, exist_ok=True)
+    source_conn = connect_db(source)
+    migrate_db(source_conn)
+    source_conn.close()
+    
+    catalog = connect_db(os.path.join(target_dir, CATALOG_FILE))
+    migrate_db(catalog)
+    copy_rows(catalog, source, 'hospitals')
+    copy_rows(catalog, source, 'id_sequences', replace=True)
+    hospital_ids = [row[0] for row in catalog.execute('SELECT id FROM hospitals ORDER BY id')]
+    catalog.close()
+    
+    counts = []
+    for hospital_id in hospital_ids:
+        shard = connect_db(os.path.join(target_dir, shard_file(hospital_id)))
+        migrate_db(shard)
+        copy_rows(shard, source, 'hospitals', 'id = ?', (hospital_id,))
+        clear_shard_passwords(shard)
+        beds = copy_rows(shard, source, 'beds', 'hospital_id = ?', (hospital_id,))
+        patients = copy_rows(shard, source, 'patients', 'hospital_id = ?', (hospital_id,))
+        copy_rows(shard, source, 'patients_archive', 'hospital_id = ?', (hospital_id,))
+        copy_rows(shard, source, 'bed_events', 'hospital_id = ?', (hospital_id,))
+        for table in ROLLUP_TABLES.values():
+            copy_rows(shard, source, table, 'hospital_id = ?', (hospital_id,))
+        shard.close()
+        counts.append((hospital_id, beds, patients))
+    
+    catalog = connect_db(os.path.join(target_dir, CATALOG_FILE))
+    refresh_network_stats(catalog, [os.path.join(target_dir, shard_file(hospital_id)) for hospital_id in hospital_ids])
+    catalog.close()
+    return counts
+
+def clear_shard_passwords(conn):
+    """Replace the passwords copied into a shard's hospitals table with the placeholder"""
+    conn.execute('UPDATE hospitals SET password = ? WHERE password != ?', (SHARD_PASSWORD, SHARD_PASSWORD))
+    conn.commit()
+
+def copy_rows(conn, source, table, where='1', params=(), replace=False):
+    """Copy the matching rows of a table from another database file, returning how many were copied"""
+    columns = ', '.join(row[1] for row in conn.execute(f'PRAGMA table_info({table})'))
+    conn.execute('ATTACH DATABASE ? AS source', (source,))
+    try:
+        cursor = conn.execute(f'''
+            INSERT {'OR REPLACE' if replace else ''} INTO main.{table} ({columns})
+            SELECT {columns} FROM source.{table} WHERE {where}
+        ''', params)
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        conn.execute('DETACH DATABASE source')
+
 def create_sample_beds(conn, hospital_id, total_beds, icu_beds):
     """Create sample beds for a hospital"""
-    cursor = conn.cursor()
-    
-    # Create general beds
+    return insert_beds(conn.cursor(), sample_bed_rows(hospital_id, total_beds, icu_beds))
+
+def sample_bed_rows(hospital_id, total_beds, icu_beds):
+    """Generate (id, hospital_id, type, ward) rows for the default bed layout"""
+    # General beds
     for i in range(1, total_beds - icu_beds + 1):
-        bed_id = f"{hospital_id}_BED{i:03d}"
-        cursor.execute('''
-            INSERT OR IGNORE INTO beds (id, hospital_id, type, ward, status)
-            VALUES (?, ?, 'general', ?, 'available')
-        ''', (bed_id, hospital_id, 'Ward A' if i % 2 == 0 else 'Ward B'))
+        yield (f"{hospital_id}_BED{i:03d}", hospital_id, 'general', 'Ward A' if i % 2 == 0 else 'Ward B')
     
-    # Create ICU beds
+    # ICU beds
     for i in range(1, icu_beds + 1):
-        bed_id = f"{hospital_id}_ICU{i:03d}"
-        cursor.execute('''
-            INSERT OR IGNORE INTO beds (id, hospital_id, type, ward, status)
-            VALUES (?, ?, 'icu', ?, 'available')
-        ''', (bed_id, hospital_id, 'ICU Unit 1'))
+        yield (f"{hospital_id}_ICU{i:03d}", hospital_id, 'icu', 'ICU Unit 1')
     
-    # Create flexible beds (20% of total beds)
-    flexible_beds = int(total_beds * 0.2)
-    for i in range(1, flexible_beds + 1):
-        bed_id = f"{hospital_id}_FLEX{i:03d}"
-        cursor.execute('''
+    # Flexible beds (20% of total beds)
+    for i in range(1, int(total_beds * 0.2) + 1):
+        yield (f"{hospital_id}_FLEX{i:03d}", hospital_id, 'flexible', 'Flex Care Unit')
+
+def insert_beds(cursor, rows):
+    """Bulk insert (id, hospital_id, type, ward) rows as available beds, returning how many were new"""
+    created = 0
+    for chunk in chunked(rows, app.config['BED_IMPORT_CHUNK']):
+        cursor.executemany('''
             INSERT OR IGNORE INTO beds (id, hospital_id, type, ward, status)
-            VALUES (?, ?, 'flexible', ?, 'available')
-        ''', (bed_id, hospital_id, 'Flex Care Unit'))
+            VALUES (?, ?, ?, ?, 'available')
+        ''', chunk)
+        created += cursor.rowcount
+    return created
+
+def chunked(iterable, size):
+    """Split an iterable into lists of at most size items without materializing it"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+BED_TYPES = ('general', 'icu', 'flexible')
+
+def read_bed_inventory(stream, fmt):
+    """Validated (id, type, ward) records from a CSV, JSON or JSON Lines bed inventory"""
+    if fmt == 'csv':
+        records = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig'))
+    elif fmt == 'jsonl':
+        records = (json.loads(line) for line in io.TextIOWrapper(stream, encoding='utf-8') if line.strip())
+    elif fmt == 'json':
+        try:
+            records = json.load(io.TextIOWrapper(stream, encoding='utf-8-sig'))
+        except json.JSONDecodeError as e:
+            raise ValueError(f'Invalid JSON inventory: {e}')
+        # Either a list of beds or an object with one under "beds"
+        if isinstance(records, dict):
+            records = records.get('beds')
+        if not isinstance(records, list):
+            raise ValueError('Invalid JSON inventory: expected a list of beds')
+    else:
+        raise ValueError(f'Unsupported inventory format: {fmt}')
+    
+    for line, record in enumerate(records, 1):
+        if not isinstance(record, dict):
+            raise ValueError(f'Bed {line}: expected an object with id, type and ward')
+        for field in ('id', 'type', 'ward'):
+            if record.get(field) is not None and not isinstance(record[field], str):
+                raise ValueError(f'Bed {line}: {field} must be a string')
+        bed_id = (record.get('id') or '').strip()
+        bed_type = (record.get('type') or '').strip().lower()
+        if not bed_id:
+            raise ValueError(f'Bed {line}: missing id')
+        if bed_type not in BED_TYPES:
+            raise ValueError(f"Bed {line}: type must be one of {', '.join(BED_TYPES)}")
+        yield bed_id, bed_type, (record.get('ward') or '').strip() or None
+
+def inventory_format(filename, content_type=None):
+    """Guess the inventory format from a file name or content type"""
+    name = (filename or '').lower()
+    content_type = content_type or ''
+    if name.endswith('.csv') or 'csv' in content_type:
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson')) or 'ndjson' in content_type:
+        return 'jsonl'
+    if name.endswith('.json') or 'json' in content_type:
+        return 'json'
+    return None
+
+def import_beds(tx, hospital_id, records):
+    """Insert validated inventory records as available beds of a hospital, reporting IDs already in use"""
+    cursor = tx.cursor
+    cursor.execute('SELECT 1 FROM hospitals WHERE id = ?', (hospital_id,))
+    if not cursor.fetchone():
+        raise ValueError(f'Unknown hospital {hospital_id}')
+    
+    # Bed IDs are the beds table's primary key, so an ID already used by any hospital in this database is skipped
+    skipped, seen, rows = [], set(), []
+    for chunk in chunked(records, 500):
+        cursor.execute(f'''
+            SELECT id FROM beds
+            WHERE id IN ({', '.join('?' * len(chunk))})
+        ''', [bed_id for bed_id, _, _ in chunk])
+        taken = {row[0] for row in cursor.fetchall()}
+        for bed_id, bed_type, ward in chunk:
+            if bed_id in taken or bed_id in seen:
+                skipped.append(bed_id)
+            else:
+                seen.add(bed_id)
+                rows.append((bed_id, hospital_id, bed_type, ward))
+    
+    created = insert_beds(cursor, rows)
+    tx.beds_changed.add(hospital_id)
+    tx.on_commit(bed_index.invalidate, hospital_id)
+    tx.on_commit(events.publish, hospital_id, 'beds_changed', {'created': created})
+    return {'created': created, 'skipped': skipped}
 
 def create_sample_patients(conn, hospital_id):
     """Create some sample patients for demonstration"""
@@ -164,8 +1795,9 @@ def create_sample_patients(conn, hospital_id):
         }
     ]
     
-    for i, patient_data in enumerate(sample_patients, 1):
-        patient_id = f"PAT{i:03d}"
+    events = []
+    for patient_data in sample_patients:
+        patient_id = next_patient_id(cursor)
         
         # Calculate priority score
         priority_score = calculate_priority_score(
@@ -178,8 +1810,9 @@ def create_sample_patients(conn, hospital_id):
         cursor.execute('''
             INSERT INTO patients (id, name, age, blood_group, condition, severity, 
                                 health_risk, doctor_recommendation, priority_score, 
-                                status, bed_id, admission_date, expected_stay_days, hospital_id, extended_stay)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'allocated', ?, ?, ?, ?, ?)
+                                status, bed_id, admission_date, expected_stay_days, hospital_id, extended_stay,
+                                expected_discharge_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'allocated', ?, ?, ?, ?, ?, ?)
         ''', (
             patient_id,
             patient_data['name'],
@@ -194,7 +1827,8 @@ def create_sample_patients(conn, hospital_id):
             patient_data['admission_date'],
             patient_data['expected_stay'],
             hospital_id,
-            patient_data.get('extended_stay', 0)
+            patient_data.get('extended_stay', 0),
+            calculate_expected_discharge(patient_data['admission_date'], patient_data['expected_stay'])
         ))
         
         # Update bed status
@@ -203,6 +1837,10 @@ def create_sample_patients(conn, hospital_id):
             SET status = 'occupied', patient_id = ?, last_occupied_date = ?
             WHERE id = ?
         ''', (patient_id, patient_data['admission_date'], patient_data['bed_id']))
+        events.append((hospital_id, patient_data['bed_id'], patient_id, 'admitted',
+                       patient_data['admission_date'] + ' 00:00:00'))
+    
+    write_bed_events(cursor, events)
 
 def calculate_priority_score(severity, health_risk, doctor_recommendation):
     """Calculate priority score for patient"""
@@ -217,25 +1855,442 @@ def calculate_priority_score(severity, health_risk, doctor_recommendation):
     
     return score
 
-# Routes
-@app.route('/')
-def home():
-    return render_template('index.html')
+def calculate_expected_stay(severity, doctor_recommendation):
+    """Calculate expected stay in days based on severity"""
+    expected_stay = 3  # default for general
+    if severity == 'high':
+        expected_stay = 7
+    elif severity == 'medium':
+        expected_stay = 5
+    elif doctor_recommendation == 'flexible':
+        expected_stay = 2  # Flexible beds: 2 days initial
+    return expected_stay
 
-@app.route('/login', methods=['POST'])
-def login():
-    """Handle hospital login"""
-    data = request.json
-    hospital_id = data.get('hospital_id')
-    password = data.get('password')
-    
-    conn = sqlite3.connect('hospital.db')
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT * FROM hospitals WHERE id = ? AND password = ?', (hospital_id, password))
-    hospital = cursor.fetchone()
-    conn.close()
-    
+# Every bed of a hospital, ids descending so each free-list pops its lowest id first
+BED_INDEX_LOAD_QUERY = '''
+    SELECT id, type, ward, status FROM beds
+    WHERE hospital_id = ?
+    ORDER BY type DESC, id DESC
+'''
+
+# Free beds of a hospital
+FREE_BEDS_QUERY = '''
+    SELECT id, type, ward FROM beds
+    WHERE hospital_id = ? AND status = 'available'
+'''
+
+# Whether a hospital has any free bed of a type, from idx_beds_availability
+FREE_BED_OF_TYPE_QUERY = '''
+    SELECT 1 FROM beds
+    WHERE hospital_id = ? AND type = ? AND status = 'available'
+    LIMIT 1
+'''
+
+# Waiting patients of a hospital, in no particular order
+WAITING_PATIENTS_QUERY = '''
+    SELECT id, doctor_recommendation, priority_score, waiting_since, expected_stay_days
+    FROM patients
+    WHERE hospital_id = ? AND status = 'waiting'
+'''
+
+# In-memory bed availability index
+class BedAvailabilityIndex:
+    """Free-lists of bed ids per hospital, bed type and ward, so a bed is picked in O(wards)"""
+
+    def __init__(self, verify_interval):
+        self.verify_interval = verify_interval
+        self._free = {}       # hospital_id -> {bed_type: {ward: [bed_id, ...]}}, next bed at the end
+        self._counts = {}     # hospital_id -> {bed_type: {ward: free beds}}
+        self._available = {}  # hospital_id -> set of free bed ids (entries in _free not here are stale)
+        self._beds = {}       # hospital_id -> {bed_id: (bed_type, ward)}
+        self._verified = {}   # hospital_id -> time of the last check against the beds table
+        self._lock = threading.Lock()
+
+    def _load(self, cursor, hospital_id):
+        """Build the free-lists of one hospital from the beds table"""
+        cursor.execute(BED_INDEX_LOAD_QUERY, (hospital_id,))
+        free, counts, available, beds = {}, {}, set(), {}
+        for bed_id, bed_type, ward, status in cursor.fetchall():
+            beds[bed_id] = (bed_type, ward)
+            if status == 'available':
+                free.setdefault(bed_type, {}).setdefault(ward, []).append(bed_id)
+                type_counts = counts.setdefault(bed_type, {})
+                type_counts[ward] = type_counts.get(ward, 0) + 1
+                available.add(bed_id)
+        self._free[hospital_id] = free
+        self._counts[hospital_id] = counts
+        self._available[hospital_id] = available
+        self._beds[hospital_id] = beds
+        self._verified[hospital_id] = time.monotonic()
+
+    def load(self, cursor, hospital_id=None):
+        """Load one hospital, or every hospital when none is given"""
+        if hospital_id is None:
+            cursor.execute('SELECT id FROM hospitals')
+            hospital_ids = [row[0] for row in cursor.fetchall()]
+        else:
+            hospital_ids = [hospital_id]
+        with self._lock:
+            for hid in hospital_ids:
+                self._load(cursor, hid)
+
+    def invalidate(self, hospital_id):
+        """Forget a hospital so it is reloaded on next use"""
+        with self._lock:
+            self._free.pop(hospital_id, None)
+            self._counts.pop(hospital_id, None)
+            self._available.pop(hospital_id, None)
+            self._beds.pop(hospital_id, None)
+            self._verified.pop(hospital_id, None)
+
+    def _ensure(self, cursor, hospital_id):
+        if hospital_id not in self._free:
+            self._load(cursor, hospital_id)
+        elif time.monotonic() - self._verified[hospital_id] > self.verify_interval:
+            self._verify(cursor, hospital_id)
+
+    def _verify(self, cursor, hospital_id):
+        """Compare against the beds table and rebuild on divergence"""
+        cursor.execute(FREE_BEDS_QUERY, (hospital_id,))
+        actual = {row[0] for row in cursor.fetchall()}
+        if actual != self._available[hospital_id]:
+            self._load(cursor, hospital_id)
+            return False
+        self._verified[hospital_id] = time.monotonic()
+        return True
+
+    def verify(self, cursor, hospital_id):
+        """Check a hospital against the beds table now, returning whether it had to be rebuilt"""
+        with self._lock:
+            if hospital_id not in self._free:
+                self._load(cursor, hospital_id)
+                return False
+            return not self._verify(cursor, hospital_id)
+
+    def acquire(self, cursor, hospital_id, bed_type, policy=None, ward=None):
+        """Take a free bed of the given type off the index, in the ward policy picks, or None"""
+        policy = policy or first_fit
+        with self._lock:
+            self._ensure(cursor, hospital_id)
+            bed_id = self._take(hospital_id, bed_type, policy, ward)
+            if bed_id is None:
+                # Beds freed or added by another process reach the index only at the next
+                # check, so confirm with the beds table before the patient is waitlisted
+                cursor.execute(FREE_BED_OF_TYPE_QUERY, (hospital_id, bed_type))
+                if cursor.fetchone():
+                    self._load(cursor, hospital_id)
+                    bed_id = self._take(hospital_id, bed_type, policy, ward)
+            return bed_id
+
+    def _take(self, hospital_id, bed_type, policy, ward):
+        """Pop the next free bed of the type from the free-lists, or None"""
+        wards = self._free[hospital_id].get(bed_type, {})
+        counts = self._counts[hospital_id].get(bed_type, {})
+        available = self._available[hospital_id]
+        while True:
+            choices = {w: (counts[w], beds[-1]) for w, beds in wards.items() if beds and counts.get(w)}
+            if not choices:
+                return None
+            chosen = policy(choices, ward)
+            bed_id = wards[chosen].pop()
+            if bed_id in available:
+                available.discard(bed_id)
+                counts[chosen] -= 1
+                return bed_id
+
+    def release(self, hospital_id, bed_id):
+        """Put a bed back on its free-list after a discharge or a failed allocation"""
+        with self._lock:
+            if hospital_id not in self._free:
+                return  # loaded fresh from the table on next use
+            bed = self._beds[hospital_id].get(bed_id)
+            available = self._available[hospital_id]
+            if bed is None or bed_id in available:
+                return
+            bed_type, ward = bed
+            available.add(bed_id)
+            self._free[hospital_id].setdefault(bed_type, {}).setdefault(ward, []).append(bed_id)
+            type_counts = self._counts[hospital_id].setdefault(bed_type, {})
+            type_counts[ward] = type_counts.get(ward, 0) + 1
+
+# Allocation policies choose the ward a bed is taken from. Each gets
+# {ward: (free beds, next free bed id)} for the wards of the wanted type
+# that have room, plus the ward the patient asked for, if any.
+def first_fit(choices, ward):
+    """The lowest-numbered free bed of the type, whichever ward it is in"""
+    return min(choices, key=lambda w: choices[w][1])
+
+def best_fit(choices, ward):
+    """The requested ward if it has room, otherwise the fullest ward that does, keeping emptier wards whole"""
+    if ward is not None and ward in choices:
+        return ward
+    return min(choices, key=lambda w: choices[w])
+
+ALLOCATION_POLICIES = {'first-fit': first_fit, 'best-fit': best_fit}
+
+bed_index = BedAvailabilityIndex(app.config['BED_INDEX_VERIFY_INTERVAL'])
+
+# Waiting list scheduler
+class WaitingList:
+    """Heaps of waiting patients per hospital and bed type, highest priority and earliest arrival first"""
+
+    def __init__(self):
+        self._queues = {}   # hospital_id -> {bed_type: [(-priority_score, waiting_since, patient_id, bed_type)]}
+        self._waiting = {}  # hospital_id -> {patient_id: heap entry}; heap entries not here are stale
+        self._lock = threading.Lock()
+
+    def _load(self, cursor, hospital_id):
+        """Build the queues of one hospital from its waiting patients"""
+        cursor.execute(WAITING_PATIENTS_QUERY, (hospital_id,))
+        queues, waiting = {}, {}
+        for patient_id, bed_type, priority_score, waiting_since, _ in cursor.fetchall():
+            entry = (-priority_score, waiting_since or '', patient_id, bed_type)
+            queues.setdefault(bed_type, []).append(entry)
+            waiting[patient_id] = entry
+        for queue in queues.values():
+            heapq.heapify(queue)
+        self._queues[hospital_id] = queues
+        self._waiting[hospital_id] = waiting
+
+    def _ensure(self, cursor, hospital_id):
+        if hospital_id not in self._queues:
+            self._load(cursor, hospital_id)
+
+    def add(self, hospital_id, patient_id, bed_type, priority_score, waiting_since):
+        """Queue a patient once their waiting-list insert has committed"""
+        with self._lock:
+            if hospital_id not in self._queues:
+                return  # picked up from the table when the hospital is loaded
+            waiting = self._waiting[hospital_id]
+            if patient_id in waiting:
+                return
+            entry = (-priority_score, waiting_since, patient_id, bed_type)
+            waiting[patient_id] = entry
+            heapq.heappush(self._queues[hospital_id].setdefault(bed_type, []), entry)
+
+    def remove(self, hospital_id, patient_id):
+        """Drop a patient who left the queue without being given a bed"""
+        with self._lock:
+            if hospital_id in self._waiting:
+                self._waiting[hospital_id].pop(patient_id, None)
+
+    def pop_for_bed(self, cursor, hospital_id, bed_type):
+        """Take the next waiting patient who can use a freed bed, returning their heap entry"""
+        with self._lock:
+            self._ensure(cursor, hospital_id)
+            queues = self._queues[hospital_id]
+            waiting = self._waiting[hospital_id]
+            
+            # A general bed can take anyone, as allocation falls back to general beds
+            candidates = list(queues) if bed_type == 'general' else [bed_type]
+            best = None
+            for candidate in candidates:
+                queue = queues.get(candidate)
+                while queue and waiting.get(queue[0][2]) is not queue[0]:
+                    heapq.heappop(queue)
+                if queue and (best is None or queue[0] < queues[best][0]):
+                    best = candidate
+            
+            if best is None:
+                return None
+            entry = heapq.heappop(queues[best])
+            del waiting[entry[2]]
+            return entry
+
+    def restore(self, hospital_id, entry):
+        """Put back a patient whose promotion was rolled back"""
+        with self._lock:
+            if hospital_id not in self._queues:
+                return
+            self._waiting[hospital_id][entry[2]] = entry
+            heapq.heappush(self._queues[hospital_id].setdefault(entry[3], []), entry)
+
+    def snapshot(self, cursor, hospital_id):
+        """Waiting patients of a hospital in the order they will be served"""
+        with self._lock:
+            self._ensure(cursor, hospital_id)
+            return sorted(self._waiting[hospital_id].values())
+
+waiting_list = WaitingList()
+
+# Change events for live ward screens
+class EventBroker:
+    """Recent bed and patient changes per hospital, replayed to /api/events subscribers"""
+
+    def __init__(self, history):
+        self.history = history
+        # Start from the clock so ids issued before a restart are never reused
+        self.first_id = self.last_id = int(time.time() * 1000)
+        self._events = {}   # hospital_id -> deque of (event_id, event_type, data)
+        self._evicted = {}  # hospital_id -> id of the newest event that fell out of the deque
+        self._condition = threading.Condition()
+
+    def publish(self, hospital_id, event_type, data):
+        """Record a committed change and wake the hospital's subscribers"""
+        with self._condition:
+            self.last_id += 1
+            events = self._events.setdefault(hospital_id, deque())
+            if len(events) >= self.history:
+                self._evicted[hospital_id] = events.popleft()[0]
+            events.append((self.last_id, event_type, data))
+            self._condition.notify_all()
+
+    def since(self, hospital_id, last_event_id):
+        """Events after last_event_id, or None if they can no longer be replayed"""
+        if last_event_id < self.first_id or last_event_id > self.last_id:
+            return None
+        if last_event_id < self._evicted.get(hospital_id, 0):
+            return None
+        return [event for event in self._events.get(hospital_id, ()) if event[0] > last_event_id]
+
+    def wait(self, hospital_id, last_event_id, timeout):
+        """Block until there are events after last_event_id or the timeout passes"""
+        with self._condition:
+            self._condition.wait_for(lambda: self.since(hospital_id, last_event_id) != [], timeout)
+            return self.since(hospital_id, last_event_id)
+
+events = EventBroker(app.config['EVENT_HISTORY'])
+
+# Conditional requests
+def versioned(view=None, period=None):
+    """Answer a hospital read API with 304 when the hospital's data version is unchanged"""
+    # Responses that also age with the clock pass period(), naming the current time bucket
+    if view is None:
+        return functools.partial(versioned, period=period)
+    
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if 'hospital_id' not in session:
+            return view(*args, **kwargs)
+        
+        hospital_id = session['hospital_id']
+        cursor = get_db().cursor()
+        cursor.execute('SELECT version FROM hospital_versions WHERE hospital_id = ?', (hospital_id,))
+        row = cursor.fetchone()
+        # Read before the data, so a concurrent change can only make the tag older than the body
+        etag = f"{hospital_id}-{row[0] if row else 0}"
+        if period:
+            etag += f"-{period()}"
+        
+        # Gzipped bodies carry their own tag, so either representation can be revalidated
+        matched = next((tag for tag in (etag, f'{etag}-gzip') if request.if_none_match.contains(tag)), None)
+        if matched:
+            response = Response(status=304)
+            etag = matched
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            if response.headers.get('Content-Encoding') == 'gzip':
+                etag += '-gzip'
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return wrapper
+
+def current_minute():
+    """Time bucket of responses that report minutes waited"""
+    return datetime.now().strftime('%Y%m%d%H%M')
+
+def current_hour():
+    """Time bucket of responses whose date windows are offset by whole hours from now"""
+    return datetime.now().strftime('%Y%m%d%H')
+
+def current_date():
+    """Time bucket of responses that count days from today"""
+    return datetime.now().strftime('%Y%m%d')
+
+# Occupancy forecasting
+def forecast_occupancy(conn, days, hospital_id=None):
+    """Project occupied and free beds per hospital, bed type and day in one vectorized pass"""
+    cursor = conn.cursor()
+    scope = 'AND p.hospital_id = ?' if hospital_id else ''
+    params = (hospital_id,) if hospital_id else ()
+    
+    cursor.execute(f'''
+        SELECT p.hospital_id, b.type, p.expected_discharge_date, p.doctor_recommendation, p.extended_stay
+        FROM patients p JOIN beds b ON b.id = p.bed_id
+        WHERE p.status = 'allocated' {scope}
+    ''', params)
+    stays = cursor.fetchall()
+    cursor.execute(f'''
+        SELECT p.hospital_id, p.doctor_recommendation, COUNT(*)
+        FROM patients p
+        WHERE p.status = 'waiting' {scope}
+        GROUP BY p.hospital_id, p.doctor_recommendation
+    ''', params)
+    waiting = cursor.fetchall()
+    cursor.execute(f'''
+        SELECT hospital_id, total_beds - icu_beds - flexible_beds, icu_beds, flexible_beds
+        FROM bed_stats {'WHERE hospital_id = ?' if hospital_id else ''}
+    ''', params)
+    capacity = {row[0]: row[1:] for row in cursor.fetchall()}
+    
+    hospitals = sorted(capacity.keys() | {row[0] for row in stays} | {row[0] for row in waiting})
+    hospital_index = {hid: i for i, hid in enumerate(hospitals)}
+    type_index = {bed_type: i for i, bed_type in enumerate(BED_TYPES)}
+    groups = len(hospitals) * len(BED_TYPES)
+    
+    # Probability that each patient still holds their bed at the end of each day
+    today = np.datetime64(datetime.now().strftime('%Y-%m-%d'), 'D')
+    day = np.arange(days)[None, :]
+    if stays:
+        hospital_col, type_col, discharge_col, recommendation_col, extended_col = zip(*stays)
+        group = (np.fromiter((hospital_index[h] for h in hospital_col), int, len(stays)) * len(BED_TYPES)
+                 + np.fromiter((type_index.get(t, 0) for t in type_col), int, len(stays)))
+        discharge = np.array([d or str(today) for d in discharge_col], dtype='datetime64[D]')
+        # Patients due today or overdue are assumed to leave by the end of today
+        remaining = np.maximum((discharge - today).astype(int), 1)[:, None]
+        # extend_stay allows flexible care patients two 2-day extensions
+        extensions_left = np.where(np.array(recommendation_col) == 'flexible',
+                                   2 - np.minimum(np.array(extended_col, dtype=int), 2), 0)[:, None]
+        p = app.config['FORECAST_EXTENSION_PROBABILITY']
+        occupied = ((day < remaining)
+                    + p * ((extensions_left >= 1) & (day >= remaining) & (day < remaining + 2))
+                    + p * p * ((extensions_left >= 2) & (day >= remaining + 2) & (day < remaining + 4)))
+        cells = (group[:, None] * days + day).ravel()
+        expected = np.bincount(cells, weights=occupied.ravel(), minlength=groups * days).reshape(groups, days)
+    else:
+        expected = np.zeros((groups, days))
+    
+    queued = np.zeros(groups)
+    for hid, bed_type, count in waiting:
+        queued[hospital_index[hid] * len(BED_TYPES) + type_index.get(bed_type, 0)] += count
+    beds = np.array([capacity.get(hid, (0, 0, 0)) for hid in hospitals], dtype=float).reshape(groups)
+    free = beds[:, None] - expected - queued[:, None]
+    
+    dates = [str(today + i) for i in range(days)]
+    forecast = {}
+    for hid in hospitals:
+        forecast[hid] = {}
+        for bed_type, t in type_index.items():
+            row = hospital_index[hid] * len(BED_TYPES) + t
+            forecast[hid][bed_type] = {
+                'beds': int(beds[row]),
+                'waiting': int(queued[row]),
+                'expected_occupied': np.round(expected[row], 2).tolist(),
+                'projected_free': np.round(free[row], 2).tolist()
+            }
+    return dates, forecast
+
+# Routes
+@app.route('/')
+def home():
+    return asset_response(static_assets.page('index.html'))
+
+@app.route('/login', methods=['POST'])
+def login():
+    """Handle hospital login"""
+    data = request.json
+    hospital_id = data.get('hospital_id')
+    password = data.get('password')
+    
+    conn = get_catalog()
+    cursor = conn.cursor()
+    
+    cursor.execute('SELECT * FROM hospitals WHERE id = ? AND password = ?', (hospital_id, password))
+    hospital = cursor.fetchone()
+    
     if hospital:
         session['hospital_id'] = hospital_id
         session['hospital_name'] = hospital[1]
@@ -255,13 +2310,12 @@ def register():
     """Handle hospital registration"""
     data = request.json
     
-    conn = sqlite3.connect('hospital.db')
+    conn = get_catalog()
     cursor = conn.cursor()
     
     # Check if hospital ID already exists
     cursor.execute('SELECT id FROM hospitals WHERE id = ?', (data.get('hospital_id'),))
     if cursor.fetchone():
-        conn.close()
         return jsonify({
             'success': False,
             'message': 'Hospital ID already exists'
@@ -269,10 +2323,7 @@ def register():
     
     try:
         # Insert new hospital
-        cursor.execute('''
-            INSERT INTO hospitals (id, name, address, contact, total_beds, icu_beds, password)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
+        hospital = (
             data['hospital_id'],
             data['name'],
             data['address'],
@@ -280,13 +2331,26 @@ def register():
             data['total_beds'],
             data['icu_beds'],
             data['password']
-        ))
-        
-        # Create beds for the hospital with unique IDs
-        create_sample_beds(conn, data['hospital_id'], data['total_beds'], data['icu_beds'])
+        )
+        # Beds go in with the hospital unless they get a shard of their own
+        sharded = bool(app.config['SHARD_DIR'])
+        if not run_write(add_hospital, hospital, not sharded, database=app.config['DATABASE']):
+            return jsonify({
+                'success': False,
+                'message': 'Hospital ID already exists'
+            })
         
-        conn.commit()
-        conn.close()
+        if sharded:
+            # The committed catalog row reserves the id while the hospital's shard is built
+            try:
+                shard = create_shard(hospital)
+                create_sample_beds(shard, data['hospital_id'], data['total_beds'], data['icu_beds'])
+                shard.commit()
+                publish_bed_stats(bed_stats_snapshot(shard.cursor(), [data['hospital_id']]))
+                shard.close()
+            except Exception:
+                run_write(remove_hospital, data['hospital_id'], database=app.config['DATABASE'])
+                raise
         
         return jsonify({
             'success': True,
@@ -295,48 +2359,62 @@ def register():
         })
         
     except Exception as e:
-        conn.rollback()
-        conn.close()
         return jsonify({
             'success': False,
             'message': f'Registration failed: {str(e)}'
         })
 
+def add_hospital(tx, hospital, with_beds):
+    """Register a hospital and optionally its default beds, returning False if the id is taken"""
+    cursor = tx.cursor
+    cursor.execute('SELECT id FROM hospitals WHERE id = ?', (hospital[0],))
+    if cursor.fetchone():
+        return False
+    insert_hospital(cursor, hospital)
+    if with_beds:
+        # Create beds for the hospital with unique IDs
+        insert_beds(cursor, sample_bed_rows(hospital[0], hospital[4], hospital[5]))
+    return True
+
+def remove_hospital(tx, hospital_id):
+    """Withdraw a registration whose shard could not be created"""
+    tx.cursor.execute('DELETE FROM hospitals WHERE id = ?', (hospital_id,))
+
+# Trigger-maintained bed counters of a hospital
+DASHBOARD_STATS_QUERY = '''
+    SELECT total_beds, available_beds, icu_beds, flexible_beds, occupied_beds
+    FROM bed_stats
+    WHERE hospital_id = ?
+'''
+
+# Last 10 admissions of a hospital, from idx_patients_listing
+RECENT_PATIENTS_QUERY = '''
+    SELECT name, age, condition, severity, doctor_recommendation, admission_date, bed_id
+    FROM patients 
+    WHERE hospital_id = ? AND status = 'allocated'
+    ORDER BY admission_date DESC 
+    LIMIT 10
+'''
+
 @app.route('/api/dashboard-data')
+@versioned
 def dashboard_data():
     """Get dashboard data for logged-in hospital"""
     if 'hospital_id' not in session:
         return jsonify({'error': 'Not logged in'}), 401
     
     hospital_id = session['hospital_id']
-    conn = sqlite3.connect('hospital.db')
+    conn = get_db()
     cursor = conn.cursor()
     
-    # Get bed statistics
-    cursor.execute('''
-        SELECT 
-            COUNT(*) as total_beds,
-            SUM(CASE WHEN status = 'available' THEN 1 ELSE 0 END) as available_beds,
-            SUM(CASE WHEN type = 'icu' THEN 1 ELSE 0 END) as icu_beds,
-            SUM(CASE WHEN type = 'flexible' THEN 1 ELSE 0 END) as flexible_beds,
-            SUM(CASE WHEN status = 'occupied' THEN 1 ELSE 0 END) as occupied_beds
-        FROM beds 
-        WHERE hospital_id = ?
-    ''', (hospital_id,))
-    stats = cursor.fetchone()
+    # Get bed statistics, kept current by triggers on the beds table
+    cursor.execute(DASHBOARD_STATS_QUERY, (hospital_id,))
+    stats = cursor.fetchone() or (0, 0, 0, 0, 0)
     
     # Get recent patients (last 10)
-    cursor.execute('''
-        SELECT name, age, condition, severity, doctor_recommendation, admission_date, bed_id
-        FROM patients 
-        WHERE hospital_id = ? AND status = 'allocated'
-        ORDER BY admission_date DESC 
-        LIMIT 10
-    ''', (hospital_id,))
+    cursor.execute(RECENT_PATIENTS_QUERY, (hospital_id,))
     patients = cursor.fetchall()
     
-    conn.close()
-    
     return jsonify({
         'stats': {
             'total_beds': stats[0],
@@ -367,112 +2445,98 @@ def allocate_bed():
     data = request.json
     hospital_id = session['hospital_id']
     
-    conn = sqlite3.connect('hospital.db')
-    cursor = conn.cursor()
+    error = admission_error(data)
+    if error:
+        return jsonify({'success': False, 'message': error})
     
     try:
-        # Calculate priority score
-        priority_score = calculate_priority_score(
-            data['severity'],
-            data['health_risk'],
-            data['doctor_recommendation']
-        )
-        
-        # Calculate expected stay based on severity
-        expected_stay = 3  # default for general
-        if data['severity'] == 'high':
-            expected_stay = 7
-        elif data['severity'] == 'medium':
-            expected_stay = 5
-        elif data['doctor_recommendation'] == 'flexible':
-            expected_stay = 2  # Flexible beds: 2 days initial
-        
-        # Generate patient ID
-        cursor.execute("SELECT COUNT(*) FROM patients")
-        count = cursor.fetchone()[0]
-        patient_id = f"PAT{count + 1:03d}"
-        
-        # Find available bed
-        bed = find_available_bed(cursor, hospital_id, data['doctor_recommendation'])
-        
-        if bed:
-            # Allocate the bed
-            cursor.execute('''
-                UPDATE beds 
-                SET status = "occupied", patient_id = ?, last_occupied_date = ?
-                WHERE id = ?
-            ''', (patient_id, datetime.now().strftime('%Y-%m-%d'), bed[0]))
-            
-            # Add patient
-            cursor.execute('''
-                INSERT INTO patients (id, name, age, blood_group, condition, severity, 
-                                    health_risk, doctor_recommendation, priority_score, 
-                                    status, bed_id, admission_date, expected_stay_days, hospital_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'allocated', ?, ?, ?, ?)
-            ''', (
-                patient_id,
-                data['patient_name'],
-                data['age'],
-                data['blood_group'],
-                data['admission_cause'],
-                data['severity'],
-                data['health_risk'],
-                data['doctor_recommendation'],
-                priority_score,
-                bed[0],
-                datetime.now().strftime('%Y-%m-%d'),
-                expected_stay,
-                hospital_id
-            ))
-            
-            conn.commit()
-            conn.close()
-            
-            return jsonify({
-                'success': True,
-                'message': f'Bed {bed[0]} allocated successfully!',
-                'bed_id': bed[0],
-                'patient_id': patient_id,
-                'admission_date': datetime.now().strftime('%Y-%m-%d'),
-                'expected_stay': expected_stay
-            })
-        else:
-            # No bed available
-            cursor.execute('''
-                INSERT INTO patients (id, name, age, blood_group, condition, severity, 
-                                    health_risk, doctor_recommendation, priority_score, 
-                                    status, admission_date, expected_stay_days, hospital_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'waiting', ?, ?, ?)
-            ''', (
-                patient_id,
-                data['patient_name'],
-                data['age'],
-                data['blood_group'],
-                data['admission_cause'],
-                data['severity'],
-                data['health_risk'],
-                data['doctor_recommendation'],
-                priority_score,
-                datetime.now().strftime('%Y-%m-%d'),
-                expected_stay,
-                hospital_id
-            ))
-            
-            conn.commit()
-            conn.close()
-            
-            return jsonify({
-                'success': False,
-                'message': 'No available beds. Patient added to waiting list.'
-            })
-            
+        result = run_write(allocate_patient, hospital_id, data)
     except Exception as e:
-        conn.rollback()
-        conn.close()
         return jsonify({
             'success': False,
             'message': f'Error: {str(e)}'
         })
+    
+    if result['bed_id']:
+        return jsonify({
+            'success': True,
+            'message': f"Bed {result['bed_id']} allocated successfully!",
+            'bed_id': result['bed_id'],
+            'patient_id': result['patient_id'],
+            'admission_date': result['admission_date'],
+            'expected_stay': result['expected_stay']
+        })
+    else:
+        # No bed available
+        return jsonify({
+            'success': False,
+            'message': 'No available beds. Patient added to waiting list.'
+        })
+
+@app.route('/api/allocate-beds', methods=['POST'])
+def allocate_beds():
+    """Allocate beds to a batch of patients, most urgent first"""
+    if 'hospital_id' not in session:
+        return jsonify({'error': 'Not logged in'}), 401
+    
+    data = request.json
+    hospital_id = session['hospital_id']
+    
+    if not isinstance(data, dict) or not isinstance(data.get('patients', []), list):
+        return jsonify({'success': False, 'message': 'Body must be an object with a list of patients'}), 400
+    patients = data.get('patients')
+    if not patients:
+        return jsonify({'success': False, 'message': 'No patients given'})
+    if len(patients) > app.config['ALLOCATE_BATCH_MAX']:
+        return jsonify({'success': False, 'message': f"At most {app.config['ALLOCATE_BATCH_MAX']} patients per request"})
+    
+    # Invalid entries are rejected individually; the rest are admitted together
+    errors = [admission_error(data) for data in patients]
+    valid = [data for data, error in zip(patients, errors) if not error]
+    try:
+        admitted = iter(run_write(allocate_patients, hospital_id, valid) if valid else [])
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error: {str(e)}'
+        })
+    
+    results = []
+    for error in errors:
+        if error:
+            results.append({'patient_id': None, 'bed_id': None, 'status': 'rejected', 'message': error})
+        else:
+            result = next(admitted)
+            results.append(dict(result, status='allocated' if result['bed_id'] else 'waiting'))
+    
+    allocated = sum(1 for result in results if result['status'] == 'allocated')
+    waiting = sum(1 for result in results if result['status'] == 'waiting')
+    rejected = len(results) - allocated - waiting
+    return jsonify({
+        'success': True,
+        'message': f'{allocated} of {len(results)} patients allocated, {waiting} added to waiting list'
+                   + (f', {rejected} rejected.' if rejected else '.'),
+        'allocated': allocated,
+        'waiting': waiting,
+        'rejected': rejected,
+        'results': results
+    })
+
+ADMISSION_FIELDS = ('patient_name', 'age', 'blood_group', 'admission_cause', 'severity', 'health_risk',
+                    'doctor_recommendation')
+
+def admission_error(data):
+    """Why an admission request cannot be accepted, or None if it can"""
+    if not isinstance(data, dict):
+        return 'Patient must be an object'
+    missing = [field for field in ADMISSION_FIELDS if data.get(field) is None or data.get(field) == '']
+    if missing:
+        return f"Missing {', '.join(missing)}"
+    if data['doctor_recommendation'] not in BED_TYPES:
+        return f"doctor_recommendation must be one of {', '.join(BED_TYPES)}"
+    if data.get('ward') is not None and not isinstance(data['ward'], str):
+        return 'ward must be a string'
+    return None
 
 @app.route('/api/extend-stay', methods=['POST'])
 def extend_stay():
@@ -481,66 +2545,86 @@ def extend_stay():
         return jsonify({'error': 'Not logged in'}), 401
     
     data = request.json
-    patient_id = data.get('patient_id')
-    
-    conn = sqlite3.connect('hospital.db')
-    cursor = conn.cursor()
     
     try:
-        # Get patient details
-        cursor.execute('''
-            SELECT expected_stay_days, extended_stay, doctor_recommendation 
-            FROM patients WHERE id = ?
-        ''', (patient_id,))
-        patient = cursor.fetchone()
-        
-        if not patient:
-            conn.close()
-            return jsonify({'success': False, 'message': 'Patient not found'})
-        
-        expected_stay, extended_count, bed_type = patient
-        
-        # Check if patient is in flexible bed and hasn't exceeded max extensions
-        if bed_type == 'flexible' and extended_count < 2:  # Max 2 extensions (total 6 days)
-            # Extend stay by 2 days
-            new_expected_stay = expected_stay + 2
-            new_extended_count = extended_count + 1
-            
-            cursor.execute('''
-                UPDATE patients 
-                SET expected_stay_days = ?, extended_stay = ?
-                WHERE id = ?
-            ''', (new_expected_stay, new_extended_count, patient_id))
-            
-            conn.commit()
-            conn.close()
-            
-            return jsonify({
-                'success': True,
-                'message': f'Stay extended by 2 days. New expected discharge in {new_expected_stay} days total.',
-                'new_stay_days': new_expected_stay,
-                'extensions_used': new_extended_count
-            })
-        else:
-            conn.close()
-            if bed_type != 'flexible':
-                return jsonify({
-                    'success': False,
-                    'message': 'Stay extension only available for flexible care patients'
-                })
-            else:
-                return jsonify({
-                    'success': False,
-                    'message': 'Maximum extensions reached (2 extensions allowed). Please discharge or transfer patient.'
-                })
-        
+        result = run_write(extend, session['hospital_id'], data.get('patient_id'))
     except Exception as e:
-        conn.rollback()
-        conn.close()
         return jsonify({
             'success': False,
             'message': f'Error extending stay: {str(e)}'
         })
+    
+    if result is None:
+        return jsonify({'success': False, 'message': 'Patient not found'})
+    if isinstance(result, str):
+        return jsonify({'success': False, 'message': EXTEND_ERRORS[result]})
+    
+    return jsonify({
+        'success': True,
+        'message': extended_message(result['new_stay_days']),
+        'new_stay_days': result['new_stay_days'],
+        'extensions_used': result['extensions_used']
+    })
+
+EXTEND_ERRORS = {
+    'not_flexible': 'Stay extension only available for flexible care patients',
+    'max_extensions': 'Maximum extensions reached (2 extensions allowed). Please discharge or transfer patient.'
+}
+
+def extension_error(bed_type, extended_count):
+    """Key of EXTEND_ERRORS when a patient may not be extended again, else None"""
+    # Check if patient is in flexible bed and hasn't exceeded max extensions
+    if bed_type != 'flexible':
+        return 'not_flexible'
+    if extended_count >= 2:  # Max 2 extensions (total 6 days)
+        return 'max_extensions'
+    return None
+
+def extended_message(new_stay_days):
+    return f"Stay extended by 2 days. New expected discharge in {new_stay_days} days total."
+
+def extend(tx, hospital_id, patient_id):
+    """Extend a flexible care patient's stay by 2 days, up to 2 extensions"""
+    cursor = tx.cursor
+    
+    # Get patient details
+    cursor.execute('''
+        SELECT expected_stay_days, extended_stay, doctor_recommendation, admission_date, bed_id
+        FROM patients WHERE id = ? AND hospital_id = ?
+    ''', (patient_id, hospital_id))
+    patient = cursor.fetchone()
+    
+    if not patient:
+        return None
+    
+    expected_stay, extended_count, bed_type, admission_date, bed_id = patient
+    
+    error = extension_error(bed_type, extended_count)
+    if error:
+        return error
+    
+    # Extend stay by 2 days
+    new_expected_stay = expected_stay + 2
+    new_extended_count = extended_count + 1
+    new_expected_discharge = calculate_expected_discharge(admission_date, new_expected_stay)
+    
+    cursor.execute('''
+        UPDATE patients 
+        SET expected_stay_days = ?, extended_stay = ?, expected_discharge_date = ?
+        WHERE id = ?
+    ''', (new_expected_stay, new_extended_count, new_expected_discharge, patient_id))
+    if bed_id:
+        tx.log_bed_event(hospital_id, bed_id, patient_id, 'extended')
+    
+    tx.on_commit(events.publish, hospital_id, 'patient_extended', {
+        'patient_id': patient_id,
+        'expected_stay': new_expected_stay,
+        'extended_stay': new_extended_count,
+        'expected_discharge': new_expected_discharge,
+        'can_extend': new_extended_count < 2
+    })
+    
+    return {'new_stay_days': new_expected_stay, 'extensions_used': new_extended_count}
 
 @app.route('/api/discharge-patient', methods=['POST'])
 def discharge_patient():
@@ -549,145 +2633,1077 @@ def discharge_patient():
         return jsonify({'error': 'Not logged in'}), 401
     
     data = request.json
-    patient_id = data.get('patient_id')
     
-    conn = sqlite3.connect('hospital.db')
-    cursor = conn.cursor()
+    try:
+        result = run_write(discharge, session['hospital_id'], data.get('patient_id'))
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error discharging patient: {str(e)}'
+        })
+    
+    if result is None:
+        return jsonify({'success': False, 'message': 'Patient not found'})
+    if result == 'discharged':
+        return jsonify({'success': False, 'message': 'Patient is already discharged'})
+    
+    return jsonify({
+        'success': True,
+        'message': discharged_message(result['bed_id'], result['promoted_patient_id']),
+        'bed_id': result['bed_id'],
+        'promoted_patient_id': result['promoted_patient_id']
+    })
+
+def discharged_message(bed_id, promoted_patient_id):
+    if not bed_id:
+        return 'Patient discharged successfully and removed from the waiting list.'
+    if promoted_patient_id:
+        return (f"Patient discharged successfully. Bed {bed_id} assigned to "
+                f"waiting patient {promoted_patient_id}.")
+    return f"Patient discharged successfully. Bed {bed_id} is now available."
+
+def discharge(tx, hospital_id, patient_id):
+    """Mark a patient discharged and hand their bed to the waiting list or back to the free pool"""
+    cursor = tx.cursor
+    
+    # Get patient details
+    cursor.execute('SELECT bed_id, status FROM patients WHERE id = ? AND hospital_id = ?', (patient_id, hospital_id))
+    patient = cursor.fetchone()
+    
+    if not patient:
+        return 'discharged' if is_archived(cursor, patient_id, hospital_id) else None
+    
+    bed_id, status = patient
+    if status == 'discharged':
+        return 'discharged'
+    
+    # Update patient status
+    cursor.execute('''
+        UPDATE patients 
+        SET status = 'discharged', discharge_date = ?
+        WHERE id = ?
+    ''', (datetime.now().strftime('%Y-%m-%d'), patient_id))
+    
+    if status == 'waiting':
+        tx.on_commit(waiting_list.remove, hospital_id, patient_id)
+    tx.on_commit(events.publish, hospital_id, 'patient_discharged', {'patient_id': patient_id})
+    
+    promoted_patient_id = None
+    if bed_id:
+        # Free up the bed, unless it has already been handed to someone else
+        cursor.execute('''
+            UPDATE beds 
+            SET status = 'available', patient_id = NULL
+            WHERE id = ? AND patient_id = ?
+            RETURNING type
+        ''', (bed_id, patient_id))
+        bed = cursor.fetchone()
+        if bed:
+            tx.log_bed_event(hospital_id, bed_id, patient_id, 'discharged')
+            promoted_patient_id = promote_waiting_patient(tx, hospital_id, bed_id, bed[0])
+            if not promoted_patient_id:
+                tx.on_commit(bed_index.release, hospital_id, bed_id)
+                tx.on_commit(events.publish, hospital_id, 'bed_freed', {'bed_id': bed_id})
+    
+    return {'bed_id': bed_id, 'promoted_patient_id': promoted_patient_id}
+
+@app.route('/api/rounds', methods=['POST'])
+def ward_rounds():
+    """Apply a list of discharge and extend actions in one transaction, with a result per action"""
+    if 'hospital_id' not in session:
+        return jsonify({'error': 'Not logged in'}), 401
+    
+    data = request.json
+    if not isinstance(data, dict) or not isinstance(data.get('actions', []), list):
+        return jsonify({'success': False, 'message': 'Body must be an object with a list of actions'}), 400
+    actions = data.get('actions')
+    if not actions:
+        return jsonify({'success': False, 'message': 'No actions given'})
+    if len(actions) > app.config['ROUNDS_MAX_ACTIONS']:
+        return jsonify({'success': False, 'message': f"At most {app.config['ROUNDS_MAX_ACTIONS']} actions per request"})
     
     try:
-        # Get patient details
-        cursor.execute('SELECT bed_id FROM patients WHERE id = ?', (patient_id,))
-        patient = cursor.fetchone()
-        
-        if not patient:
-            conn.close()
-            return jsonify({'success': False, 'message': 'Patient not found'})
+        results = run_write(apply_rounds, session['hospital_id'], actions)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error: {str(e)}'
+        })
+    
+    applied = sum(1 for result in results if result['success'])
+    return jsonify({
+        'success': True,
+        'message': f'{applied} of {len(results)} actions applied.',
+        'applied': applied,
+        'failed': len(results) - applied,
+        'results': results
+    })
+
+def apply_rounds(tx, hospital_id, actions):
+    """Apply discharge and extend actions in order, each checked against the patient as earlier actions left them"""
+    cursor = tx.cursor
+    today = datetime.now().strftime('%Y-%m-%d')
+    actions = [action if isinstance(action, dict) else {} for action in actions]
+    
+    # One lookup for every patient named, scoped to the hospital
+    patients = {}
+    patient_ids = list({action.get('patient_id') for action in actions
+                        if action.get('patient_id') and isinstance(action.get('patient_id'), str)})
+    for chunk in chunked(patient_ids, 500):
+        cursor.execute(f'''
+            SELECT id, status, bed_id, expected_stay_days, extended_stay, doctor_recommendation, admission_date
+            FROM patients
+            WHERE hospital_id = ? AND id IN ({', '.join('?' * len(chunk))})
+        ''', [hospital_id] + chunk)
+        for row in cursor.fetchall():
+            patients[row[0]] = dict(zip(('id', 'status', 'bed_id', 'expected_stay_days', 'extended_stay',
+                                         'doctor_recommendation', 'admission_date'), row))
+    
+    # Patients archived since their discharge are still reported as discharged
+    missing = [patient_id for patient_id in patient_ids if patient_id not in patients]
+    for chunk in chunked(missing, 500):
+        cursor.execute(f'''
+            SELECT id FROM patients_archive
+            WHERE hospital_id = ? AND id IN ({', '.join('?' * len(chunk))})
+        ''', [hospital_id] + chunk)
+        for row in cursor.fetchall():
+            patients[row[0]] = {'id': row[0], 'status': 'discharged'}
+    
+    results = []
+    extended = {}     # patient_id -> patient as last extended
+    discharged = {}   # patient_id -> (status before discharge, result)
+    for action in actions:
+        kind, patient_id = action.get('action'), action.get('patient_id')
+        # IDs that are not strings, such as lists, are simply not found
+        patient = patients.get(patient_id) if isinstance(patient_id, str) else None
+        result = {'action': kind, 'patient_id': patient_id, 'success': False}
+        results.append(result)
         
-        bed_id = patient[0]
+        if kind not in ('discharge', 'extend'):
+            result['message'] = 'action must be discharge or extend'
+        elif patient is None:
+            result['message'] = 'Patient not found'
+        elif patient['status'] == 'discharged':
+            result['message'] = 'Patient is already discharged'
+        elif kind == 'extend':
+            error = extension_error(patient['doctor_recommendation'], patient['extended_stay'])
+            if error:
+                result['message'] = EXTEND_ERRORS[error]
+                continue
+            patient['expected_stay_days'] += 2
+            patient['extended_stay'] += 1
+            patient['expected_discharge_date'] = calculate_expected_discharge(
+                patient['admission_date'], patient['expected_stay_days'])
+            extended[patient_id] = patient
+            if patient['bed_id']:
+                tx.log_bed_event(hospital_id, patient['bed_id'], patient_id, 'extended')
+            tx.on_commit(events.publish, hospital_id, 'patient_extended', {
+                'patient_id': patient_id,
+                'expected_stay': patient['expected_stay_days'],
+                'extended_stay': patient['extended_stay'],
+                'expected_discharge': patient['expected_discharge_date'],
+                'can_extend': patient['extended_stay'] < 2
+            })
+            result.update(success=True, message=extended_message(patient['expected_stay_days']),
+                          new_stay_days=patient['expected_stay_days'], extensions_used=patient['extended_stay'])
+        else:
+            discharged[patient_id] = (patient['status'], result)
+            patient['status'] = 'discharged'
+            result.update(success=True, message=discharged_message(patient['bed_id'], None),
+                          bed_id=patient['bed_id'], promoted_patient_id=None)
+    
+    cursor.executemany('''
+        UPDATE patients 
+        SET expected_stay_days = ?, extended_stay = ?, expected_discharge_date = ?
+        WHERE id = ?
+    ''', [(patient['expected_stay_days'], patient['extended_stay'], patient['expected_discharge_date'], patient_id)
+          for patient_id, patient in extended.items()])
+    cursor.executemany('''
+        UPDATE patients 
+        SET status = 'discharged', discharge_date = ?
+        WHERE id = ?
+    ''', [(today, patient_id) for patient_id in discharged])
+    
+    for patient_id, (status, _) in discharged.items():
+        if status == 'waiting':
+            tx.on_commit(waiting_list.remove, hospital_id, patient_id)
+        tx.on_commit(events.publish, hospital_id, 'patient_discharged', {'patient_id': patient_id})
+    
+    # Free the beds still held by their discharged patients, then offer them to the waiting list
+    holders = {patients[patient_id]['bed_id']: patient_id
+               for patient_id in discharged if patients[patient_id]['bed_id']}
+    freed = []
+    for chunk in chunked(list(holders), 500):
+        cursor.execute(f'''
+            SELECT id, type, patient_id FROM beds
+            WHERE id IN ({', '.join('?' * len(chunk))})
+        ''', chunk)
+        freed.extend((bed_id, bed_type) for bed_id, bed_type, holder in cursor.fetchall() if holder == holders[bed_id])
+    cursor.executemany('''
+        UPDATE beds 
+        SET status = 'available', patient_id = NULL
+        WHERE id = ? AND patient_id = ?
+    ''', [(bed_id, holders[bed_id]) for bed_id, _ in freed])
+    
+    for bed_id, bed_type in freed:
+        tx.log_bed_event(hospital_id, bed_id, holders[bed_id], 'discharged')
+        promoted_patient_id = promote_waiting_patient(tx, hospital_id, bed_id, bed_type)
+        if promoted_patient_id:
+            result = discharged[holders[bed_id]][1]
+            result.update(message=discharged_message(bed_id, promoted_patient_id), promoted_patient_id=promoted_patient_id)
+        else:
+            tx.on_commit(bed_index.release, hospital_id, bed_id)
+            tx.on_commit(events.publish, hospital_id, 'bed_freed', {'bed_id': bed_id})
+    
+    return results
+
+def promote_waiting_patient(tx, hospital_id, bed_id, bed_type):
+    """Give a freed bed to the highest-priority waiting patient who can use it"""
+    cursor = tx.cursor
+    admission_date = datetime.now().strftime('%Y-%m-%d')
+    
+    while True:
+        entry = waiting_list.pop_for_bed(cursor, hospital_id, bed_type)
+        if not entry:
+            return None
+        patient_id = entry[2]
         
-        # Update patient status
         cursor.execute('''
             UPDATE patients 
-            SET status = 'discharged', discharge_date = ?
-            WHERE id = ?
-        ''', (datetime.now().strftime('%Y-%m-%d'), patient_id))
-        
-        # Free up the bed
-        if bed_id:
+            SET status = 'allocated', bed_id = ?, admission_date = ?,
+                expected_discharge_date = date(?, '+' || expected_stay_days || ' days')
+            WHERE id = ? AND status = 'waiting'
+        ''', (bed_id, admission_date, admission_date, patient_id))
+        if cursor.rowcount == 1:
             cursor.execute('''
                 UPDATE beds 
-                SET status = 'available', patient_id = NULL
+                SET status = 'occupied', patient_id = ?, last_occupied_date = ?
                 WHERE id = ?
-            ''', (bed_id,))
-        
-        conn.commit()
-        conn.close()
-        
-        return jsonify({
-            'success': True,
-            'message': f'Patient discharged successfully. Bed {bed_id} is now available.'
-        })
-        
-    except Exception as e:
-        conn.rollback()
-        conn.close()
-        return jsonify({
-            'success': False,
-            'message': f'Error discharging patient: {str(e)}'
-        })
+            ''', (patient_id, admission_date, bed_id))
+            tx.on_rollback(waiting_list.restore, hospital_id, entry)
+            tx.log_bed_event(hospital_id, bed_id, patient_id, 'promoted')
+            
+            cursor.execute('''
+                SELECT id, name, age, blood_group, condition, bed_id, 
+                       admission_date, severity, expected_stay_days, extended_stay,
+                       doctor_recommendation, expected_discharge_date
+                FROM patients WHERE id = ?
+            ''', (patient_id,))
+            publish_admission(tx, hospital_id, cursor.fetchone())
+            tx.on_commit(metrics.inc, 'cura_allocations_total', (('outcome', 'promoted'),))
+            return patient_id
+        # The patient was admitted or discharged elsewhere; try the next one
 
-def find_available_bed(cursor, hospital_id, bed_type):
-    """Find an available bed of the recommended type"""
-    cursor.execute('''
-        SELECT id FROM beds 
-        WHERE hospital_id = ? AND type = ? AND status = 'available' 
-        LIMIT 1
-    ''', (hospital_id, bed_type))
-    bed = cursor.fetchone()
+def find_available_bed(cursor, hospital_id, bed_type, ward=None):
+    """Find an available bed of the recommended type, in the ward the allocation policy picks"""
+    policy = ALLOCATION_POLICIES[app.config['ALLOCATION_POLICY']]
+    bed_id = bed_index.acquire(cursor, hospital_id, bed_type, policy, ward)
     
-    if not bed:
+    if not bed_id and bed_type != 'general':
         # Try general beds as fallback
+        bed_id = bed_index.acquire(cursor, hospital_id, 'general', policy, ward)
+        if bed_id:
+            metrics.inc('cura_bed_type_fallbacks_total', (('requested', bed_type),))
+    
+    return (bed_id,) if bed_id else None
+
+def claim_bed(tx, hospital_id, bed_type, patient_id, admission_date, ward=None):
+    """Claim an available bed for a patient, skipping beds another writer already took"""
+    cursor = tx.cursor
+    while True:
+        bed = find_available_bed(cursor, hospital_id, bed_type, ward)
+        if not bed:
+            return None
+        
         cursor.execute('''
-            SELECT id FROM beds 
-            WHERE hospital_id = ? AND type = 'general' AND status = 'available' 
-            LIMIT 1
-        ''', (hospital_id,))
-        bed = cursor.fetchone()
+            UPDATE beds 
+            SET status = 'occupied', patient_id = ?, last_occupied_date = ?
+            WHERE id = ? AND status = 'available'
+        ''', (patient_id, admission_date, bed[0]))
+        if cursor.rowcount == 1:
+            tx.on_rollback(bed_index.release, hospital_id, bed[0])
+            return bed
+        # The index was stale; the bed stays off the free-list and we try the next one
+
+def publish_admission(tx, hospital_id, patient):
+    """Announce a patient taking a bed once the transaction commits"""
+    patient_json = allocated_patient_json(patient)
+    tx.on_commit(events.publish, hospital_id, 'bed_occupied', {
+        'bed_id': patient_json['bed_id'],
+        'patient_id': patient_json['id'],
+        'last_occupied': patient_json['admission_date']
+    })
+    tx.on_commit(events.publish, hospital_id, 'patient_admitted', patient_json)
+
+def next_patient_ids(cursor, count):
+    """Allocate a block of consecutive patient IDs from the patient sequence"""
+    if app.config['SHARD_DIR']:
+        lease_patient_ids(cursor, count)
+    cursor.execute("UPDATE id_sequences SET value = value + ? WHERE name = 'patient'", (count,))
+    cursor.execute("SELECT value FROM id_sequences WHERE name = 'patient'")
+    last = cursor.fetchone()[0]
+    return [f"PAT{n:03d}" for n in range(last - count + 1, last + 1)]
+
+def lease_patient_ids(cursor, count):
+    """Make sure a shard's reserved block of patient IDs has count left, reserving more from the catalog"""
+    cursor.execute("SELECT name, value FROM id_sequences WHERE name IN ('patient', 'patient_limit')")
+    sequences = dict(cursor.fetchall())
+    if sequences.get('patient', 0) + count <= sequences.get('patient_limit', 0):
+        return
+    
+    # IDs left in the old block are skipped; a rolled-back lease only leaves a gap
+    block = max(count, app.config['PATIENT_ID_BLOCK'])
+    pool = get_pool(app.config['DATABASE'])
+    catalog = pool.acquire()
+    try:
+        last = run_write(reserve_patient_ids, block, conn=catalog)
+    finally:
+        pool.release(catalog)
+    cursor.executemany('INSERT OR REPLACE INTO id_sequences (name, value) VALUES (?, ?)',
+                       [('patient', last - block), ('patient_limit', last)])
+
+def reserve_patient_ids(tx, count):
+    """Advance the catalog's patient sequence by count, returning the last ID number reserved"""
+    tx.cursor.execute('''
+        UPDATE id_sequences SET value = value + ? WHERE name = 'patient'
+        RETURNING value
+    ''', (count,))
+    return tx.cursor.fetchone()[0]
+
+def next_patient_id(cursor):
+    """Allocate the next patient ID from the patient sequence"""
+    return next_patient_ids(cursor, 1)[0]
+
+def allocate_patient(tx, hospital_id, data):
+    """Admit a patient into a free bed, or onto the waiting list when there is none"""
+    return allocate_patients(tx, hospital_id, [data])[0]
+
+def allocate_patients(tx, hospital_id, patients):
+    """Admit a batch of patients, handing out beds in priority order"""
+    cursor = tx.cursor
+    now = datetime.now()
+    admission_date = now.strftime('%Y-%m-%d')
+    waiting_since = now.strftime('%Y-%m-%d %H:%M:%S')
+    
+    # IDs follow arrival order, beds follow priority
+    patient_ids = next_patient_ids(cursor, len(patients))
+    priority_scores = [
+        calculate_priority_score(data['severity'], data['health_risk'], data['doctor_recommendation'])
+        for data in patients
+    ]
+    order = sorted(range(len(patients)), key=lambda i: -priority_scores[i])
+    
+    # Pick beds from the index, then claim them all in one statement
+    bed_ids = [None] * len(patients)
+    claims = []
+    for i in order:
+        bed = find_available_bed(cursor, hospital_id, patients[i]['doctor_recommendation'], patients[i].get('ward'))
+        if bed:
+            bed_ids[i] = bed[0]
+            claims.append((patient_ids[i], admission_date, bed[0]))
+            tx.on_rollback(bed_index.release, hospital_id, bed[0])
+    
+    cursor.executemany('''
+        UPDATE beds 
+        SET status = 'occupied', patient_id = ?, last_occupied_date = ?
+        WHERE id = ? AND status = 'available'
+    ''', claims)
+    if cursor.rowcount != len(claims):
+        # Some index entries were stale; claim again for the patients who lost their bed
+        for i in order:
+            if bed_ids[i] is None:
+                continue
+            cursor.execute('SELECT patient_id FROM beds WHERE id = ?', (bed_ids[i],))
+            if cursor.fetchone()[0] != patient_ids[i]:
+                bed = claim_bed(tx, hospital_id, patients[i]['doctor_recommendation'],
+                                patient_ids[i], admission_date, patients[i].get('ward'))
+                bed_ids[i] = bed[0] if bed else None
+    
+    results = []
+    rows = []
+    for i, data in enumerate(patients):
+        expected_stay = calculate_expected_stay(data['severity'], data['doctor_recommendation'])
+        expected_discharge = calculate_expected_discharge(admission_date, expected_stay) if bed_ids[i] else None
+        rows.append((
+            patient_ids[i],
+            data['patient_name'],
+            data['age'],
+            data['blood_group'],
+            data['admission_cause'],
+            data['severity'],
+            data['health_risk'],
+            data['doctor_recommendation'],
+            priority_scores[i],
+            'allocated' if bed_ids[i] else 'waiting',
+            bed_ids[i],
+            admission_date,
+            expected_stay,
+            hospital_id,
+            None if bed_ids[i] else waiting_since,
+            expected_discharge
+        ))
+        results.append({
+            'patient_id': patient_ids[i],
+            'bed_id': bed_ids[i],
+            'admission_date': admission_date,
+            'expected_stay': expected_stay,
+            'priority_score': priority_scores[i]
+        })
+        if bed_ids[i]:
+            tx.log_bed_event(hospital_id, bed_ids[i], patient_ids[i], 'admitted')
+            publish_admission(tx, hospital_id, (
+                patient_ids[i], data['patient_name'], data['age'], data['blood_group'],
+                data['admission_cause'], bed_ids[i], admission_date, data['severity'],
+                expected_stay, 0, data['doctor_recommendation'], expected_discharge
+            ))
+        else:
+            tx.on_commit(waiting_list.add, hospital_id, patient_ids[i],
+                         data['doctor_recommendation'], priority_scores[i], waiting_since)
+    
+    cursor.executemany('''
+        INSERT INTO patients (id, name, age, blood_group, condition, severity, 
+                            health_risk, doctor_recommendation, priority_score, 
+                            status, bed_id, admission_date, expected_stay_days, hospital_id,
+                            waiting_since, expected_discharge_date)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
     
-    return bed
+    allocated = sum(1 for bed_id in bed_ids if bed_id)
+    tx.on_commit(metrics.inc, 'cura_allocations_total', (('outcome', 'allocated'),), allocated)
+    tx.on_commit(metrics.inc, 'cura_allocations_total', (('outcome', 'waitlisted'),), len(patients) - allocated)
+    return results
 
 @app.route('/api/available-beds')
+@versioned
 def available_beds():
-    """Get available beds for hospital"""
+    """Get beds for hospital, optionally filtered and paginated"""
     if 'hospital_id' not in session:
         return jsonify({'error': 'Not logged in'}), 401
     
     hospital_id = session['hospital_id']
-    conn = sqlite3.connect('hospital.db')
+    conn = get_db()
     cursor = conn.cursor()
     
-    cursor.execute('''
+    try:
+        after = decode_cursor(request.args.get('after'), 2)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    limit = page_limit()
+    cursor.execute(*bed_listing_query(hospital_id, request.args, after, limit))
+    
+    return listing_response('beds', cursor, bed_json, limit, lambda bed: [bed[1], bed[0]])
+
+# Columns available_beds can be filtered on
+BED_LISTING_FILTERS = ('type', 'ward', 'status')
+
+def bed_listing_query(hospital_id, filters, after=None, limit=None):
+    """SQL and parameters of the available_beds listing, from the covering idx_beds_listing"""
+    conditions, params = ['hospital_id = ?'], [hospital_id]
+    for column in BED_LISTING_FILTERS:
+        if filters.get(column):
+            conditions.append(f'{column} = ?')
+            params.append(filters[column])
+    if after and after[0] == filters.get('type'):
+        # With the type pinned, a row-value range would make SQLite re-sort by id
+        conditions.append('id > ?')
+        params.append(after[1])
+    elif after:
+        conditions.append('(type, id) > (?, ?)')
+        params.extend(after)
+    
+    sql = f'''
         SELECT id, type, ward, status, last_occupied_date
         FROM beds 
-        WHERE hospital_id = ?
+        WHERE {' AND '.join(conditions)}
         ORDER BY type, id
-    ''', (hospital_id,))
-    beds = cursor.fetchall()
-    conn.close()
-    
-    return jsonify({
-        'beds': [
-            {
-                'id': bed[0],
-                'type': bed[1],
-                'ward': bed[2],
-                'status': bed[3],
-                'last_occupied': bed[4]
-            } for bed in beds
-        ]
-    })
+        {'LIMIT ?' if limit else ''}
+    '''
+    return sql, params + ([limit] if limit else [])
+
+def bed_json(bed):
+    """Shape a bed row, in the column order of available_beds, for the API"""
+    return {
+        'id': bed[0],
+        'type': bed[1],
+        'ward': bed[2],
+        'status': bed[3],
+        'last_occupied': bed[4]
+    }
 
 @app.route('/api/allocated-patients')
+@versioned
 def allocated_patients():
-    """Get allocated patients for hospital"""
+    """Get allocated patients for hospital, optionally filtered and paginated"""
     if 'hospital_id' not in session:
         return jsonify({'error': 'Not logged in'}), 401
     
     hospital_id = session['hospital_id']
-    conn = sqlite3.connect('hospital.db')
+    conn = get_db()
     cursor = conn.cursor()
     
-    cursor.execute('''
+    try:
+        after = decode_cursor(request.args.get('after'), 2)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    # ?include_archived=1 merges in patients moved to patients_archive, in the same order
+    include_archived = request.args.get('include_archived') == '1'
+    
+    limit = page_limit()
+    cursor.execute(*patient_listing_query(hospital_id, request.args.get('status') or 'allocated',
+                                          request.args.get('type'), after, limit, include_archived))
+    
+    return listing_response('patients', cursor, allocated_patient_json, limit,
+                            lambda patient: [patient[6], patient[0]])
+
+def patient_listing_query(hospital_id, status, bed_type=None, after=None, limit=None, include_archived=False):
+    """SQL and parameters of the allocated_patients listing, from idx_patients_listing"""
+    conditions, params = ['p.hospital_id = ?', 'p.status = ?'], [hospital_id, status]
+    if bed_type:
+        conditions.append('p.doctor_recommendation = ?')
+        params.append(bed_type)
+    if after:
+        conditions.append('(p.admission_date, p.id) < (?, ?)')
+        params.extend(after)
+    
+    tables = ['patients', 'patients_archive'] if include_archived else ['patients']
+    sql = ' UNION ALL '.join(f'''
         SELECT p.id, p.name, p.age, p.blood_group, p.condition, p.bed_id, 
                p.admission_date, p.severity, p.expected_stay_days, p.extended_stay,
-               p.doctor_recommendation
-        FROM patients p
-        WHERE p.hospital_id = ? AND p.status = 'allocated'
-        ORDER BY p.admission_date DESC
-    ''', (hospital_id,))
-    patients = cursor.fetchall()
-    conn.close()
+               p.doctor_recommendation, p.expected_discharge_date
+        FROM {table} p
+        WHERE {' AND '.join(conditions)}
+    ''' for table in tables) + f'''
+        ORDER BY admission_date DESC, id DESC
+        {'LIMIT ?' if limit else ''}
+    '''
+    return sql, params * len(tables) + ([limit] if limit else [])
+
+def page_limit():
+    """Page size from ?limit, capped at PAGE_SIZE_MAX; None returns everything"""
+    limit = request.args.get('limit', type=int)
+    if not limit or limit <= 0:
+        return None
+    return min(limit, app.config['PAGE_SIZE_MAX'])
+
+def encode_cursor(values):
+    """Opaque pagination cursor for the sort key of the last row of a page"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor, size):
+    """Sort key values from a pagination cursor, raising ValueError if it is malformed"""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('Invalid cursor')
+    # Sort keys are text or integers; anything else would reach SQLite as an unbindable parameter
+    if any(isinstance(value, bool) or not isinstance(value, (str, int)) for value in values):
+        raise ValueError('Invalid cursor')
+    return values
+
+def listing_response(key, cursor, row_json, limit, sort_key):
+    """Serialize the rows of an executed listing query, streamed in chunks when ?stream=1"""
+    if request.args.get('stream') == '1':
+        chunk_rows = app.config['STREAM_CHUNK_ROWS']
+        
+        def generate():
+            yield f'{{"{key}": ['
+            count, last = 0, None
+            while True:
+                rows = cursor.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                yield (',' if count else '') + app.json.dumps([row_json(row) for row in rows])[1:-1]
+                count += len(rows)
+                last = rows[-1]
+            next_cursor = encode_cursor(sort_key(last)) if limit and count == limit else None
+            yield f'], "next_cursor": {app.json.dumps(next_cursor)}}}'
+        
+        # Keep the request's connection checked out until the last row is sent
+        if request.accept_encodings['gzip']:
+            response = Response(stream_with_context(gzip_chunks(generate())), mimetype='application/json')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(stream_with_context(generate()), mimetype='application/json')
+        response.vary.add('Accept-Encoding')
+        return response
+    
+    rows = cursor.fetchall()
+    body = {key: [row_json(row) for row in rows]}
+    if limit:
+        body['next_cursor'] = encode_cursor(sort_key(rows[-1])) if len(rows) == limit else None
+    return jsonify(body)
+
+def allocated_patient_json(patient):
+    """Shape a patient row, in the column order of allocated_patients, for the API"""
+    return {
+        'id': patient[0],
+        'name': patient[1],
+        'age': patient[2],
+        'blood_group': patient[3],
+        'condition': patient[4],
+        'bed_id': patient[5],
+        'admission_date': patient[6],
+        'severity': patient[7],
+        'expected_stay': patient[8],
+        'extended_stay': patient[9],
+        'bed_type': patient[10],
+        'expected_discharge': patient[11],
+        'can_extend': patient[10] == 'flexible' and patient[9] < 2
+    }
+
+@app.route('/api/waiting-list')
+@versioned(period=current_minute)
+def waiting_list_status():
+    """Get waiting list depth and wait times for hospital"""
+    if 'hospital_id' not in session:
+        return jsonify({'error': 'Not logged in'}), 401
+    
+    hospital_id = session['hospital_id']
+    limit = min(max(request.args.get('limit', 50, type=int), 1), app.config['PAGE_SIZE_MAX'])
+    entries = waiting_list.snapshot(get_db().cursor(), hospital_id)
+    now = datetime.now()
+    
+    def wait_minutes(waiting_since):
+        if not waiting_since:
+            return None
+        return int((now - datetime.strptime(waiting_since, '%Y-%m-%d %H:%M:%S')).total_seconds() // 60)
+    
+    queues = {}
+    for _, waiting_since, _, bed_type in entries:
+        queue = queues.setdefault(bed_type, {'depth': 0, 'longest_wait_minutes': 0})
+        queue['depth'] += 1
+        queue['longest_wait_minutes'] = max(queue['longest_wait_minutes'], wait_minutes(waiting_since) or 0)
     
     return jsonify({
+        'total_waiting': len(entries),
+        'queues': queues,
         'patients': [
             {
-                'id': patient[0],
-                'name': patient[1],
-                'age': patient[2],
-                'blood_group': patient[3],
-                'condition': patient[4],
-                'bed_id': patient[5],
-                'admission_date': patient[6],
-                'severity': patient[7],
-                'expected_stay': patient[8],
-                'extended_stay': patient[9],
-                'bed_type': patient[10],
-                'expected_discharge': calculate_expected_discharge(patient[6], patient[8]),
-                'can_extend': patient[10] == 'flexible' and patient[9] < 2
-            } for patient in patients
+                'position': position,
+                'id': patient_id,
+                'bed_type': bed_type,
+                'priority_score': -negative_priority,
+                'waiting_since': waiting_since,
+                'wait_minutes': wait_minutes(waiting_since)
+            } for position, (negative_priority, waiting_since, patient_id, bed_type)
+            in enumerate(entries[:limit], 1)
         ]
     })
 
+# Allocated patients due to leave by a date, overdue ones first, from idx_patients_discharge
+UPCOMING_DISCHARGES_QUERY = '''
+    SELECT p.id, p.name, p.age, p.blood_group, p.condition, p.bed_id, 
+           p.admission_date, p.severity, p.expected_stay_days, p.extended_stay,
+           p.doctor_recommendation, p.expected_discharge_date
+    FROM patients p
+    WHERE p.hospital_id = ? AND p.status = 'allocated' AND p.expected_discharge_date <= ?
+    ORDER BY p.expected_discharge_date
+'''
+
+@app.route('/api/upcoming-discharges')
+@versioned(period=current_hour)
+def upcoming_discharges():
+    """Get allocated patients expected to leave within the next ?hours (default 24)"""
+    if 'hospital_id' not in session:
+        return jsonify({'error': 'Not logged in'}), 401
+    
+    hospital_id = session['hospital_id']
+    hours = min(max(request.args.get('hours', 24, type=int), 0), app.config['FORECAST_MAX_DAYS'] * 24)
+    window_end = (datetime.now() + timedelta(hours=hours)).strftime('%Y-%m-%d')
+    today = datetime.now().strftime('%Y-%m-%d')
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    # Overdue patients are included, since their beds are as good as free
+    cursor.execute(UPCOMING_DISCHARGES_QUERY, (hospital_id, window_end))
+    patients = [allocated_patient_json(patient) for patient in cursor.fetchall()]
+    
+    by_type = {}
+    for patient in patients:
+        patient['overdue'] = patient['expected_discharge'] < today
+        by_type[patient['bed_type']] = by_type.get(patient['bed_type'], 0) + 1
+    
+    return jsonify({
+        'window_hours': hours,
+        'window_end': window_end,
+        'beds_freeing_by_type': by_type,
+        'patients': patients
+    })
+
+@app.route('/api/allocation-plan')
+@versioned(period=current_date)
+def allocation_plan():
+    """Plan which free or soon-to-free bed each waiting patient gets over the next ?days (default 3)"""
+    if 'hospital_id' not in session:
+        return jsonify({'error': 'Not logged in'}), 401
+
+    hospital_id = session['hospital_id']
+    days = min(max(request.args.get('days', 3, type=int), 0), app.config['FORECAST_MAX_DAYS'])
+    assignments = plan_waiting_assignments(get_db().cursor(), hospital_id, days)
+
+    return jsonify({
+        'horizon_days': days,
+        'planned': sum(1 for assignment in assignments if assignment['bed_id']),
+        'assignments': assignments
+    })
+
+# Occupied beds of a hospital whose patient is due to leave by a date
+DISCHARGING_BEDS_QUERY = '''
+    SELECT p.bed_id, b.type, b.ward, p.expected_discharge_date
+    FROM patients p JOIN beds b ON b.id = p.bed_id
+    WHERE p.hospital_id = ? AND p.status = 'allocated' AND p.expected_discharge_date <= ?
+'''
+
+# Cost of a waiting patient spending a day of their expected stay in a fallback
+# bed, against a day of waiting by a patient of priority 0
+PLAN_FALLBACK_DAY_COST = 1.0
+
+def plan_waiting_assignments(cursor, hospital_id, horizon_days):
+    """Match waiting patients to beds free now or due to free within horizon_days, highest priority first"""
+    # Patients go in the order the waiting list serves them, each to the bed that
+    # costs least: days waited weighted by priority, plus days spent in a general
+    # bed they were not recommended. Within one bed type this gives the earliest
+    # beds to the highest priorities, which is the minimum-cost assignment. A bed
+    # whose new patient is expected to leave before the horizon is offered again.
+    today = datetime.now().date()
+    horizon = today + timedelta(days=horizon_days)
+
+    beds = {}  # bed_type -> heap of (days until free, bed_id, ward)
+    cursor.execute(FREE_BEDS_QUERY, (hospital_id,))
+    for bed_id, bed_type, ward in cursor.fetchall():
+        beds.setdefault(bed_type, []).append((0, bed_id, ward))
+    cursor.execute(DISCHARGING_BEDS_QUERY, (hospital_id, horizon.isoformat()))
+    for bed_id, bed_type, ward, discharge_date in cursor.fetchall():
+        free_in = max((datetime.strptime(discharge_date, '%Y-%m-%d').date() - today).days, 0)
+        beds.setdefault(bed_type, []).append((free_in, bed_id, ward))
+    for heap in beds.values():
+        heapq.heapify(heap)
+
+    cursor.execute(WAITING_PATIENTS_QUERY, (hospital_id,))
+    patients = sorted(cursor.fetchall(), key=lambda patient: (-patient[2], patient[3] or '', patient[0]))
+
+    assignments = []
+    for patient_id, bed_type, priority_score, waiting_since, stay in patients:
+        weight = 1 + priority_score / 20
+        options = []
+        if beds.get(bed_type):
+            options.append((beds[bed_type][0][0] * weight, bed_type))
+        if bed_type != 'general' and beds.get('general'):
+            options.append((beds['general'][0][0] * weight + (stay or 0) * PLAN_FALLBACK_DAY_COST, 'general'))
+
+        assignment = {
+            'patient_id': patient_id,
+            'priority_score': priority_score,
+            'recommended_type': bed_type,
+            'bed_id': None,
+            'bed_type': None,
+            'ward': None,
+            'expected_admission': None
+        }
+        if options:
+            chosen = min(options)[1]
+            free_in, bed_id, ward = heapq.heappop(beds[chosen])
+            assignment.update(bed_id=bed_id, bed_type=chosen, ward=ward,
+                              expected_admission=(today + timedelta(days=free_in)).isoformat())
+            if free_in + (stay or 0) <= horizon_days:
+                heapq.heappush(beds[chosen], (free_in + (stay or 0), bed_id, ward))
+        assignments.append(assignment)
+    return assignments
+
+@app.route('/api/bed-events')
+@versioned
+def bed_events():
+    """Get bed events of hospital between ?from and ?to (exclusive), optionally for one ?bed_id or ?type"""
+    if 'hospital_id' not in session:
+        return jsonify({'error': 'Not logged in'}), 401
+    
+    hospital_id = session['hospital_id']
+    try:
+        after = decode_cursor(request.args.get('after'), 2)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    limit = page_limit()
+    cursor = get_db().cursor()
+    cursor.execute(*bed_event_query(hospital_id, request.args, after, limit))
+    
+    return listing_response('events', cursor, bed_event_json, limit, lambda event: [event[4], event[0]])
+
+# Query parameters of bed_events and the condition each adds
+BED_EVENT_FILTERS = (
+    ('bed_id', 'bed_id = ?'),
+    ('from', 'occurred_at >= ?'),
+    ('to', 'occurred_at < ?'),
+    ('type', 'event_type = ?'),
+)
+
+def bed_event_query(hospital_id, filters, after=None, limit=None):
+    """SQL and parameters of the bed_events listing, from idx_bed_events_time or idx_bed_events_bed"""
+    conditions, params = ['hospital_id = ?'], [hospital_id]
+    for name, condition in BED_EVENT_FILTERS:
+        if filters.get(name):
+            conditions.append(condition)
+            params.append(filters[name])
+    if after:
+        conditions.append('(occurred_at, id) > (?, ?)')
+        params.extend(after)
+    
+    sql = f'''
+        SELECT id, bed_id, patient_id, event_type, occurred_at
+        FROM bed_events
+        WHERE {' AND '.join(conditions)}
+        ORDER BY occurred_at, id
+        {'LIMIT ?' if limit else ''}
+    '''
+    return sql, params + ([limit] if limit else [])
+
+def bed_event_json(event):
+    """Shape a bed event row, in the column order of bed_events, for the API"""
+    return {
+        'id': event[0],
+        'bed_id': event[1],
+        'patient_id': event[2],
+        'event_type': event[3],
+        'occurred_at': event[4]
+    }
+
+@app.route('/api/forecast')
+@versioned(period=current_date)
+def occupancy_forecast():
+    """Get projected occupancy and free beds per type for the next ?days (default 7)"""
+    if 'hospital_id' not in session:
+        return jsonify({'error': 'Not logged in'}), 401
+    
+    hospital_id = session['hospital_id']
+    days = min(max(request.args.get('days', 7, type=int), 1), app.config['FORECAST_MAX_DAYS'])
+    dates, forecast = forecast_occupancy(get_db(), days, hospital_id)
+    
+    return jsonify({
+        'dates': dates,
+        'bed_types': forecast.get(hospital_id, {})
+    })
+
+@app.route('/api/analytics')
+def utilization_analytics():
+    """Get occupancy rate, admissions, discharges, average stay and ICU turnover per ?granularity (hour or day) bucket between ?from and ?to"""
+    if 'hospital_id' not in session:
+        return jsonify({'error': 'Not logged in'}), 401
+
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in ROLLUP_TABLES:
+        return jsonify({'error': f"granularity must be one of {', '.join(ROLLUP_TABLES)}"}), 400
+    step = timedelta(hours=1) if granularity == 'hour' else timedelta(days=1)
+    try:
+        if request.args.get('to'):
+            end = local_time(request.args['to'])
+        else:
+            end = rollup_bucket(granularity, datetime.now())[1] + step
+        if request.args.get('from'):
+            start = local_time(request.args['from'])
+        else:
+            start = end - step * (24 if granularity == 'hour' else 7)
+    except (ValueError, OverflowError):
+        return jsonify({'error': 'from and to must be ISO dates or times'}), 400
+    if (end - start) / step > app.config['ANALYTICS_MAX_BUCKETS']:
+        return jsonify({'error': f"Range covers more than {app.config['ANALYTICS_MAX_BUCKETS']} buckets"}), 400
+
+    hospital_id = session['hospital_id']
+    beds, buckets = utilization_report(get_db(), hospital_id, granularity, start, end)
+    return jsonify({
+        'granularity': granularity,
+        'beds': beds,
+        'buckets': buckets
+    })
+
+def local_time(value):
+    """Parse an ISO date or time; one with a UTC offset is converted to local time, which the rollups use"""
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return moment
+
+def utilization_report(conn, hospital_id, granularity, start, end, now=None):
+    """Per-bucket utilization of a hospital, read from the rollups alone"""
+    now = now or datetime.now()
+    table = ROLLUP_TABLES[granularity]
+    step = timedelta(hours=1) if granularity == 'hour' else timedelta(days=1)
+    cursor = conn.cursor()
+
+    cursor.execute('SELECT type, total_beds FROM bed_type_stats WHERE hospital_id = ?', (hospital_id,))
+    beds = dict(cursor.fetchall())
+
+    starts = [rollup_bucket(granularity, start)[1]]
+    while starts[-1] + step < end:
+        starts.append(starts[-1] + step)
+    keys = [rollup_bucket(granularity, bucket_start)[0] for bucket_start in starts]
+    cursor.execute(rollup_range_query(table), (hospital_id, keys[0], keys[-1]))
+    rows = {(row[0], row[1]): dict(zip(ROLLUP_COLUMNS, row[2:])) for row in cursor.fetchall()}
+
+    # Beds occupied when the range opens carry through buckets without events
+    occupied = {}
+    for bed_type in BED_TYPES:
+        cursor.execute(latest_rollup_query(table, before=True), (hospital_id, bed_type, keys[0]))
+        row = cursor.fetchone()
+        occupied[bed_type] = row[ROLLUP_COLUMNS.index('occupied_end') + 1] if row else 0
+
+    buckets = []
+    for bucket, bucket_start in zip(keys, starts):
+        elapsed_end = min(bucket_start + step, now)
+        elapsed = max((elapsed_end - bucket_start).total_seconds(), 0)
+        totals = {'admissions': 0, 'discharges': 0, 'stays': 0, 'stay_seconds': 0.0, 'occupied_seconds': 0.0}
+        by_type = {}
+        for bed_type in BED_TYPES:
+            row = rows.get((bucket, bed_type))
+            if row:
+                tail = (elapsed_end - parse_timestamp(row['last_event_at'])).total_seconds()
+                row['occupied_seconds'] += row['occupied_end'] * max(tail, 0)
+                occupied[bed_type] = row['occupied_end']
+            else:
+                row = {'admissions': 0, 'discharges': 0, 'stays': 0, 'stay_seconds': 0.0,
+                       'occupied_seconds': occupied[bed_type] * elapsed}
+            for column in totals:
+                totals[column] += row[column]
+            by_type[bed_type] = {
+                'admissions': row['admissions'],
+                'discharges': row['discharges'],
+                'occupied_beds': occupied[bed_type],
+                'occupancy_rate': occupancy_rate(row['occupied_seconds'], beds.get(bed_type, 0), elapsed)
+            }
+        icu_beds = beds.get('icu', 0)
+        buckets.append({
+            'bucket': bucket,
+            'admissions': totals['admissions'],
+            'discharges': totals['discharges'],
+            'occupancy_rate': occupancy_rate(totals['occupied_seconds'], sum(beds.values()), elapsed),
+            'average_stay_days': round(totals['stay_seconds'] / totals['stays'] / 86400, 2) if totals['stays'] else None,
+            'icu_turnover': round(by_type['icu']['discharges'] / icu_beds, 4) if icu_beds else None,
+            'by_type': by_type
+        })
+    return beds, buckets
+
+def occupancy_rate(occupied_seconds, beds, elapsed):
+    """Share of bed time occupied, or None before the bucket has started"""
+    if not beds or not elapsed:
+        return None
+    return round(min(occupied_seconds / (beds * elapsed), 1.0), 4)
+
+@app.route('/api/network-availability')
+def network_availability():
+    """Rank hospitals across the network by free beds, optionally of one ?type, returning the ?top (default 10)"""
+    if 'hospital_id' not in session:
+        return jsonify({'error': 'Not logged in'}), 401
+    
+    bed_type = request.args.get('type')
+    if bed_type and bed_type not in BED_TYPES:
+        return jsonify({'error': f"type must be one of {', '.join(BED_TYPES)}"}), 400
+    top = min(max(request.args.get('top', 10, type=int), 1), app.config['PAGE_SIZE_MAX'])
+    min_free = max(request.args.get('min_free', 1, type=int), 0)
+    
+    # Shards report their counters to the catalog, so one database answers for the whole network
+    catalog = get_catalog()
+    table = 'network_bed_stats' if app.config['SHARD_DIR'] else 'bed_type_stats'
+    hospitals = network_free_beds(catalog, table, bed_type, min_free, top)
+    
+    cursor = catalog.cursor()
+    hospital_ids = [hospital['hospital_id'] for hospital in hospitals]
+    cursor.execute(f'''
+        SELECT id, name, address, contact FROM hospitals
+        WHERE id IN ({', '.join('?' * len(hospital_ids))})
+    ''', hospital_ids)
+    details = {row[0]: row[1:] for row in cursor.fetchall()}
+    for hospital in hospitals:
+        hospital['name'], hospital['address'], hospital['contact'] = details.get(hospital['hospital_id'], (None,) * 3)
+    
+    return jsonify({
+        'bed_type': bed_type,
+        'hospitals': hospitals
+    })
+
+def network_top_query(table):
+    """SQL of the hospitals with the most free beds of one type, from the (type, available_beds) index"""
+    return f'''
+        SELECT hospital_id, type, total_beds, available_beds
+        FROM {table}
+        WHERE type = ? AND available_beds >= ?
+        ORDER BY available_beds DESC
+        LIMIT ?
+    '''
+
+def network_free_beds(conn, table, bed_type, min_free, top):
+    """Top hospitals by free beds from per-type counters (bed_type_stats or network_bed_stats)"""
+    cursor = conn.cursor()
+    if bed_type:
+        cursor.execute(network_top_query(table), (bed_type, min_free, top))
+        return [{'hospital_id': row[0], 'free_beds': row[3], 'total_beds': row[2]} for row in cursor.fetchall()]
+    
+    cursor.execute(f'SELECT hospital_id, type, total_beds, available_beds FROM {table}')
+    by_hospital = {}
+    for hospital_id, row_type, total_beds, available_beds in cursor.fetchall():
+        hospital = by_hospital.setdefault(hospital_id, {
+            'hospital_id': hospital_id, 'free_beds': 0, 'total_beds': 0, 'free_by_type': {}
+        })
+        hospital['free_beds'] += available_beds
+        hospital['total_beds'] += total_beds
+        hospital['free_by_type'][row_type] = available_beds
+    candidates = [hospital for hospital in by_hospital.values() if hospital['free_beds'] >= min_free]
+    return heapq.nlargest(top, candidates, key=lambda hospital: hospital['free_beds'])
+
+@app.route('/api/verify-bed-index', methods=['POST'])
+def verify_bed_index():
+    """Check this server's in-memory bed availability index against the beds table, rebuilding it if needed"""
+    if 'hospital_id' not in session:
+        return jsonify({'error': 'Not logged in'}), 401
+    
+    rebuilt = bed_index.verify(get_db().cursor(), session['hospital_id'])
+    return jsonify({
+        'success': True,
+        'message': 'Bed index rebuilt from the beds table.' if rebuilt else 'Bed index matches the beds table.',
+        'rebuilt': rebuilt
+    })
+
+@app.route('/api/import-beds', methods=['POST'])
+def import_bed_inventory():
+    """Import a CSV or JSON bed inventory (ward, type, id) into hospital"""
+    if 'hospital_id' not in session:
+        return jsonify({'error': 'Not logged in'}), 401
+    
+    upload = request.files.get('file')
+    if upload:
+        stream = upload.stream
+        fmt = request.args.get('format') or inventory_format(upload.filename, upload.mimetype)
+    else:
+        stream = request.stream
+        fmt = request.args.get('format') or inventory_format(None, request.content_type)
+    
+    # Read and validate the whole upload before taking the write lock
+    try:
+        records = list(read_bed_inventory(stream, fmt))
+        result = run_write(import_beds, session['hospital_id'], records)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Import failed: {str(e)}'
+        })
+    
+    skipped = result['skipped']
+    message = f"{result['created']} beds imported."
+    if skipped:
+        message = f"{result['created']} beds imported, {len(skipped)} skipped because their IDs are already in use."
+    return jsonify({
+        'success': True,
+        'message': message,
+        'created': result['created'],
+        'skipped': len(skipped),
+        'skipped_ids': skipped[:app.config['IMPORT_SKIPPED_IDS_MAX']]
+    })
+
 def calculate_expected_discharge(admission_date, expected_stay_days):
     """Calculate expected discharge date"""
     if admission_date and expected_stay_days:
@@ -696,15 +3712,217 @@ def calculate_expected_discharge(admission_date, expected_stay_days):
         return discharge.strftime('%Y-%m-%d')
     return None
 
+@app.route('/api/events')
+def event_stream():
+    """Stream bed and patient changes for hospital as Server-Sent Events"""
+    if 'hospital_id' not in session:
+        return jsonify({'error': 'Not logged in'}), 401
+    
+    hospital_id = session['hospital_id']
+    resume_from = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    keepalive = app.config['EVENT_KEEPALIVE']
+    
+    def generate(last_event_id):
+        yield 'retry: 3000\n\n'
+        if last_event_id is None:
+            # Fresh subscriber: it loads a snapshot after this and applies changes from here on
+            last_event_id = events.last_id
+            yield f'id: {last_event_id}\nevent: ready\ndata: {{}}\n\n'
+        
+        while True:
+            pending = events.wait(hospital_id, last_event_id, keepalive)
+            if pending is None:
+                # Too far behind (or from before a restart); the client reloads its snapshot
+                last_event_id = events.last_id
+                yield f'id: {last_event_id}\nevent: resync\ndata: {{}}\n\n'
+            elif not pending:
+                yield ': keep-alive\n\n'
+            for event_id, event_type, data in pending or ():
+                last_event_id = event_id
+                yield f'id: {event_id}\nevent: {event_type}\ndata: {app.json.dumps(data)}\n\n'
+    
+    try:
+        last_event_id = int(resume_from) if resume_from else None
+    except ValueError:
+        last_event_id = -1  # unknown position, forces a resync
+    
+    return Response(generate(last_event_id), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Expose request, SQL and allocation metrics in the Prometheus text format"""
+    if not metrics.enabled:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    
+    with _pools_lock:
+        pools = list(_pools.values())
+    with _writers_lock:
+        writers = list(_writers.values())
+    gauges = [
+        ('cura_db_pool_idle_connections', (('database', os.path.basename(pool.path)),), len(pool._idle))
+        for pool in pools
+    ] + [
+        ('cura_write_queue_depth', (('database', os.path.basename(writer.path)),), writer._queue.qsize())
+        for writer in writers
+    ]
+    return Response(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
 @app.route('/logout')
 def logout():
     """Logout user"""
     session.clear()
     return jsonify({'success': True, 'message': 'Logged out successfully'})
 
+@app.cli.command('migrate')
+def migrate_command():
+    """Upgrade the database schema in place"""
+    conn = connect_db()
+    version = migrate_db(conn)
+    conn.close()
+    shards = hospital_databases() if app.config['SHARD_DIR'] else []
+    for path in shards:
+        conn = connect_db(path)
+        migrate_db(conn)
+        clear_shard_passwords(conn)
+        conn.close()
+    if shards:
+        # Seeds network_bed_stats on first migration, and catches up with any changes it missed
+        catalog = connect_db()
+        refresh_network_stats(catalog, shards)
+        catalog.close()
+    print(f"Database schema is at version {version}" + (f" in the catalog and {len(shards)} shards" if shards else ''))
+
+@app.cli.command('check-indexes')
+def check_indexes_command():
+    """Verify with EXPLAIN QUERY PLAN that every hot query uses an index"""
+    conn = connect_db()
+    migrate_db(conn)
+    problems = check_query_plans(conn)
+    conn.close()
+    
+    for name, plan in problems:
+        print(f"{name}: not index-backed")
+        for detail in plan:
+            print(f"    {detail}")
+    if problems:
+        raise SystemExit(1)
+    print(f"All {len(indexed_queries())} hot queries use an index")
+
+@app.cli.command('reconcile-stats')
+@click.option('--check-only', is_flag=True, help='Report mismatched counters without repairing them')
+def reconcile_stats_command(check_only):
+    """Recompute the dashboard bed counters and verify them against the beds table"""
+    mismatched = []
+    for path in hospital_databases():
+        conn = connect_db(path)
+        migrate_db(conn)
+        mismatched.extend(reconcile_bed_stats(conn, repair=not check_only))
+        conn.close()
+    
+    if app.config['SHARD_DIR'] and not check_only:
+        catalog = connect_db()
+        migrate_db(catalog)
+        refreshed = refresh_network_stats(catalog, hospital_databases())
+        catalog.close()
+        print(f"Network bed counters refreshed from {refreshed} shard counters")
+    
+    for hospital_id in mismatched:
+        print(f"{hospital_id}: counters {'out of date' if check_only else 'repaired'}")
+    if mismatched and check_only:
+        raise SystemExit(1)
+    if not mismatched:
+        print('All bed counters match the beds table')
+
+@app.cli.command('backfill-rollups')
+def backfill_rollups_command():
+    """Rebuild the hourly and daily utilization rollups from the bed event log"""
+    for path in hospital_databases():
+        conn = connect_db(path)
+        migrate_db(conn)
+        start = time.perf_counter()
+        replayed = run_write(lambda tx: rebuild_rollups(tx.cursor), conn=conn)
+        conn.close()
+        print(f"{os.path.basename(path)}: replayed {replayed} bed events in {time.perf_counter() - start:.2f}s")
+
+@app.cli.command('archive-patients')
+@click.option('--days', type=int, help='Archive patients discharged more than this many days ago '
+                                       '(default: ARCHIVE_AFTER_DAYS)')
+@click.option('--batch', type=int, help='Patients moved per transaction (default: ARCHIVE_BATCH)')
+def archive_patients_command(days, batch):
+    """Move long-discharged patients out of the patients table into patients_archive"""
+    days = app.config['ARCHIVE_AFTER_DAYS'] if days is None else days
+    batch = batch or app.config['ARCHIVE_BATCH']
+    for path in hospital_databases():
+        conn = connect_db(path)
+        migrate_db(conn)
+        start = time.perf_counter()
+        archived = archive_discharged(conn, days, batch)
+        conn.close()
+        print(f"{os.path.basename(path)}: archived {archived} patients discharged before "
+              f"{archive_cutoff(days)} in {time.perf_counter() - start:.2f}s")
+
+@app.cli.command('import-beds')
+@click.argument('hospital_id')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'json', 'jsonl']),
+              help='Inventory format (default: from the file extension)')
+def import_beds_command(hospital_id, path, fmt):
+    """Import a bed inventory file (ward, type, id) into a hospital"""
+    database = shard_path(hospital_id)
+    if not os.path.exists(database):
+        raise click.ClickException(f'Unknown hospital {hospital_id}')
+    conn = connect_db(database)
+    migrate_db(conn)
+    try:
+        with open(path, 'rb') as stream:
+            records = list(read_bed_inventory(stream, fmt or inventory_format(path)))
+        result = run_write(import_beds, hospital_id, records, conn=conn)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    finally:
+        conn.close()
+    # The new beds' counters reach the catalog on its writer thread, which dies with the process
+    flush_writers()
+    print(f"{result['created']} beds imported into {hospital_id}")
+    if result['skipped']:
+        print(f"{len(result['skipped'])} skipped because their IDs are already in use: "
+              f"{', '.join(result['skipped'][:app.config['IMPORT_SKIPPED_IDS_MAX']])}")
+
+@app.cli.command('forecast')
+@click.option('--days', default=7, show_default=True, help='Days to project')
+def forecast_command(days):
+    """Print the occupancy forecast of every hospital as JSON"""
+    dates, forecast, elapsed = [], {}, 0
+    for path in hospital_databases():
+        conn = connect_db(path)
+        start = time.perf_counter()
+        dates, hospitals = forecast_occupancy(conn, days)
+        elapsed += time.perf_counter() - start
+        conn.close()
+        forecast.update(hospitals)
+    print(json.dumps({'dates': dates, 'hospitals': forecast}, indent=2))
+    print(f"Forecast {len(forecast)} hospitals in {elapsed * 1000:.1f} ms", file=sys.stderr)
+
+@app.cli.command('split-database')
+@click.argument('target_dir', type=click.Path(file_okay=False))
+def split_database_command(target_dir):
+    """Copy the database into a catalog and one shard per hospital under TARGET_DIR"""
+    if os.path.exists(os.path.join(target_dir, CATALOG_FILE)):
+        raise click.ClickException(f'{target_dir} already holds a split database')
+    for hospital_id, beds, patients in split_database(app.config['DATABASE'], target_dir):
+        print(f"{hospital_id}: {beds} beds, {patients} patients")
+    print(f"Run with DATABASE={os.path.join(target_dir, CATALOG_FILE)} SHARD_DIR={target_dir}")
+
 if __name__ == '__main__':
     # Initialize database
     init_db()
+    for path in hospital_databases():
+        conn = connect_db(path)
+        bed_index.load(conn.cursor())
+        conn.close()
     print("Database initialized!")
     print("Sample hospital created: HOSP001 (password: password123)")
     print("Access the application at: http://127.0.0.1:5000")
@@ -0,0 +1,892 @@
+"""Benchmarks for the CURA bed allocation API
+
+Each scenario runs against a throwaway database and prints one JSON
+object per line, so results can be compared across commits.
+
+Usage:
+    python benchmark.py                      # run every scenario
+    python benchmark.py batch-admission      # run selected scenarios
+    python benchmark.py load --clients 32    # override a scenario's parameters
+"""
+import argparse
+import inspect
+import json
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import render_template, send_from_directory
+from flask.json.provider import DefaultJSONProvider
+
+from app import (app, init_db, FastJSONProvider, allocate_patients, archive_discharged, asset_response, connect_db,
+                 create_sample_beds, create_shard, discharge, forecast_occupancy, import_beds, insert_hospital, metrics, next_patient_ids,
+                 hospital_databases, plan_waiting_assignments, read_bed_inventory, rebuild_rollups, reconcile_bed_stats,
+                 refresh_network_stats, run_write, shard_path, static_assets, write_bed_events)
+
+SAMPLE_PATIENT = {
+    'patient_name': 'Benchmark Patient',
+    'age': 45,
+    'blood_group': 'O+',
+    'admission_cause': 'Trauma',
+    'severity': 'medium',
+    'health_risk': 'moderate',
+    'doctor_recommendation': 'general'
+}
+
+def fresh_database(sharded=False):
+    """Point the app at an empty database in a temporary directory"""
+    directory = tempfile.mkdtemp(prefix='cura-bench-')
+    app.config['DATABASE'] = os.path.join(directory, 'hospital.db')
+    app.config['SHARD_DIR'] = os.path.join(directory, 'shards') if sharded else None
+    init_db()
+    return directory
+
+def register_hospital(client, hospital_id, total_beds, icu_beds):
+    """Register a hospital and log the client in to it"""
+    client.post('/register', json={
+        'hospital_id': hospital_id,
+        'name': f'{hospital_id} Benchmark Hospital',
+        'address': 'Benchmark Road',
+        'contact': '000',
+        'total_beds': total_beds,
+        'icu_beds': icu_beds,
+        'password': 'bench'
+    })
+    client.post('/login', json={'hospital_id': hospital_id, 'password': 'bench'})
+
+def surge_patients(count):
+    """Patients of mixed severity, as arriving during a mass-casualty event"""
+    mix = [
+        ('high', 'critical', 'icu'),
+        ('medium', 'moderate', 'general'),
+        ('low', 'stable', 'flexible'),
+        ('low', 'stable', 'general')
+    ]
+    patients = []
+    for i in range(count):
+        severity, health_risk, recommendation = mix[i % len(mix)]
+        patients.append(dict(
+            SAMPLE_PATIENT,
+            patient_name=f'Surge Patient {i}',
+            severity=severity,
+            health_risk=health_risk,
+            doctor_recommendation=recommendation
+        ))
+    return patients
+
+def bench_batch_admission(patients=50, rounds=5):
+    """N calls to /api/allocate-bed against one call to /api/allocate-beds"""
+    single_times, batch_times = [], []
+    for round_number in range(rounds):
+        directory = fresh_database()
+        try:
+            client = app.test_client()
+            register_hospital(client, 'BENCH', patients * 2, patients // 2)
+            start = time.perf_counter()
+            for patient in surge_patients(patients):
+                client.post('/api/allocate-bed', json=patient)
+            single_times.append(time.perf_counter() - start)
+
+            register_hospital(client, 'BENCHB', patients * 2, patients // 2)
+            start = time.perf_counter()
+            client.post('/api/allocate-beds', json={'patients': surge_patients(patients)})
+            batch_times.append(time.perf_counter() - start)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    single = min(single_times)
+    batch = min(batch_times)
+    return {
+        'patients': patients,
+        'single_calls_ms': round(single * 1000, 2),
+        'batch_call_ms': round(batch * 1000, 2),
+        'speedup': round(single / batch, 1)
+    }
+
+def bench_rounds(patients=50, rounds=5):
+    """End-of-day rounds as separate discharge and extend calls against one call to /api/rounds"""
+    single_times, batch_times = [], []
+    for round_number in range(rounds):
+        directory = fresh_database()
+        try:
+            client = app.test_client()
+            timings = []
+            for hospital_id in ('ROUNDS', 'ROUNDSB'):
+                register_hospital(client, hospital_id, patients * 5, patients // 2)
+                admitted = client.post('/api/allocate-beds', json={'patients': [
+                    dict(SAMPLE_PATIENT, severity='low', health_risk='stable', doctor_recommendation='flexible')
+                    for _ in range(patients)
+                ]}).get_json()['results']
+                # Extend every other patient, discharge the rest
+                actions = [{'action': 'extend' if i % 2 else 'discharge', 'patient_id': result['patient_id']}
+                           for i, result in enumerate(admitted)]
+                start = time.perf_counter()
+                if hospital_id == 'ROUNDS':
+                    for action in actions:
+                        url = '/api/extend-stay' if action['action'] == 'extend' else '/api/discharge-patient'
+                        client.post(url, json={'patient_id': action['patient_id']})
+                else:
+                    client.post('/api/rounds', json={'actions': actions})
+                timings.append(time.perf_counter() - start)
+            single_times.append(timings[0])
+            batch_times.append(timings[1])
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    
+    single = min(single_times)
+    batch = min(batch_times)
+    return {
+        'actions': patients,
+        'single_calls_ms': round(single * 1000, 2),
+        'rounds_call_ms': round(batch * 1000, 2),
+        'speedup': round(single / batch, 1)
+    }
+
+def legacy_create_beds(conn, hospital_id, total_beds, icu_beds):
+    """The original one-execute-per-bed provisioning, kept as a baseline"""
+    cursor = conn.cursor()
+    for i in range(1, total_beds - icu_beds + 1):
+        cursor.execute('''
+            INSERT OR IGNORE INTO beds (id, hospital_id, type, ward, status)
+            VALUES (?, ?, 'general', ?, 'available')
+        ''', (f"{hospital_id}_BED{i:03d}", hospital_id, 'Ward A' if i % 2 == 0 else 'Ward B'))
+    for i in range(1, icu_beds + 1):
+        cursor.execute('''
+            INSERT OR IGNORE INTO beds (id, hospital_id, type, ward, status)
+            VALUES (?, ?, 'icu', ?, 'available')
+        ''', (f"{hospital_id}_ICU{i:03d}", hospital_id, 'ICU Unit 1'))
+    for i in range(1, int(total_beds * 0.2) + 1):
+        cursor.execute('''
+            INSERT OR IGNORE INTO beds (id, hospital_id, type, ward, status)
+            VALUES (?, ?, 'flexible', ?, 'available')
+        ''', (f"{hospital_id}_FLEX{i:03d}", hospital_id, 'Flex Care Unit'))
+
+def bench_bulk_provisioning(beds=100000):
+    """Provision a large hospital per-row, in bulk, and by CSV import"""
+    directory = fresh_database()
+    try:
+        conn = connect_db()
+        total_beds = int(beds / 1.2)  # flexible beds add another 20%
+        timings = {}
+        for name, provision in (('legacy_ms', legacy_create_beds), ('bulk_ms', create_sample_beds)):
+            hospital_id = name.upper()
+            conn.execute('''
+                INSERT INTO hospitals (id, name, address, contact, total_beds, icu_beds, password)
+                VALUES (?, ?, '-', '-', ?, ?, '-')
+            ''', (hospital_id, hospital_id, total_beds, total_beds // 10))
+            start = time.perf_counter()
+            provision(conn, hospital_id, total_beds, total_beds // 10)
+            conn.commit()
+            timings[name] = round((time.perf_counter() - start) * 1000, 1)
+
+        inventory = os.path.join(directory, 'inventory.csv')
+        with open(inventory, 'w') as f:
+            f.write('ward,type,id\n')
+            for i in range(beds):
+                f.write(f"Ward {i % 40},{('general', 'icu', 'flexible')[i % 3]},IMPORT_{i}\n")
+        conn.execute('''
+            INSERT INTO hospitals (id, name, address, contact, total_beds, icu_beds, password)
+            VALUES ('IMPORT', 'IMPORT', '-', '-', 0, 0, '-')
+        ''')
+        conn.commit()
+        start = time.perf_counter()
+        with open(inventory, 'rb') as stream:
+            records = list(read_bed_inventory(stream, 'csv'))
+        run_write(import_beds, 'IMPORT', records, conn=conn)
+        timings['csv_import_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        conn.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return dict(beds=beds, **timings, speedup=round(timings['legacy_ms'] / timings['bulk_ms'], 1))
+
+def bench_forecast(hospitals=100, patients=80, days=30):
+    """Forecast every hospital of a busy network in one pass"""
+    directory = fresh_database()
+    try:
+        client = app.test_client()
+        for i in range(hospitals):
+            register_hospital(client, f'FC{i:03d}', patients, patients // 5)
+            client.post('/api/allocate-beds', json={'patients': surge_patients(patients)})
+        conn = connect_db()
+        start = time.perf_counter()
+        forecast_occupancy(conn, days)
+        elapsed = time.perf_counter() - start
+        conn.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        'hospitals': hospitals,
+        'patients': hospitals * patients,
+        'days': days,
+        'forecast_ms': round(elapsed * 1000, 1)
+    }
+
+def bench_sharding(hospitals=8, admissions=50):
+    """Concurrent admissions at several hospitals, sharing one database file or one shard each"""
+    results = {}
+    for sharded in (False, True):
+        directory = fresh_database(sharded)
+        try:
+            clients = []
+            for i in range(hospitals):
+                client = app.test_client()
+                register_hospital(client, f'SHARD{i:02d}', admissions * 2, admissions // 2)
+                clients.append(client)
+            
+            def admit(client):
+                for patient in surge_patients(admissions):
+                    client.post('/api/allocate-bed', json=patient)
+            
+            threads = [threading.Thread(target=admit, args=(client,)) for client in clients]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+            app.config['SHARD_DIR'] = None
+        results['sharded' if sharded else 'single_file'] = round(hospitals * admissions / elapsed)
+    
+    return {
+        'hospitals': hospitals,
+        'admissions_per_hospital': admissions,
+        'single_file_admissions_per_s': results['single_file'],
+        'sharded_admissions_per_s': results['sharded'],
+        'speedup': round(results['sharded'] / results['single_file'], 1)
+    }
+
+def bench_double_booking(clients=20, admissions=20):
+    """Concurrent admissions and discharges at one hospital, failing if any bed or patient ID is handed out twice"""
+    results = {}
+    for sharded in (False, True):
+        for group_commit in (False, True):
+            app.config['WRITE_GROUP_COMMIT'] = group_commit
+            mode = f"{'sharded' if sharded else 'single_file'}_{'group_commit' if group_commit else 'per_request'}"
+            # A hospital ID per run, so the in-memory bed index starts empty
+            hospital_id = f'STRESS{len(results)}'
+            directory = fresh_database(sharded)
+            try:
+                # Fewer beds than admissions, so some patients wait and are promoted by discharges
+                setup = app.test_client()
+                register_hospital(setup, hospital_id, clients * admissions * 3 // 4, clients * admissions // 8)
+                patient_ids, errors = [], []
+                
+                def admit_and_discharge():
+                    client = app.test_client()
+                    client.post('/login', json={'hospital_id': hospital_id, 'password': 'bench'})
+                    admitted = []
+                    for patient in surge_patients(admissions):
+                        response = client.post('/api/allocate-bed', json=patient).get_json()
+                        if response.get('patient_id'):
+                            admitted.append(response['patient_id'])
+                        elif response['message'].startswith('Error'):
+                            errors.append(response['message'])
+                    for patient_id in admitted[::4]:
+                        response = client.post('/api/discharge-patient', json={'patient_id': patient_id}).get_json()
+                        if not response['success']:
+                            errors.append(response['message'])
+                    patient_ids.extend(admitted)
+                
+                threads = [threading.Thread(target=admit_and_discharge) for _ in range(clients)]
+                start = time.perf_counter()
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                elapsed = time.perf_counter() - start
+                
+                conn = connect_db(shard_path(hospital_id))
+                double_booked = conn.execute('''
+                    SELECT bed_id FROM patients
+                    WHERE hospital_id = ? AND status = 'allocated'
+                    GROUP BY bed_id HAVING COUNT(*) > 1
+                ''', (hospital_id,)).fetchall()
+                mismatched_beds = conn.execute('''
+                    SELECT b.id FROM beds b JOIN patients p ON p.bed_id = b.id
+                    WHERE p.status = 'allocated' AND b.patient_id IS NOT p.id
+                ''').fetchall()
+                patients, waiting, allocated = conn.execute('''
+                    SELECT COUNT(*), SUM(status = 'waiting'), SUM(status = 'allocated')
+                    FROM patients WHERE hospital_id = ?
+                ''', (hospital_id,)).fetchone()
+                stale_stats = reconcile_bed_stats(conn, repair=False)
+                conn.close()
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+                app.config['SHARD_DIR'] = None
+                app.config['WRITE_GROUP_COMMIT'] = True
+
+            problems = []
+            if errors:
+                problems.append(f'{len(errors)} failed requests, e.g. {errors[0]!r}')
+            # A reused patient ID shows up twice in the responses, or as fewer rows than admissions
+            if len(set(patient_ids)) != len(patient_ids) or patients != clients * admissions:
+                problems.append(f'{len(patient_ids) - len(set(patient_ids))} duplicate patient IDs, '
+                                f'{patients} patients stored for {clients * admissions} admissions')
+            if double_booked or mismatched_beds:
+                problems.append(f'beds held twice: {sorted({row[0] for row in double_booked + mismatched_beds})}')
+            if stale_stats:
+                problems.append(f'bed_stats disagrees with beds for {stale_stats}')
+            if problems:
+                raise AssertionError(f'{mode}: ' + '; '.join(problems))
+            results[mode] = {
+                'admissions_per_s': round(clients * admissions / elapsed),
+                'allocated': allocated,
+                'waiting': waiting
+            }
+    
+    return dict(clients=clients, admissions=clients * admissions, **results)
+
+def percentile(samples, fraction):
+    """Value below which the given fraction of sorted samples fall"""
+    return samples[min(int(len(samples) * fraction), len(samples) - 1)]
+
+def bench_group_commit(clients=32, admissions=25):
+    """Concurrent admissions at one hospital with per-request commits against the group commit writer"""
+    results = {}
+    for group_commit in (False, True):
+        app.config['WRITE_GROUP_COMMIT'] = group_commit
+        directory = fresh_database()
+        try:
+            setup = app.test_client()
+            register_hospital(setup, 'GROUP', clients * admissions, clients * admissions // 4)
+            latencies, errors = [], []
+            
+            def admit():
+                client = app.test_client()
+                client.post('/login', json={'hospital_id': 'GROUP', 'password': 'bench'})
+                for patient in surge_patients(admissions):
+                    start = time.perf_counter()
+                    response = client.post('/api/allocate-bed', json=patient).get_json()
+                    latencies.append(time.perf_counter() - start)
+                    if response['message'].startswith('Error'):
+                        errors.append(response['message'])
+            
+            threads = [threading.Thread(target=admit) for _ in range(clients)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+            app.config['WRITE_GROUP_COMMIT'] = True
+        
+        latencies.sort()
+        results['group_commit' if group_commit else 'per_request'] = {
+            'admissions_per_s': round(len(latencies) / elapsed),
+            'p50_ms': round(percentile(latencies, 0.5) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+            'errors': len(errors)
+        }
+    
+    return dict(clients=clients, admissions=clients * admissions, **results)
+
+def synthetic_hospital(conn, hospital_id, beds, history, rng):
+    """Provision a hospital with beds and a history of discharged patients"""
+    insert_hospital(conn.cursor(), (hospital_id, f'{hospital_id} Load Hospital', 'Load Road', '000',
+                                    beds, beds // 10, 'bench'))
+    create_sample_beds(conn, hospital_id, beds, beds // 10)
+    
+    cursor = conn.cursor()
+    today = datetime.now()
+    mix = [('high', 'critical', 'icu', 7), ('medium', 'moderate', 'general', 5), ('low', 'stable', 'flexible', 2)]
+    patient_ids = next_patient_ids(cursor, history)
+    rows = []
+    events = []
+    for i, patient_id in enumerate(patient_ids):
+        severity, health_risk, recommendation, stay = mix[i % len(mix)]
+        admitted = today - timedelta(days=rng.randint(stay, 730))
+        bed_id = f'{hospital_id}_BED{i % (beds - beds // 10) + 1:03d}'
+        rows.append((
+            patient_id, f'Past Patient {i}', rng.randint(1, 95), 'O+', 'Observation', severity, health_risk,
+            recommendation, 0, bed_id, admitted.strftime('%Y-%m-%d'),
+            (admitted + timedelta(days=stay)).strftime('%Y-%m-%d'), stay, hospital_id
+        ))
+        events.append((hospital_id, bed_id, patient_id, 'admitted', admitted.strftime('%Y-%m-%d 00:00:00')))
+        events.append((hospital_id, bed_id, patient_id, 'discharged',
+                       (admitted + timedelta(days=stay)).strftime('%Y-%m-%d 00:00:00')))
+    cursor.executemany('''
+        INSERT INTO patients (id, name, age, blood_group, condition, severity, health_risk,
+                              doctor_recommendation, priority_score, status, bed_id, admission_date,
+                              discharge_date, expected_stay_days, hospital_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'discharged', ?, ?, ?, ?, ?)
+    ''', rows)
+    events.sort(key=lambda event: event[4])
+    write_bed_events(cursor, events)
+    conn.commit()
+
+# Share of each operation in the simulated client mix
+LOAD_MIX = [
+    ('allocate-bed', 25),
+    ('discharge-patient', 15),
+    ('extend-stay', 5),
+    ('dashboard-data', 15),
+    ('available-beds', 10),
+    ('allocated-patients', 10),
+    ('waiting-list', 8),
+    ('upcoming-discharges', 7),
+    ('forecast', 5),
+]
+
+READS = {
+    'dashboard-data': '/api/dashboard-data',
+    'available-beds': '/api/available-beds?limit=50',
+    'allocated-patients': '/api/allocated-patients?limit=50',
+    'waiting-list': '/api/waiting-list',
+    'upcoming-discharges': '/api/upcoming-discharges',
+    'forecast': '/api/forecast',
+}
+
+def simulate_client(hospital_id, requests, seed, record):
+    """One ward client logging in and issuing a random mix of writes and reads"""
+    rng = random.Random(seed)
+    client = app.test_client()
+    admitted = []
+    operations, weights = zip(*LOAD_MIX)
+    
+    def call(route, method, url, body=None):
+        start = time.perf_counter()
+        response = client.open(url, method=method, json=body)
+        elapsed = time.perf_counter() - start
+        data = response.get_json(silent=True) or {}
+        failed = response.status_code >= 400 or str(data.get('message', '')).startswith('Error')
+        record(route, elapsed, failed)
+        return data
+    
+    call('login', 'POST', '/login', {'hospital_id': hospital_id, 'password': 'bench'})
+    for _ in range(requests):
+        operation = rng.choices(operations, weights)[0]
+        if operation == 'allocate-bed':
+            patient = surge_patients(4)[rng.randrange(4)]
+            result = call(operation, 'POST', '/api/allocate-bed', patient)
+            if result.get('patient_id'):
+                admitted.append((result['patient_id'], patient['doctor_recommendation']))
+        elif operation == 'discharge-patient' and admitted:
+            patient_id, _ = admitted.pop(rng.randrange(len(admitted)))
+            call(operation, 'POST', '/api/discharge-patient', {'patient_id': patient_id})
+        elif operation == 'extend-stay' and admitted:
+            flexible = [patient_id for patient_id, bed_type in admitted if bed_type == 'flexible']
+            if flexible:
+                call(operation, 'POST', '/api/extend-stay', {'patient_id': rng.choice(flexible)})
+        elif operation in READS:
+            call(operation, 'GET', READS[operation])
+
+def bench_load(hospitals=4, beds=2000, history=50000, clients=16, requests=100, seed=1):
+    """Concurrent simulated clients against every API, reporting latency percentiles per route"""
+    directory = fresh_database()
+    rng = random.Random(seed)
+    samples = {}
+    lock = threading.Lock()
+    
+    def record(route, elapsed, failed):
+        with lock:
+            route_samples = samples.setdefault(route, ([], [0]))
+            route_samples[0].append(elapsed)
+            route_samples[1][0] += failed
+    
+    try:
+        conn = connect_db()
+        start = time.perf_counter()
+        hospital_ids = [f'LOAD{i:03d}' for i in range(hospitals)]
+        for hospital_id in hospital_ids:
+            synthetic_hospital(conn, hospital_id, beds, history, rng)
+        conn.close()
+        setup = time.perf_counter() - start
+        
+        threads = [
+            threading.Thread(target=simulate_client,
+                             args=(hospital_ids[i % hospitals], requests, seed + i, record))
+            for i in range(clients)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    
+    routes = {}
+    for route, (latencies, errors) in sorted(samples.items()):
+        latencies.sort()
+        routes[route] = {
+            'requests': len(latencies),
+            'errors': errors[0],
+            'per_s': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2)
+        }
+    total = sum(route['requests'] for route in routes.values())
+    return {
+        'hospitals': hospitals,
+        'beds': hospitals * beds,
+        'history': hospitals * history,
+        'clients': clients,
+        'setup_s': round(setup, 1),
+        'requests_per_s': round(total / elapsed, 1),
+        'routes': routes
+    }
+
+def bench_metrics_overhead(requests=500):
+    """Per-request cost of admissions and dashboard reads with metrics disabled and enabled"""
+    results = {}
+    enabled = metrics.enabled
+    for collect in (False, True):
+        # Connections pick their cursor type when opened, so each run gets a fresh database
+        metrics.enabled = collect
+        directory = fresh_database()
+        try:
+            client = app.test_client()
+            register_hospital(client, 'METRICS', requests * 2, requests // 4)
+            patients = surge_patients(requests)
+            start = time.perf_counter()
+            for patient in patients:
+                client.post('/api/allocate-bed', json=patient)
+                client.get('/api/dashboard-data')
+            elapsed = time.perf_counter() - start
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+            metrics.enabled = enabled
+        results['enabled_us' if collect else 'disabled_us'] = round(elapsed / (requests * 2) * 1e6)
+    
+    return dict(requests=requests * 2, **results,
+                overhead_pct=round((results['enabled_us'] / results['disabled_us'] - 1) * 100, 1))
+
+def bench_network_search(hospitals=300, beds=100, requests=200):
+    """Network-wide free bed search over many hospitals, in one database file and sharded"""
+    results = {}
+    for sharded in (False, True):
+        directory = fresh_database(sharded)
+        try:
+            conn = connect_db()
+            for i in range(hospitals):
+                hospital = (f'NET{i:04d}', f'Network Hospital {i}', '-', '-', beds, beds // 10, 'bench')
+                insert_hospital(conn.cursor(), hospital)
+                conn.commit()
+                shard = create_shard(hospital) if sharded else conn
+                create_sample_beds(shard, hospital[0], beds, beds // 10)
+                shard.commit()
+                if shard is not conn:
+                    shard.close()
+            if sharded:
+                refresh_network_stats(conn, hospital_databases())
+            conn.close()
+            
+            client = app.test_client()
+            client.post('/login', json={'hospital_id': 'NET0000', 'password': 'bench'})
+            for name, url in (('icu_top5', '/api/network-availability?type=icu&top=5'),
+                              ('all_types_top10', '/api/network-availability')):
+                start = time.perf_counter()
+                for _ in range(requests):
+                    client.get(url)
+                elapsed = time.perf_counter() - start
+                results[f"{'sharded' if sharded else 'single_file'}_{name}_ms"] = round(elapsed / requests * 1000, 2)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+            app.config['SHARD_DIR'] = None
+    
+    return dict(hospitals=hospitals, **results)
+
+def bench_analytics(history=100000, requests=50):
+    """Utilization report from the rollups against one pass over the patients table, as history grows"""
+    results = []
+    for size in (history // 100, history // 10, history):
+        directory = fresh_database()
+        try:
+            conn = connect_db()
+            synthetic_hospital(conn, 'ANA001', 500, size, random.Random(size))
+            start = time.perf_counter()
+            run_write(lambda tx: rebuild_rollups(tx.cursor), conn=conn)
+            backfill = time.perf_counter() - start
+            
+            # What each report cost before the rollups: a pass over every stay
+            start = time.perf_counter()
+            for _ in range(requests):
+                conn.execute('''
+                    SELECT COUNT(*), AVG(julianday(discharge_date) - julianday(admission_date))
+                    FROM patients
+                    WHERE hospital_id = ? AND status = 'discharged'
+                ''', ('ANA001',)).fetchall()
+            scan = (time.perf_counter() - start) / requests
+            conn.close()
+            
+            client = app.test_client()
+            client.post('/login', json={'hospital_id': 'ANA001', 'password': 'bench'})
+            since = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+            start = time.perf_counter()
+            for _ in range(requests):
+                client.get(f'/api/analytics?from={since}')
+            report = (time.perf_counter() - start) / requests
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        results.append({
+            'history': size,
+            'backfill_s': round(backfill, 2),
+            'patients_scan_ms': round(scan * 1000, 2),
+            'rollup_report_ms': round(report * 1000, 2)
+        })
+    return {'runs': results}
+
+def bench_allocation_policy(beds=400, requests=5000, seed=1):
+    """First-fit against best-fit ward packing on simulated arrivals and discharges, then a waiting list plan"""
+    wards = beds // 20
+    results = {}
+    for policy in ('first-fit', 'best-fit'):
+        directory = fresh_database()
+        app.config['ALLOCATION_POLICY'] = policy
+        rng = random.Random(seed)
+        hospital_id = f"POLICY_{policy.upper().replace('-', '')}"
+        try:
+            conn = connect_db()
+            insert_hospital(conn.cursor(), (hospital_id, f'{policy} Hospital', '-', '-', beds, beds // 10, 'bench'))
+            conn.commit()
+            # Bed numbers interleave across wards, as in the default layout
+            inventory = [(f'{hospital_id}_BED{i:04d}', 'general', f'Ward {i % wards + 1:02d}') for i in range(beds)]
+            inventory += [(f'{hospital_id}_ICU{i:03d}', 'icu', 'ICU Unit 1') for i in range(beds // 10)]
+            inventory += [(f'{hospital_id}_FLEX{i:03d}', 'flexible', 'Flex Care Unit') for i in range(beds // 10)]
+            run_write(import_beds, hospital_id, inventory, conn=conn)
+            ward_of = {bed_id: ward for bed_id, _, ward in inventory}
+            
+            occupied = {}  # patient_id -> bed_id
+            in_ward = {}
+            fallbacks = 0
+            empty_wards = []
+            allocate_time = 0.0
+            patients = surge_patients(requests)
+            rng.shuffle(patients)
+            for patient in patients:
+                # Hold occupancy at 90% with discharges in random order
+                while len(occupied) >= beds * 0.9:
+                    patient_id = rng.choice(list(occupied))
+                    run_write(discharge, hospital_id, patient_id, conn=conn)
+                    ward = ward_of[occupied.pop(patient_id)]
+                    in_ward[ward] -= 1
+                start = time.perf_counter()
+                result = run_write(allocate_patients, hospital_id, [patient], conn=conn)[0]
+                allocate_time += time.perf_counter() - start
+                if result['bed_id']:
+                    occupied[result['patient_id']] = result['bed_id']
+                    ward = ward_of[result['bed_id']]
+                    in_ward[ward] = in_ward.get(ward, 0) + 1
+                    if patient['doctor_recommendation'] != 'general' and '_BED' in result['bed_id']:
+                        fallbacks += 1
+                empty_wards.append(sum(1 for i in range(wards) if not in_ward.get(f'Ward {i + 1:02d}')))
+            
+            # Overflow the hospital so the plan has a waiting list to place
+            run_write(allocate_patients, hospital_id, surge_patients(beds * 2), conn=conn)
+            start = time.perf_counter()
+            plan = plan_waiting_assignments(conn.cursor(), hospital_id, 7)
+            plan_time = time.perf_counter() - start
+            conn.close()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+            app.config['ALLOCATION_POLICY'] = 'best-fit'
+        results[policy] = {
+            'allocate_us': round(allocate_time / requests * 1e6, 1),
+            'empty_general_wards_avg': round(sum(empty_wards) / len(empty_wards), 2),
+            'fallback_admissions': fallbacks,
+            'plan_ms': round(plan_time * 1000, 2),
+            'plan_waiting': len(plan),
+            'plan_placed': sum(1 for assignment in plan if assignment['bed_id'])
+        }
+    return {'general_beds': beds, 'wards': wards, 'arrivals': requests, **results}
+
+def legacy_page_load():
+    """The original page load: index.html rendered per hit, assets sent uncompressed, returning bytes sent"""
+    with app.test_request_context('/'):
+        sent = len(render_template('index.html').encode())
+        for filename in ('style.css', 'script.js'):
+            response = send_from_directory(os.path.join(app.root_path, 'static'), filename)
+            response.direct_passthrough = False
+            sent += len(response.get_data())
+            response.close()
+    return sent
+
+def page_load(headers):
+    """The page and its assets through the asset pipeline, returning bytes sent"""
+    with app.test_request_context('/', headers=headers):
+        sent = len(asset_response(static_assets.page('index.html')).get_data())
+        for filename in ('style.css', 'script.js'):
+            name = static_assets.url(filename)[len('/static/'):]
+            sent += len(asset_response(static_assets.get(name)).get_data())
+    return sent
+
+def page_response_etag():
+    with app.test_request_context('/', headers={'Accept-Encoding': 'gzip'}):
+        return asset_response(static_assets.page('index.html')).headers['ETag']
+
+def bench_static_assets(requests=1000):
+    """Bytes and handler time per page load with precompressed fingerprinted assets against the original serving"""
+    timings = {}
+    for name, load in (('legacy', legacy_page_load),
+                       ('first_visit', lambda: page_load({'Accept-Encoding': 'gzip, deflate, br'}))):
+        start = time.perf_counter()
+        for _ in range(requests):
+            sent = load()
+        timings[f'{name}_bytes'] = sent
+        timings[f'{name}_us'] = round((time.perf_counter() - start) / requests * 1e6, 1)
+    
+    # A returning browser revalidates the page and keeps the immutable assets
+    etag = page_response_etag()
+    start = time.perf_counter()
+    for _ in range(requests):
+        with app.test_request_context('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag}):
+            sent = len(asset_response(static_assets.page('index.html')).get_data())
+    timings['repeat_visit_bytes'] = sent
+    timings['repeat_visit_us'] = round((time.perf_counter() - start) / requests * 1e6, 1)
+    return timings
+
+def bench_json(beds=10000, requests=10):
+    """Listing responses of a large hospital with the standard JSON encoder, the fast provider, and gzip"""
+    directory = fresh_database()
+    results = {}
+    try:
+        conn = connect_db()
+        insert_hospital(conn.cursor(), ('JSON', 'JSON Hospital', '-', '-', beds, beds // 10, 'bench'))
+        create_sample_beds(conn, 'JSON', beds, beds // 10)
+        conn.commit()
+        run_write(allocate_patients, 'JSON', surge_patients(int(beds * 0.8)), conn=conn)
+        conn.close()
+        
+        client = app.test_client()
+        client.post('/login', json={'hospital_id': 'JSON', 'password': 'bench'})
+        variants = (('stdlib', DefaultJSONProvider, {}),
+                    ('fast', FastJSONProvider, {}),
+                    ('fast_gzip', FastJSONProvider, {'Accept-Encoding': 'gzip'}))
+        for url in ('/api/available-beds', '/api/allocated-patients', '/api/available-beds?stream=1'):
+            route = url.split('/')[-1].replace('?stream=1', '_stream')
+            for name, provider, headers in variants:
+                app.json = provider(app)
+                timings = []
+                for _ in range(requests):
+                    start = time.perf_counter()
+                    response = client.get(url, headers=headers)
+                    size = len(response.data)
+                    timings.append(time.perf_counter() - start)
+                    response.close()
+                results[f'{route}_{name}'] = {'bytes': size, 'ms': round(min(timings) * 1000, 1)}
+    finally:
+        app.json = FastJSONProvider(app)
+        shutil.rmtree(directory, ignore_errors=True)
+    
+    return {'beds': beds, **results}
+
+def bench_archival(beds=2000, history=200000, requests=200):
+    """Hot read latency with years of discharged patients in the live table, then after archiving them"""
+    directory = fresh_database()
+    try:
+        conn = connect_db()
+        synthetic_hospital(conn, 'ARC001', beds, history, random.Random(history))
+        client = app.test_client()
+        client.post('/login', json={'hospital_id': 'ARC001', 'password': 'bench'})
+        allocate = surge_patients(beds // 2)
+        for start in range(0, len(allocate), 50):
+            client.post('/api/allocate-beds', json={'patients': allocate[start:start + 50]})
+        
+        def read_latencies():
+            latencies = {}
+            for route in ('dashboard-data', 'allocated-patients', 'waiting-list', 'upcoming-discharges', 'forecast'):
+                start = time.perf_counter()
+                for _ in range(requests):
+                    client.get(READS[route])
+                latencies[route] = round((time.perf_counter() - start) / requests * 1000, 3)
+            return latencies
+        
+        def live_rows():
+            return conn.execute('SELECT COUNT(*) FROM patients').fetchone()[0]
+        
+        before = {'patients': live_rows(), 'read_ms': read_latencies()}
+        start = time.perf_counter()
+        archived = archive_discharged(conn, app.config['ARCHIVE_AFTER_DAYS'], app.config['ARCHIVE_BATCH'])
+        elapsed = time.perf_counter() - start
+        after = {'patients': live_rows(), 'read_ms': read_latencies()}
+        
+        start = time.perf_counter()
+        for _ in range(requests // 10):
+            client.get('/api/allocated-patients?status=discharged&include_archived=1&limit=50')
+        history_page = (time.perf_counter() - start) / (requests // 10)
+        conn.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return {
+        'history': history,
+        'archived': archived,
+        'archive_s': round(elapsed, 2),
+        'archived_per_s': round(archived / elapsed) if elapsed else None,
+        'before': before,
+        'after': after,
+        'history_page_ms': round(history_page * 1000, 2)
+    }
+
+SCENARIOS = {
+    'batch-admission': bench_batch_admission,
+    'rounds': bench_rounds,
+    'bulk-provisioning': bench_bulk_provisioning,
+    'forecast': bench_forecast,
+    'sharding': bench_sharding,
+    'group-commit': bench_group_commit,
+    'double-booking': bench_double_booking,
+    'load': bench_load,
+    'metrics-overhead': bench_metrics_overhead,
+    'network-search': bench_network_search,
+    'analytics': bench_analytics,
+    'allocation-policy': bench_allocation_policy,
+    'static-assets': bench_static_assets,
+    'json': bench_json,
+    'archival': bench_archival,
+}
+
+def git_commit():
+    """Short hash of the checked-out commit, to tell results apart"""
+    try:
+        head = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)))
+        return head.stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('scenarios', nargs='*',
+                        help=f"scenarios to run, from: {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument('--hospitals', type=int, help='synthetic hospitals')
+    parser.add_argument('--beds', type=int, help='beds per synthetic hospital')
+    parser.add_argument('--history', type=int, help='discharged patients per synthetic hospital')
+    parser.add_argument('--clients', type=int, help='concurrent simulated clients')
+    parser.add_argument('--requests', type=int, help='requests per client')
+    parser.add_argument('--seed', type=int, help='random seed of the client mix')
+    parser.add_argument('--output', help='append results to this file instead of printing them')
+    args = parser.parse_args()
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error(f'unknown scenario: {name}')
+    
+    # Each scenario takes the options it has parameters for
+    options = {key: value for key, value in vars(args).items()
+               if value is not None and key not in ('scenarios', 'output')}
+    for name in args.scenarios or SCENARIOS:
+        scenario = SCENARIOS[name]
+        accepted = inspect.signature(scenario).parameters
+        result = scenario(**{key: value for key, value in options.items() if key in accepted})
+        line = json.dumps(dict(scenario=name, commit=git_commit(), **result))
+        if args.output:
+            with open(args.output, 'a') as f:
+                f.write(line + '\n')
+        else:
+            print(line)
+
+if __name__ == '__main__':
+    main()
@@ -22,13 +22,9 @@ function showPage(pageName) {
     // Add active class to clicked menu item
     event.target.classList.add('active');
     
-    // Load page data
+    // Load page data; the bed and patient tables are kept current by the change events
     if (pageName === 'dashboard') {
         loadDashboardData();
-    } else if (pageName === 'availableBeds') {
-        loadAvailableBeds();
-    } else if (pageName === 'allocatedPatients') {
-        loadAllocatedPatients();
     }
 }
 
@@ -138,6 +134,7 @@ async function registerHospital() {
 
 async function logout() {
     try {
+        disconnectEvents();
         await fetch('/logout');
         currentHospital = null;
         showLoginPage();
@@ -156,27 +153,305 @@ function showDashboard() {
     document.getElementById('loginPage').classList.remove('active');
     document.getElementById('dashboardPage').classList.add('active');
     document.getElementById('hospitalNameDisplay').textContent = currentHospital.name;
-    loadDashboardData();
+    connectEvents();
 }
 
-// Data loading functions
-async function loadDashboardData() {
+// Live hospital state: the listings are loaded a page at a time, then kept
+// current row by row from /api/events. Stats come from /api/dashboard-data.
+const PAGE_SIZE = 50;
+const hospitalState = {
+    loaded: false,
+    beds: new Map(),
+    patients: new Map(),
+    bedsCursor: null,      // next_cursor of the last page loaded, null once complete
+    patientsCursor: null
+};
+let eventSource = null;
+let dashboardTimer = null;
+
+async function fetchHospitalData(url) {
+    const response = await fetch(url);
+    
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    
+    const data = await response.json();
+    
+    if (data.error) {
+        throw new Error('Not logged in');
+    }
+    return data;
+}
+
+function pageUrl(url, cursor) {
+    return `${url}?limit=${PAGE_SIZE}` + (cursor ? `&after=${encodeURIComponent(cursor)}` : '');
+}
+
+async function loadHospitalState() {
     try {
-        showLoading('recentAllocationsTable', 'Loading recent allocations...');
-        
-        const response = await fetch('/api/dashboard-data');
+        const [bedData, patientData] = await Promise.all([
+            fetchHospitalData(pageUrl('/api/available-beds')),
+            fetchHospitalData(pageUrl('/api/allocated-patients'))
+        ]);
         
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
+        hospitalState.beds = new Map(bedData.beds.map(bed => [bed.id, bed]));
+        hospitalState.bedsCursor = bedData.next_cursor;
+        hospitalState.patients = new Map(patientData.patients.map(patient => [patient.id, patient]));
+        hospitalState.patientsCursor = patientData.next_cursor;
+        hospitalState.loaded = true;
+        loadDashboardData();
+        loadAvailableBeds();
+        loadAllocatedPatients();
+    } catch (error) {
+        handleLoadError(error);
+    }
+}
+
+// New beds only extend the bed listing, so that is all that is reloaded
+async function reloadBeds() {
+    try {
+        const bedData = await fetchHospitalData(pageUrl('/api/available-beds'));
+        hospitalState.beds = new Map(bedData.beds.map(bed => [bed.id, bed]));
+        hospitalState.bedsCursor = bedData.next_cursor;
+        loadAvailableBeds();
+    } catch (error) {
+        handleLoadError(error);
+    }
+    scheduleDashboardRefresh();
+}
+
+function handleLoadError(error) {
+    if (error.message === 'Not logged in') {
+        alert('Please login again');
+        disconnectEvents();
+        showLoginPage();
+        return;
+    }
+    console.error('Error loading hospital data:', error);
+    showError('bedsTable', 'Error loading bed data');
+    showError('patientsTable', 'Error loading patient data');
+}
+
+async function loadMoreBeds() {
+    try {
+        const data = await fetchHospitalData(pageUrl('/api/available-beds', hospitalState.bedsCursor));
+        const table = document.getElementById('bedsTable');
+        data.beds.forEach(bed => {
+            if (!hospitalState.beds.has(bed.id)) {
+                hospitalState.beds.set(bed.id, bed);
+                table.appendChild(rowElement(bedRow(bed)));
+            }
+        });
+        hospitalState.bedsCursor = data.next_cursor;
+        updateMoreButtons();
+    } catch (error) {
+        handleLoadError(error);
+    }
+}
+
+async function loadMorePatients() {
+    try {
+        const data = await fetchHospitalData(pageUrl('/api/allocated-patients', hospitalState.patientsCursor));
+        const table = document.getElementById('patientsTable');
+        data.patients.forEach(patient => {
+            if (!hospitalState.patients.has(patient.id)) {
+                hospitalState.patients.set(patient.id, patient);
+                table.appendChild(rowElement(patientRow(patient)));
+            }
+        });
+        hospitalState.patientsCursor = data.next_cursor;
+        updateMoreButtons();
+    } catch (error) {
+        handleLoadError(error);
+    }
+}
+
+// Change events
+function connectEvents() {
+    disconnectEvents();
+    
+    if (!window.EventSource) {
+        loadHospitalState();
+        return;
+    }
+    
+    eventSource = new EventSource('/api/events');
+    
+    // Sent on connect, and when the server can no longer replay what we missed
+    eventSource.addEventListener('ready', loadHospitalState);
+    eventSource.addEventListener('resync', loadHospitalState);
+    eventSource.addEventListener('beds_changed', reloadBeds);
+    
+    eventSource.addEventListener('bed_occupied', event => {
+        const change = JSON.parse(event.data);
+        const bed = hospitalState.beds.get(change.bed_id);
+        if (bed) {
+            bed.status = 'occupied';
+            bed.last_occupied = change.last_occupied;
+            replaceRow('bedsTable', bed.id, bedRow(bed));
         }
-        
-        const data = await response.json();
-        
-        if (data.error) {
-            alert('Please login again');
-            showLoginPage();
-            return;
+        scheduleDashboardRefresh();
+    });
+    
+    eventSource.addEventListener('bed_freed', event => {
+        const change = JSON.parse(event.data);
+        const bed = hospitalState.beds.get(change.bed_id);
+        if (bed) {
+            bed.status = 'available';
+            replaceRow('bedsTable', bed.id, bedRow(bed));
+        }
+        scheduleDashboardRefresh();
+    });
+    
+    eventSource.addEventListener('patient_admitted', event => {
+        insertPatient(JSON.parse(event.data));
+        scheduleDashboardRefresh();
+    });
+    
+    eventSource.addEventListener('patient_extended', event => {
+        const change = JSON.parse(event.data);
+        const patient = hospitalState.patients.get(change.patient_id);
+        if (patient) {
+            patient.expected_stay = change.expected_stay;
+            patient.extended_stay = change.extended_stay;
+            patient.expected_discharge = change.expected_discharge;
+            patient.can_extend = change.can_extend;
+            replaceRow('patientsTable', patient.id, patientRow(patient));
         }
+    });
+    
+    eventSource.addEventListener('patient_discharged', event => {
+        const change = JSON.parse(event.data);
+        if (hospitalState.patients.delete(change.patient_id)) {
+            const row = findRow('patientsTable', change.patient_id);
+            if (row) {
+                row.remove();
+            }
+            if (!hospitalState.patients.size && !hospitalState.patientsCursor) {
+                loadAllocatedPatients();
+            }
+        }
+        scheduleDashboardRefresh();
+    });
+}
+
+function disconnectEvents() {
+    if (eventSource) {
+        eventSource.close();
+        eventSource = null;
+    }
+    clearTimeout(dashboardTimer);
+    hospitalState.loaded = false;
+    hospitalState.beds = new Map();
+    hospitalState.patients = new Map();
+    hospitalState.bedsCursor = null;
+    hospitalState.patientsCursor = null;
+}
+
+// Rendering: whole tables after a snapshot, single rows for each change
+function comparePatients(a, b) {
+    return (b.admission_date || '').localeCompare(a.admission_date || '') || b.id.localeCompare(a.id);
+}
+
+function bedRow(bed) {
+    return `
+        <tr data-id="${bed.id}">
+            <td>${bed.id}</td>
+            <td>${bed.type}</td>
+            <td>${bed.ward}</td>
+            <td><span class="badge ${bed.status === 'available' ? 'low' : 'high'}">${bed.status}</span></td>
+            <td>${bed.last_occupied || 'Never'}</td>
+        </tr>
+    `;
+}
+
+function patientRow(patient) {
+    return `
+        <tr data-id="${patient.id}">
+            <td>${patient.name}</td>
+            <td>${patient.age}</td>
+            <td>${patient.blood_group}</td>
+            <td>${patient.condition}</td>
+            <td><span class="badge ${patient.severity}">${patient.severity}</span></td>
+            <td>${patient.bed_id}</td>
+            <td>${patient.admission_date}</td>
+            <td>${patient.expected_discharge || 'N/A'}</td>
+            <td>
+                ${patient.can_extend ? 
+                    `<button class="btn btn-sm btn-success" onclick="extendStay('${patient.id}', '${patient.name}')" style="margin-bottom: 5px;">
+                        Extend 2 Days
+                    </button><br>` : ''
+                }
+                <button class="btn btn-sm btn-warning" onclick="dischargePatient('${patient.id}', '${patient.name}')">
+                    Discharge
+                </button>
+            </td>
+        </tr>
+    `;
+}
+
+function rowElement(html) {
+    const body = document.createElement('tbody');
+    body.innerHTML = html.trim();
+    return body.firstElementChild;
+}
+
+function findRow(tableId, id) {
+    return document.getElementById(tableId).querySelector(`tr[data-id="${CSS.escape(id)}"]`);
+}
+
+function replaceRow(tableId, id, html) {
+    const row = findRow(tableId, id);
+    if (row) {
+        row.replaceWith(rowElement(html));
+    }
+}
+
+function insertPatient(patient) {
+    if (hospitalState.patients.has(patient.id)) {
+        hospitalState.patients.set(patient.id, patient);
+        replaceRow('patientsTable', patient.id, patientRow(patient));
+        return;
+    }
+    
+    const loaded = [...hospitalState.patients.values()];
+    const next = loaded.filter(other => comparePatients(patient, other) < 0)
+        .sort(comparePatients)[0];
+    // Past the last loaded row, the patient turns up with a later page instead
+    if (!next && hospitalState.patientsCursor) {
+        return;
+    }
+    
+    const table = document.getElementById('patientsTable');
+    if (!hospitalState.patients.size) {
+        table.innerHTML = '';
+    }
+    hospitalState.patients.set(patient.id, patient);
+    const row = rowElement(patientRow(patient));
+    const nextRow = next && findRow('patientsTable', next.id);
+    if (nextRow) {
+        table.insertBefore(row, nextRow);
+    } else {
+        table.appendChild(row);
+    }
+}
+
+function updateMoreButtons() {
+    document.getElementById('moreBeds').style.display = hospitalState.bedsCursor ? '' : 'none';
+    document.getElementById('morePatients').style.display = hospitalState.patientsCursor ? '' : 'none';
+}
+
+// Coalesce a burst of changes into one revalidation of the dashboard
+function scheduleDashboardRefresh() {
+    clearTimeout(dashboardTimer);
+    dashboardTimer = setTimeout(loadDashboardData, 250);
+}
+
+async function loadDashboardData() {
+    try {
+        // Revalidated with the response's ETag, so an unchanged hospital costs a 304
+        const data = await fetchHospitalData('/api/dashboard-data');
         
         // Update stats
         document.getElementById('totalBeds').textContent = data.stats?.total_beds || 0;
@@ -210,111 +485,64 @@ async function loadDashboardData() {
             `;
         }
     } catch (error) {
+        if (error.message === 'Not logged in') {
+            handleLoadError(error);
+            return;
+        }
         console.error('Error loading dashboard data:', error);
         showError('recentAllocationsTable', 'Error loading dashboard data');
     }
 }
 
-async function loadAvailableBeds() {
-    try {
+function loadAvailableBeds() {
+    if (!hospitalState.loaded) {
         showLoading('bedsTable', 'Loading beds...');
-        
-        const response = await fetch('/api/available-beds');
-        
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
-        }
-        
-        const data = await response.json();
-        
-        if (data.error) {
-            alert('Please login again');
-            showLoginPage();
-            return;
-        }
-        
-        const table = document.getElementById('bedsTable');
-        if (data.beds && data.beds.length > 0) {
-            table.innerHTML = data.beds.map(bed => `
-                <tr>
-                    <td>${bed.id}</td>
-                    <td>${bed.type}</td>
-                    <td>${bed.ward}</td>
-                    <td><span class="badge ${bed.status === 'available' ? 'low' : 'high'}">${bed.status}</span></td>
-                    <td>${bed.last_occupied || 'Never'}</td>
-                </tr>
-            `).join('');
-        } else {
-            table.innerHTML = `
-                <tr>
-                    <td colspan="5" class="empty-state">
-                        <i class="fas fa-bed"></i>
-                        <p>No beds found</p>
-                    </td>
-                </tr>
-            `;
-        }
-    } catch (error) {
-        console.error('Error loading beds:', error);
-        showError('bedsTable', 'Error loading bed data');
+        return;
     }
+    
+    const table = document.getElementById('bedsTable');
+    const beds = [...hospitalState.beds.values()];
+    if (beds.length > 0) {
+        table.innerHTML = beds.map(bedRow).join('');
+    } else {
+        table.innerHTML = `
+            <tr>
+                <td colspan="5" class="empty-state">
+                    <i class="fas fa-bed"></i>
+                    <p>No beds found</p>
+                </td>
+            </tr>
+        `;
+    }
+    updateMoreButtons();
 }
 
-async function loadAllocatedPatients() {
-    try {
+function loadAllocatedPatients() {
+    if (!hospitalState.loaded) {
         showLoading('patientsTable', 'Loading patients...');
-        
-        const response = await fetch('/api/allocated-patients');
-        
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
-        }
-        
-        const data = await response.json();
-        
-        if (data.error) {
-            alert('Please login again');
-            showLoginPage();
-            return;
-        }
-        
-        const table = document.getElementById('patientsTable');
-        if (data.patients && data.patients.length > 0) {
-            table.innerHTML = data.patients.map(patient => `
-                <tr>
-                    <td>${patient.name}</td>
-                    <td>${patient.age}</td>
-                    <td>${patient.blood_group}</td>
-                    <td>${patient.condition}</td>
-                    <td><span class="badge ${patient.severity}">${patient.severity}</span></td>
-                    <td>${patient.bed_id}</td>
-                    <td>${patient.admission_date}</td>
-                    <td>${patient.expected_discharge || 'N/A'}</td>
-                    <td>
-                        ${patient.can_extend ? 
-                            `<button class="btn btn-sm btn-success" onclick="extendStay('${patient.id}', '${patient.name}')" style="margin-bottom: 5px;">
-                                Extend 2 Days
-                            </button><br>` : ''
-                        }
-                        <button class="btn btn-sm btn-warning" onclick="dischargePatient('${patient.id}', '${patient.name}')">
-                            Discharge
-                        </button>
-                    </td>
-                </tr>
-            `).join('');
-        } else {
-            table.innerHTML = `
-                <tr>
-                    <td colspan="9" class="empty-state">
-                        <i class="fas fa-user-injured"></i>
-                        <p>No patients currently allocated</p>
-                    </td>
-                </tr>
-            `;
-        }
-    } catch (error) {
-        console.error('Error loading patients:', error);
-        showError('patientsTable', 'Error loading patient data');
+        return;
+    }
+    
+    const table = document.getElementById('patientsTable');
+    const patients = [...hospitalState.patients.values()];
+    if (patients.length > 0) {
+        table.innerHTML = patients.map(patientRow).join('');
+    } else {
+        table.innerHTML = `
+            <tr>
+                <td colspan="9" class="empty-state">
+                    <i class="fas fa-user-injured"></i>
+                    <p>No patients currently allocated</p>
+                </td>
+            </tr>
+        `;
+    }
+    updateMoreButtons();
+}
+
+function refreshWithoutEvents() {
+    if (!eventSource) {
+        loadHospitalState();
     }
 }
 
@@ -378,10 +606,8 @@ async function allocateBed(event) {
             showNotification(`Bed allocated successfully! Patient: ${patientData.patient_name}, Bed: ${data.bed_id}, Admission: ${data.admission_date}`, 'success');
             // Reset form
             event.target.reset();
-            // Refresh all data
-            loadDashboardData();
-            loadAvailableBeds();
-            loadAllocatedPatients();
+            // Tables update from the change events
+            refreshWithoutEvents();
         } else {
             showNotification(data.message, 'error');
         }
@@ -412,10 +638,8 @@ async function extendStay(patientId, patientName) {
         
         if (data.success) {
             showNotification(data.message, 'success');
-            // Refresh all data
-            loadDashboardData();
-            loadAvailableBeds();
-            loadAllocatedPatients();
+            // Tables update from the change events
+            refreshWithoutEvents();
         } else {
             showNotification(data.message, 'error');
         }
@@ -446,10 +670,8 @@ async function dischargePatient(patientId, patientName) {
         
         if (data.success) {
             showNotification(data.message, 'success');
-            // Refresh all data
-            loadDashboardData();
-            loadAvailableBeds();
-            loadAllocatedPatients();
+            // Tables update from the change events
+            refreshWithoutEvents();
         } else {
             showNotification(data.message, 'error');
         }
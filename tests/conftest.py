@@ -0,0 +1,45 @@
+import itertools
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from app import app, flush_writers, init_db
+
+_hospital_ids = itertools.count(1)
+
+
+@pytest.fixture(params=[False, True], ids=['single_file', 'sharded'])
+def database(request):
+    """An empty database in a temporary directory, single-file or split into shards"""
+    directory = tempfile.mkdtemp(prefix='cura-test-')
+    saved = {key: app.config[key] for key in ('DATABASE', 'SHARD_DIR', 'WRITE_GROUP_COMMIT')}
+    app.config['DATABASE'] = os.path.join(directory, 'hospital.db')
+    app.config['SHARD_DIR'] = os.path.join(directory, 'shards') if request.param else None
+    init_db()
+    yield app.config['DATABASE']
+    flush_writers()
+    app.config.update(saved)
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+@pytest.fixture
+def hospital_id():
+    """A hospital ID unused in this process, so the in-memory bed index starts empty"""
+    return f'TEST{next(_hospital_ids):03d}'
+
+
+def register_hospital(client, hospital_id, total_beds, icu_beds):
+    """Register a hospital and log the client in to it"""
+    response = client.post('/register', json={
+        'hospital_id': hospital_id,
+        'name': f'{hospital_id} Test Hospital',
+        'address': 'Test Road',
+        'contact': '000',
+        'total_beds': total_beds,
+        'icu_beds': icu_beds,
+        'password': 'test'
+    }).get_json()
+    assert response['success'], response['message']
+    client.post('/login', json={'hospital_id': hospital_id, 'password': 'test'})
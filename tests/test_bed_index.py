@@ -0,0 +1,31 @@
+from app import app, connect_db, shard_path
+from conftest import register_hospital
+
+PATIENT = {
+    'patient_name': 'Patient',
+    'age': 40,
+    'blood_group': 'O+',
+    'admission_cause': 'Trauma',
+    'severity': 'high',
+    'health_risk': 'critical',
+    'doctor_recommendation': 'icu'
+}
+
+
+def test_bed_freed_by_another_process_is_allocated(database, hospital_id):
+    client = app.test_client()
+    register_hospital(client, hospital_id, 4, 1)
+    # Fill every bed, so the index has no free beds of any type left
+    admitted = [client.post('/api/allocate-bed', json=PATIENT).get_json() for _ in range(4)]
+    assert all(response.get('bed_id') for response in admitted)
+    
+    # Another process discharges the ICU patient without telling this one's index
+    icu_bed = admitted[0]['bed_id']
+    conn = connect_db(shard_path(hospital_id))
+    conn.execute("UPDATE patients SET status = 'discharged', bed_id = NULL WHERE id = ?", (admitted[0]['patient_id'],))
+    conn.execute("UPDATE beds SET status = 'available', patient_id = NULL WHERE id = ?", (icu_bed,))
+    conn.commit()
+    conn.close()
+    
+    response = client.post('/api/allocate-bed', json=PATIENT).get_json()
+    assert response['bed_id'] == icu_bed
@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+
+from app import app, connect_db, flush_writers, reconcile_bed_stats, shard_path
+from conftest import register_hospital
+
+CLIENTS = 8
+ADMISSIONS = 15
+RECOMMENDATIONS = ('icu', 'general', 'flexible', 'general')
+
+
+def admit_and_discharge(hospital_id, patient_ids, errors):
+    """Admit a run of patients, then discharge every fourth one given a bed"""
+    client = app.test_client()
+    client.post('/login', json={'hospital_id': hospital_id, 'password': 'test'})
+    admitted = []
+    for i in range(ADMISSIONS):
+        response = client.post('/api/allocate-bed', json={
+            'patient_name': f'Patient {i}',
+            'age': 40,
+            'blood_group': 'O+',
+            'admission_cause': 'Trauma',
+            'severity': 'medium',
+            'health_risk': 'moderate',
+            'doctor_recommendation': RECOMMENDATIONS[i % len(RECOMMENDATIONS)]
+        }).get_json()
+        if response.get('patient_id'):
+            admitted.append(response['patient_id'])
+        elif response['message'].startswith('Error'):
+            errors.append(response['message'])
+    for patient_id in admitted[::4]:
+        response = client.post('/api/discharge-patient', json={'patient_id': patient_id}).get_json()
+        if not response['success']:
+            errors.append(response['message'])
+    patient_ids.extend(admitted)
+
+
+@pytest.mark.parametrize('group_commit', [False, True], ids=['per_request', 'group_commit'])
+def test_concurrent_admissions_never_double_book(database, hospital_id, group_commit):
+    app.config['WRITE_GROUP_COMMIT'] = group_commit
+    # Fewer beds than admissions, so discharges promote patients off the waiting list
+    register_hospital(app.test_client(), hospital_id, CLIENTS * ADMISSIONS // 2, CLIENTS * ADMISSIONS // 8)
+    
+    patient_ids, errors = [], []
+    threads = [threading.Thread(target=admit_and_discharge, args=(hospital_id, patient_ids, errors))
+               for _ in range(CLIENTS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    flush_writers()
+    
+    assert errors == []
+    assert len(patient_ids) == len(set(patient_ids))
+    
+    conn = connect_db(shard_path(hospital_id))
+    # A patient ID handed out twice would leave fewer rows than admissions
+    assert conn.execute('SELECT COUNT(*) FROM patients WHERE hospital_id = ?',
+                        (hospital_id,)).fetchone()[0] == CLIENTS * ADMISSIONS
+    double_booked = conn.execute('''
+        SELECT bed_id FROM patients
+        WHERE hospital_id = ? AND status = 'allocated'
+        GROUP BY bed_id HAVING COUNT(*) > 1
+    ''', (hospital_id,)).fetchall()
+    mismatched_beds = conn.execute('''
+        SELECT b.id FROM beds b JOIN patients p ON p.bed_id = b.id
+        WHERE p.hospital_id = ? AND p.status = 'allocated' AND b.patient_id IS NOT p.id
+    ''', (hospital_id,)).fetchall()
+    orphaned_beds = conn.execute('''
+        SELECT b.id FROM beds b LEFT JOIN patients p ON p.id = b.patient_id AND p.status = 'allocated'
+        WHERE b.hospital_id = ? AND b.status = 'occupied' AND p.id IS NULL
+    ''', (hospital_id,)).fetchall()
+    assert double_booked == mismatched_beds == orphaned_beds == []
+    assert reconcile_bed_stats(conn, repair=False) == []
+    
+    shard_counters = sorted(conn.execute('''
+        SELECT hospital_id, type, total_beds, available_beds FROM bed_type_stats WHERE hospital_id = ?
+    ''', (hospital_id,)).fetchall())
+    conn.close()
+    if app.config['SHARD_DIR']:
+        catalog = connect_db()
+        network_counters = sorted(catalog.execute('''
+            SELECT hospital_id, type, total_beds, available_beds FROM network_bed_stats WHERE hospital_id = ?
+        ''', (hospital_id,)).fetchall())
+        catalog.close()
+        assert network_counters == shard_counters
@@ -0,0 +1,18 @@
+from app import Metrics
+
+NAME = 'cura_http_request_duration_seconds'
+
+
+def test_histogram_series_render_in_bucket_order():
+    metrics = Metrics(True)
+    metrics.observe(NAME, 0.003, (('route', 'b'),))
+    metrics.observe(NAME, 7, (('route', 'a'),))
+    lines = [line for line in metrics.render().splitlines() if line.startswith(NAME)]
+    
+    per_series = len(Metrics.BUCKETS) + 3
+    assert len(lines) == 2 * per_series
+    for series, route in zip((lines[:per_series], lines[per_series:]), ('a', 'b')):
+        bounds = [line.split('le="')[1].split('"')[0] for line in series[:-2]]
+        assert bounds == [str(bound) for bound in Metrics.BUCKETS] + ['+Inf']
+        assert series[-2].startswith(f'{NAME}_sum{{route="{route}"}}')
+        assert series[-1] == f'{NAME}_count{{route="{route}"}} 1'
@@ -0,0 +1,15 @@
+from app import check_query_plans, connect_db, indexed_queries
+
+
+def test_hot_queries_use_an_index(database):
+    conn = connect_db()
+    problems = check_query_plans(conn)
+    conn.close()
+    assert problems == []
+
+
+def test_listing_filter_combinations_are_checked():
+    names = indexed_queries()
+    assert 'available_beds type+ward+status page' in names
+    assert 'allocated_patients type archived page' in names
+    assert 'bed_events bed_id+from+to+type page' in names